@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'django_app.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -112,15 +113,29 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_ALL_ORIGINS = True
 
 # Django REST Framework Configuration
+# Stateless JWT auth: build request.user from token claims instead of loading
+# the User row on every request (see django_app/authentication.py)
+JWT_STATELESS_AUTH = os.getenv('JWT_STATELESS_AUTH', 'False') == 'True'
+# Seconds a full User loaded for a stateless request is kept in memory
+JWT_USER_CACHE_TTL = int(os.getenv('JWT_USER_CACHE_TTL', '60'))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'django_app.authentication.StatelessJWTAuthentication' if JWT_STATELESS_AUTH
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'django_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Encode API responses with orjson when it is installed (see django_app/fast_json.py)
+FAST_JSON = os.getenv('FAST_JSON', 'True') == 'True'
+
 # JWT Settings
 from datetime import timedelta
 
@@ -159,3 +174,98 @@ else:
     # Console Backend (Development) - prints emails to console
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
     DEFAULT_FROM_EMAIL = 'Robot Delivery <noreply@robotdelivery.com>'
+
+# Keenon API Configuration
+KEENON_BASE_URL = os.getenv('KEENON_BASE_URL', 'https://es.robotkeenon.com')
+KEENON_TIMEOUT = int(os.getenv('KEENON_TIMEOUT', '30'))
+# Connection pooling (requests/urllib3): number of host pools and max keep-alive connections per host
+KEENON_POOL_CONNECTIONS = int(os.getenv('KEENON_POOL_CONNECTIONS', '4'))
+KEENON_POOL_MAXSIZE = int(os.getenv('KEENON_POOL_MAXSIZE', '32'))
+# Seconds a scene's target list is served from memory before it is fetched again
+KEENON_TARGET_CACHE_TTL = int(os.getenv('KEENON_TARGET_CACHE_TTL', '300'))
+# Keenon OAuth tokens are renewed this many seconds before they expire
+KEENON_TOKEN_REFRESH_MARGIN = int(os.getenv('KEENON_TOKEN_REFRESH_MARGIN', '300'))
+# Background token renewal (one daemon thread per process)
+KEENON_TOKEN_BACKGROUND_REFRESH = os.getenv('KEENON_TOKEN_BACKGROUND_REFRESH', 'True') == 'True'
+KEENON_TOKEN_REFRESH_INTERVAL = int(os.getenv('KEENON_TOKEN_REFRESH_INTERVAL', '60'))
+# Seconds robot/store/task lists are shared between users of the same Keenon credentials
+KEENON_RESPONSE_CACHE_TTL = int(os.getenv('KEENON_RESPONSE_CACHE_TTL', '10'))
+# Seconds a user's UserKeenonConfig is served from cache; 0 disables the cache.
+# Set KEENON_CONFIG_CACHE_ALIAS to a CACHES alias to share it between processes.
+KEENON_CONFIG_CACHE_TTL = int(os.getenv('KEENON_CONFIG_CACHE_TTL', '300'))
+KEENON_CONFIG_CACHE_ALIAS = os.getenv('KEENON_CONFIG_CACHE_ALIAS', '')
+KEENON_CONFIG_CACHE_MAXSIZE = 4096
+# Max simultaneous Keenon connections per event loop for the async (ASGI) views
+KEENON_ASYNC_MAX_CONNECTIONS = int(os.getenv('KEENON_ASYNC_MAX_CONNECTIONS', '200'))
+
+# Batch robot dispatch (robot/call/batch/)
+ROBOT_BATCH_MAX_CALLS = int(os.getenv('ROBOT_BATCH_MAX_CALLS', '50'))
+ROBOT_BATCH_CONCURRENCY = int(os.getenv('ROBOT_BATCH_CONCURRENCY', '10'))
+
+# Batch execution of saved endpoints (endpoints/execute/)
+ENDPOINT_BATCH_MAX = int(os.getenv('ENDPOINT_BATCH_MAX', '100'))
+ENDPOINT_BATCH_CONCURRENCY = int(os.getenv('ENDPOINT_BATCH_CONCURRENCY', '8'))
+# Optional response cache of saved GET endpoints (Endpoint.cache_ttl)
+ENDPOINT_CACHE_MAX_TTL = 86400
+ENDPOINT_CACHE_MAXSIZE = 1024
+
+# Fleet status poller and SSE stream (fleet/stream/)
+FLEET_POLL_INTERVAL = int(os.getenv('FLEET_POLL_INTERVAL', '5'))
+FLEET_SSE_HEARTBEAT = int(os.getenv('FLEET_SSE_HEARTBEAT', '15'))
+FLEET_SUBSCRIBER_QUEUE_SIZE = 100
+
+# Keenon upstream resilience: per-path circuit breaker and retries for idempotent GETs
+KEENON_CONNECT_TIMEOUT = int(os.getenv('KEENON_CONNECT_TIMEOUT', '5'))
+KEENON_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('KEENON_CIRCUIT_FAILURE_THRESHOLD', '5'))
+KEENON_CIRCUIT_RESET_TIMEOUT = int(os.getenv('KEENON_CIRCUIT_RESET_TIMEOUT', '30'))
+KEENON_GET_RETRIES = int(os.getenv('KEENON_GET_RETRIES', '2'))
+KEENON_RETRY_BACKOFF = float(os.getenv('KEENON_RETRY_BACKOFF', '0.2'))
+KEENON_RETRY_BACKOFF_MAX = float(os.getenv('KEENON_RETRY_BACKOFF_MAX', '2'))
+
+# Write-behind RobotOrder history: rows are saved in batches off the request path
+ROBOT_ORDER_BUFFER_SIZE = int(os.getenv('ROBOT_ORDER_BUFFER_SIZE', '100'))
+ROBOT_ORDER_FLUSH_INTERVAL = float(os.getenv('ROBOT_ORDER_FLUSH_INTERVAL', '2'))
+# Unsaved rows kept while the database is unavailable; the oldest are dropped beyond this
+ROBOT_ORDER_MAX_PENDING = int(os.getenv('ROBOT_ORDER_MAX_PENDING', '10000'))
+
+# Robot order history pages (robot/orders/)
+ROBOT_ORDERS_PAGE_SIZE = 50
+ROBOT_ORDERS_MAX_PAGE_SIZE = 200
+# Rows fetched per database round trip by the streamed export (robot/orders/export/)
+ROBOT_ORDERS_EXPORT_CHUNK_SIZE = 2000
+
+# Keenon task list pagination (tasks/list/ fetches every page)
+KEENON_TASK_PAGE_PARAM = os.getenv('KEENON_TASK_PAGE_PARAM', 'pageNo')
+KEENON_TASK_PAGE_SIZE_PARAM = os.getenv('KEENON_TASK_PAGE_SIZE_PARAM', 'pageSize')
+KEENON_TASK_PAGE_SIZE = int(os.getenv('KEENON_TASK_PAGE_SIZE', '100'))
+KEENON_TASK_PAGE_CONCURRENCY = int(os.getenv('KEENON_TASK_PAGE_CONCURRENCY', '6'))
+KEENON_TASK_MAX_PAGES = int(os.getenv('KEENON_TASK_MAX_PAGES', '50'))
+
+# Local Keenon task mirror (tasks/list/?source=mirror)
+KEENON_TASK_SINCE_PARAM = os.getenv('KEENON_TASK_SINCE_PARAM', 'startTime')
+KEENON_TASK_BACKGROUND_SYNC = os.getenv('KEENON_TASK_BACKGROUND_SYNC', 'True') == 'True'
+KEENON_TASK_SYNC_INTERVAL = int(os.getenv('KEENON_TASK_SYNC_INTERVAL', '30'))
+KEENON_TASK_FULL_SYNC_INTERVAL = int(os.getenv('KEENON_TASK_FULL_SYNC_INTERVAL', '3600'))
+
+# Response compression (django_app.middleware.CompressionMiddleware); brotli is used when installed
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_CONTENT_TYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# SendGrid REST API (django_app.sendgrid_backend): recipients per /mail/send call (SendGrid allows 1000)
+SENDGRID_API_URL = os.getenv('SENDGRID_API_URL', 'https://api.sendgrid.com/v3/mail/send')
+SENDGRID_TIMEOUT = int(os.getenv('SENDGRID_TIMEOUT', '30'))
+SENDGRID_BATCH_SIZE = 1000
+
+# Email outbox (django_app/email_outbox.py): emails are queued by the views and
+# delivered by `manage.py send_queued_emails` and/or an in-process thread
+EMAIL_OUTBOX_BACKGROUND_DELIVERY = os.getenv('EMAIL_OUTBOX_BACKGROUND_DELIVERY', 'True') == 'True'
+EMAIL_OUTBOX_POLL_INTERVAL = int(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '30'))
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '6'))
+# Retry n waits EMAIL_OUTBOX_RETRY_BACKOFF * 2**(n-1) seconds, at most EMAIL_OUTBOX_RETRY_BACKOFF_MAX
+EMAIL_OUTBOX_RETRY_BACKOFF = 30
+EMAIL_OUTBOX_RETRY_BACKOFF_MAX = 3600
+# Seconds after which a message stuck in "sending" (worker died) is retried
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 600
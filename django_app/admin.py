@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Endpoint, EmailVerification, UserKeenonConfig
+from django.utils import timezone
+from .models import Endpoint, EmailOutbox, EmailVerification, UserKeenonConfig
 
 
 @admin.register(UserKeenonConfig)
@@ -104,3 +105,22 @@ class EmailVerificationAdmin(admin.ModelAdmin):
         self.message_user(request, f'Token regenerated for {count} user(s).')
     
     regenerate_tokens.short_description = 'Regenerate verification tokens'
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'to_email', 'kind', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    search_fields = ('to_email', 'subject', 'user__username')
+    list_filter = ('status', 'kind', 'created_at')
+    readonly_fields = ('created_at', 'sent_at', 'claimed_by', 'claimed_at', 'last_error')
+    
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status__in=[EmailOutbox.STATUS_SENT, EmailOutbox.STATUS_SENDING]).update(
+            status=EmailOutbox.STATUS_PENDING,
+            next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{count} email(s) queued for delivery.')
+    
+    retry_now.short_description = 'Retry selected emails now'
@@ -0,0 +1,301 @@
+"""
+Async versions of the Keenon proxy endpoints.
+
+These views do not hold a worker thread while Keenon answers, so under an
+ASGI server (e.g. ``uvicorn config.asgi:application``) one process can keep
+hundreds of Keenon calls in flight. Responses match the synchronous views.
+"""
+
+import functools
+import json
+import logging
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+from .authentication import user_is_active
+from .circuit_breaker import CircuitOpenError
+from .config_cache import keenon_config_cache
+from .fast_json import JsonResponse
+from .keenon_async_client import get_async_client
+from .keenon_client import KeenonAPIError, ROBOT_CALL_PATH, ROBOT_LIST_PATH, STORE_LIST_PATH
+from .keenon_tokens import token_manager
+from .models import UserKeenonConfig, RobotOrder
+from .order_buffer import order_buffer
+from .response_cache import response_cache
+from .target_cache import target_cache
+from .task_pages import afetch_all_tasks, fetch_task_pages
+from .views import (
+    conditional_json_response, keenon_error_response, mirrored_task_list, task_list_stream_response,
+    ROBOT_CALL_STATUS_MESSAGES
+)
+
+logger = logging.getLogger(__name__)
+
+# Errors raised while talking to Keenon (transport failures and open circuits)
+UPSTREAM_ERRORS = (httpx.HTTPError, CircuitOpenError)
+
+
+def _authenticate(request):
+    """Run the configured DRF authentication classes against a plain Django request"""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        user_auth = authentication_class().authenticate(request)
+        if user_auth is not None:
+            return user_auth
+    return None
+
+
+def async_api_view(methods):
+    """
+    Async equivalent of ``@api_view`` + ``IsAuthenticated`` for plain
+    Django async views, since DRF views are synchronous.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+            try:
+                user_auth = await sync_to_async(_authenticate)(request)
+            except AuthenticationFailed as e:
+                return JsonResponse({'detail': str(e.detail)}, status=401)
+
+            if user_auth is None:
+                return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+            request.user = user_auth[0]
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def _get_keenon_config(request):
+    """Return the user's config with a usable token, or an error JsonResponse"""
+    try:
+        keenon_config = await keenon_config_cache.aget(request.user)
+    except UserKeenonConfig.DoesNotExist:
+        return None, JsonResponse({
+            'success': False,
+            'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
+        }, status=200)
+
+    if not await sync_to_async(token_manager.ensure_valid)(keenon_config):
+        return None, JsonResponse({
+            'success': False,
+            'error': 'Access token not found. Please refresh your token.'
+        }, status=200)
+
+    return keenon_config, None
+
+
+def _connection_error_response(e):
+    return JsonResponse({
+        'success': False,
+        'error': 'Connection error with Keenon API',
+        'details': str(e)
+    }, status=200)
+
+
+@async_api_view(['GET'])
+async def get_target_list(request):
+    """
+    Async version of views.get_target_list
+    Endpoint: /api/open/scene/v1/target/list
+    """
+    keenon_config, error_response = await _get_keenon_config(request)
+    if error_response:
+        return error_response
+
+    scene_code = request.GET.get('sceneCode', keenon_config.scene_code)
+    refresh = request.GET.get('refresh') in ('1', 'true')
+
+    try:
+        target_list = await target_cache.aget(keenon_config, scene_code, refresh=refresh)
+        return conditional_json_response(request, {
+            'success': True,
+            'data': target_list.targets
+        })
+    except KeenonAPIError as e:
+        return keenon_error_response(e.status_code, e.text)
+    except UPSTREAM_ERRORS as e:
+        return _connection_error_response(e)
+
+
+@async_api_view(['GET'])
+async def get_robot_list(request):
+    """
+    Async version of views.get_robot_list
+    Endpoint: /api/open/data/v1/store/robot/list
+    """
+    keenon_config, error_response = await _get_keenon_config(request)
+    if error_response:
+        return error_response
+
+    refresh = request.GET.get('refresh') in ('1', 'true')
+
+    try:
+        robot_data = await response_cache.aget(
+            keenon_config, ROBOT_LIST_PATH, {'storeId': keenon_config.store_id}, refresh=refresh
+        )
+        return conditional_json_response(request, {
+            'success': True,
+            'data': robot_data.get('data', [])
+        })
+    except KeenonAPIError as e:
+        return keenon_error_response(e.status_code, e.text)
+    except UPSTREAM_ERRORS as e:
+        return _connection_error_response(e)
+
+
+@async_api_view(['GET'])
+async def get_store_list(request):
+    """
+    Async version of views.get_store_list
+    Endpoint: /api/open/data/v1/store/list
+    """
+    keenon_config, error_response = await _get_keenon_config(request)
+    if error_response:
+        return error_response
+
+    refresh = request.GET.get('refresh') in ('1', 'true')
+
+    try:
+        store_data = await response_cache.aget(keenon_config, STORE_LIST_PATH, refresh=refresh)
+        return conditional_json_response(request, {
+            'success': True,
+            'data': store_data.get('data', [])
+        })
+    except KeenonAPIError as e:
+        return keenon_error_response(e.status_code, e.text)
+    except UPSTREAM_ERRORS as e:
+        return _connection_error_response(e)
+
+
+@async_api_view(['GET'])
+async def get_task_list(request):
+    """
+    Async version of views.get_task_list
+    Endpoint: /api/open/data/v1/store/task/food/list
+    """
+    keenon_config, error_response = await _get_keenon_config(request)
+    if error_response:
+        return error_response
+
+    store_id = request.GET.get('storeId', keenon_config.store_id)
+    refresh = request.GET.get('refresh') in ('1', 'true')
+
+    # The mirror and the streamed list are database/thread-pool work: reuse the sync implementations
+    if request.GET.get('source') == 'mirror':
+        return await sync_to_async(mirrored_task_list)(request, keenon_config, store_id, refresh)
+    if request.GET.get('stream') in ('1', 'true'):
+        try:
+            total, pages = await sync_to_async(fetch_task_pages)(keenon_config, store_id, refresh=refresh)
+        except KeenonAPIError as e:
+            return keenon_error_response(e.status_code, e.text)
+        except requests.exceptions.RequestException as e:
+            return _connection_error_response(e)
+        return task_list_stream_response(request, total, pages)
+
+    try:
+        total, tasks = await afetch_all_tasks(keenon_config, store_id, refresh=refresh)
+        return conditional_json_response(request, {
+            'success': True,
+            'total': total,
+            'data': tasks
+        })
+    except KeenonAPIError as e:
+        return keenon_error_response(e.status_code, e.text)
+    except UPSTREAM_ERRORS as e:
+        return _connection_error_response(e)
+
+
+@async_api_view(['POST'])
+async def call_robot_task(request):
+    """
+    Async version of views.call_robot_task
+    Recibe: {"uuid": "d3b7a3c371d51206d24755f9f2a80f62", "pointId": "4"}
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    if 'uuid' not in data or 'pointId' not in data:
+        return JsonResponse({
+            'error': 'uuid and pointId are required'
+        }, status=400)
+
+    uuid = data['uuid']
+    point_id = data['pointId']
+
+    # A stateless token outlives its user; don't call robots or queue orders for a removed account
+    if not await sync_to_async(user_is_active)(request.user):
+        return JsonResponse({'error': 'User account is inactive or no longer exists'}, status=401)
+
+    try:
+        keenon_config = await keenon_config_cache.aget(request.user)
+    except UserKeenonConfig.DoesNotExist:
+        return JsonResponse({
+            'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
+        }, status=404)
+
+    if not await sync_to_async(token_manager.ensure_valid)(keenon_config):
+        return JsonResponse({
+            'error': 'Access token not found. Please refresh your token.'
+        }, status=401)
+
+    point_name = None
+    try:
+        point_name = await target_cache.apoint_name(keenon_config, point_id)
+    except Exception as e:
+        logger.warning('Could not resolve the name of point %s: %s', point_id, e)
+
+    keenon_payload = {
+        "uuid": uuid,
+        "pointId": point_id,
+        "storeId": keenon_config.store_id
+    }
+
+    try:
+        response = await get_async_client().post(ROBOT_CALL_PATH, keenon_config, json=keenon_payload)
+    except UPSTREAM_ERRORS as e:
+        return JsonResponse({
+            'success': False,
+            'error': 'Error de conexión con Keenon',
+            'details': str(e)
+        }, status=200)
+
+    status_code = response.status_code
+    is_success = status_code in [200, 201]
+
+    order_buffer.add(RobotOrder(
+        # user_id: a stateless JWT user would load the User row here, in async context
+        user_id=request.user.pk,
+        robot_uuid=uuid,
+        point_id=point_id,
+        point_name=point_name or point_id,
+        status_code=status_code,
+        success=is_success
+    ))
+
+    try:
+        response_data = response.json()
+    except ValueError:
+        response_data = response.text
+
+    return JsonResponse({
+        'success': is_success,
+        'status_code': status_code,
+        'status_message': ROBOT_CALL_STATUS_MESSAGES.get(status_code, f'Código {status_code}'),
+        'target': {
+            'uuid': uuid,
+            'pointId': point_id
+        },
+        'keenon_response': response_data
+    }, status=200)
@@ -8,7 +8,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from django.utils import timezone
 from .models import EmailVerification
-from .email_service import send_verification_email, send_verification_success_email
+from .email_service import queue_verification_email, queue_verification_success_email
 
 
 @api_view(['POST'])
@@ -46,16 +46,17 @@ def register(request):
         
         email_verification = EmailVerification.objects.get(user=user)
         
-        email_sent = False
+        email_queued = False
         if email:
             frontend_url = request.data.get('frontend_url', 'http://localhost:5173')
-            email_sent = send_verification_email(user, email_verification.verification_token, frontend_url)
+            queue_verification_email(user, email_verification.verification_token, frontend_url)
+            email_queued = True
         
         return Response({
             'success': True,
             'message': 'User registered successfully. You can now login.' + 
                       (' Check your email to verify your account.' if email else ''),
-            'email_sent': email_sent,
+            'email_queued': email_queued,
             'user': {
                 'id': user.id,
                 'username': user.username,
@@ -105,6 +106,9 @@ def login(request):
         
         # Generate tokens (regardless of verification status)
         refresh = RefreshToken.for_user(user)
+        # Claims read by StatelessJWTAuthentication; access tokens inherit them
+        refresh['username'] = user.username
+        refresh['is_verified'] = is_verified
         
         return Response({
             'success': True,
@@ -232,8 +236,9 @@ def verify_email(request):
         email_verification.available = False  # Mark as unavailable after use
         email_verification.save()
         
-        # Send confirmation email
-        send_verification_success_email(email_verification.user)
+        # Queue confirmation email
+        if email_verification.user.email:
+            queue_verification_success_email(email_verification.user)
         
         return Response({
             'success': True,
@@ -297,21 +302,15 @@ def resend_verification_email(request):
         # Regenerate token
         email_verification.regenerate_token()
         
-        # Send verification email
+        # Queue verification email
         frontend_url = request.data.get('frontend_url', 'http://localhost:5173')
-        email_sent = send_verification_email(user, email_verification.verification_token, frontend_url)
+        queue_verification_email(user, email_verification.verification_token, frontend_url)
         
-        if email_sent:
-            return Response({
-                'success': True,
-                'message': 'Verification email sent successfully',
-                'email': user.email
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response({
-                'error': 'Failed to send verification email',
-                'message': 'Please try again later'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({
+            'success': True,
+            'message': 'Verification email queued',
+            'email': user.email
+        }, status=status.HTTP_200_OK)
         
     except Exception as e:
         return Response({
@@ -348,9 +347,9 @@ def update_profile(request):
                 email_verification.is_verified = False
                 email_verification.regenerate_token()
                 
-                # Send verification email
+                # Queue verification email
                 frontend_url = request.data.get('frontend_url', 'http://localhost:5173')
-                send_verification_email(user, email_verification.verification_token, frontend_url)
+                queue_verification_email(user, email_verification.verification_token, frontend_url)
         
         # Get current verification status
         try:
@@ -450,21 +449,15 @@ def request_email_verification(request):
         # Regenerate token
         email_verification.regenerate_token()
         
-        # Send verification email
+        # Queue verification email
         frontend_url = request.data.get('frontend_url', 'http://localhost:5173')
-        email_sent = send_verification_email(user, email_verification.verification_token, frontend_url)
+        queue_verification_email(user, email_verification.verification_token, frontend_url)
         
-        if email_sent:
-            return Response({
-                'success': True,
-                'message': 'Verification email sent successfully. Please check your inbox.',
-                'email': user.email
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response({
-                'error': 'Failed to send verification email',
-                'message': 'Please try again later'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({
+            'success': True,
+            'message': 'Verification email queued. Please check your inbox in a few minutes.',
+            'email': user.email
+        }, status=status.HTTP_200_OK)
         
     except Exception as e:
         return Response({
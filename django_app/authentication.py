@@ -0,0 +1,110 @@
+"""
+Stateless JWT authentication (opt-in with JWT_STATELESS_AUTH).
+
+simplejwt's JWTAuthentication loads the User row on every request. With
+StatelessJWTAuthentication the user is built from the signed access token
+claims instead: ``pk``, ``id``, ``username`` and ``is_verified`` (added at
+login) are answered without touching the database. Anything else, such as
+assigning ``request.user`` to a foreign key or filtering by it, loads the
+full User through a short-lived in-process cache (JWT_USER_CACHE_TTL).
+
+Claims reflect the user at login time: a user that verifies their email
+keeps ``is_verified=False`` in their token until they log in again, and a
+deactivated user keeps access until the access token expires. Views that
+write rows for the user (robot calls) check ``user_is_active`` first.
+"""
+
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .ttl_cache import TTLCache
+
+
+class UserCache:
+    """Short-lived cache of User instances for claims-authenticated requests"""
+
+    def __init__(self, ttl=None):
+        self._cache = TTLCache(settings.JWT_USER_CACHE_TTL if ttl is None else ttl, maxsize=4096)
+
+    def get(self, user_id):
+        """Return a private copy of the User. Raises User.DoesNotExist"""
+        user = self._cache.get_or_load(user_id, lambda: get_user_model().objects.get(pk=user_id))
+        return copy.copy(user)
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._cache.delete_matching(lambda key: True)
+        else:
+            self._cache.delete(user_id)
+
+
+user_cache = UserCache()
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    Authenticated user backed by token claims. Behaves like the User model
+    (it is a lazy proxy to it), but only loads it when a claim is not enough.
+    """
+
+    def __init__(self, claims):
+        self.__dict__['claims'] = claims
+        user_id = claims[jwt_settings.USER_ID_CLAIM]
+        super().__init__(lambda: user_cache.get(user_id))
+
+    @property
+    def pk(self):
+        return self.claims[jwt_settings.USER_ID_CLAIM]
+
+    id = pk
+
+    @property
+    def username(self):
+        if 'username' in self.claims:
+            return self.claims['username']
+        return self.__getattr__('username')
+
+    @property
+    def is_verified(self):
+        return bool(self.claims.get('is_verified', False))
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def __bool__(self):
+        # IsAuthenticated tests ``request.user`` before is_authenticated
+        return True
+
+
+def user_is_active(user):
+    """
+    Whether the authenticated user still exists and is active. Claims users
+    are checked against the User cache, so the answer may be up to
+    JWT_USER_CACHE_TTL seconds old.
+    """
+    if not isinstance(user, ClaimsUser):
+        return user.is_active
+    try:
+        return user_cache.get(user.pk).is_active
+    except get_user_model().DoesNotExist:
+        return False
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that returns a ClaimsUser instead of querying the User"""
+
+    def get_user(self, validated_token):
+        if jwt_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return ClaimsUser(validated_token.payload)
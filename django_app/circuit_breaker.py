@@ -0,0 +1,142 @@
+"""
+Circuit breakers for Keenon upstream calls.
+
+Each Keenon credentials + endpoint path pair has its own breaker, so one
+tenant's failing credentials cannot fail fast another's calls. Paths the
+client does not know (user-saved endpoints) share one breaker per
+credentials, which keeps the registry bounded. After
+KEENON_CIRCUIT_FAILURE_THRESHOLD consecutive failures (connection errors,
+timeouts or 5xx answers) the circuit opens and calls fail immediately for
+KEENON_CIRCUIT_RESET_TIMEOUT seconds. After that a single probe request is
+let through (half-open): success closes the circuit, failure opens it again.
+"""
+
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Upstream answers worth retrying for idempotent requests
+RETRY_STATUS_CODES = (502, 503, 504)
+
+# Breaker path shared by every path outside the registry's known paths
+OTHER_PATHS = '*'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling Keenon while a circuit is open"""
+
+    def __init__(self, path, retry_after):
+        self.path = path
+        self.retry_after = retry_after
+        super().__init__(f'Keenon endpoint {path} is unavailable, retry in {retry_after:.0f}s')
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    def __init__(self, path, failure_threshold=None, reset_timeout=None):
+        self.path = path
+        self.failure_threshold = failure_threshold or settings.KEENON_CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or settings.KEENON_CIRCUIT_RESET_TIMEOUT
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may be sent now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+
+            now = time.monotonic()
+            remaining = self.opened_at + self.reset_timeout - now
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+                self._probe_started = None
+
+            # A probe that never reported back (e.g. cancelled) is replaced after reset_timeout
+            if self.state == HALF_OPEN and (
+                    self._probe_started is None or now - self._probe_started > self.reset_timeout):
+                self._probe_started = now
+                return
+
+            raise CircuitOpenError(self.path, max(remaining, 0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe_started = None
+
+    def record_response(self, status_code):
+        if status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+class CircuitBreakerRegistry:
+    """One CircuitBreaker per credentials key and known Keenon endpoint path"""
+
+    def __init__(self, known_paths=()):
+        self.known_paths = set(known_paths)
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, credentials_key=None):
+        """
+        Return the breaker for ``path`` called with ``credentials_key``
+        (None for calls without credentials, like the token request).
+        """
+        if path not in self.known_paths:
+            path = OTHER_PATHS
+        key = (credentials_key, path)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(path)
+                self._breakers[key] = breaker
+            return breaker
+
+    def states(self, credentials_key=None):
+        """States by path of the breakers of ``credentials_key``"""
+        with self._lock:
+            return {path: breaker.state for (key, path), breaker in self._breakers.items() if key == credentials_key}
+
+    def forget(self, credentials_key):
+        """Drop the breakers of credentials that are no longer used"""
+        with self._lock:
+            for key in [key for key in self._breakers if key[0] == credentials_key]:
+                del self._breakers[key]
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+
+def retry_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    ceiling = min(settings.KEENON_RETRY_BACKOFF_MAX, settings.KEENON_RETRY_BACKOFF * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+circuit_breakers = CircuitBreakerRegistry()
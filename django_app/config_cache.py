@@ -0,0 +1,86 @@
+"""
+Per-user cache of UserKeenonConfig rows.
+
+Every protected view starts by loading the caller's Keenon configuration,
+which rarely changes. Configs are kept in process for
+KEENON_CONFIG_CACHE_TTL seconds, or in the Django cache named by
+KEENON_CONFIG_CACHE_ALIAS so several workers share (and invalidate) them.
+
+Saves and deletes invalidate the user's entry through signals (see
+models.py). Writes that bypass signals, like ``QuerySet.update()`` in the
+token manager, must call ``invalidate_many`` themselves.
+"""
+
+import copy
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import UserKeenonConfig
+from .ttl_cache import TTLCache
+
+
+class KeenonConfigCache:
+    """Cache of UserKeenonConfig instances keyed by user id"""
+
+    key_prefix = 'keenon-config:'
+
+    def __init__(self, ttl=None, alias=None):
+        self.ttl = settings.KEENON_CONFIG_CACHE_TTL if ttl is None else ttl
+        self.alias = settings.KEENON_CONFIG_CACHE_ALIAS if alias is None else alias
+        self._local = TTLCache(self.ttl, maxsize=settings.KEENON_CONFIG_CACHE_MAXSIZE)
+
+    def _shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def _lookup(self, user_id):
+        shared = self._shared()
+        if shared is not None:
+            return shared.get(f'{self.key_prefix}{user_id}')
+        return self._local.get(user_id)
+
+    def _store(self, keenon_config):
+        shared = self._shared()
+        if shared is not None:
+            shared.set(f'{self.key_prefix}{keenon_config.user_id}', keenon_config, self.ttl)
+        else:
+            self._local.set(keenon_config.user_id, keenon_config)
+
+    def get(self, user):
+        """
+        Return a private copy of the user's config (callers may modify it).
+        Raises UserKeenonConfig.DoesNotExist like ``objects.get``.
+        """
+        keenon_config = self._lookup(user.pk) if self.ttl else None
+        if keenon_config is None:
+            keenon_config = UserKeenonConfig.objects.get(user_id=user.pk)
+            if self.ttl:
+                self._store(keenon_config)
+        # Views apply refreshed tokens to the instance; keep the cached one intact
+        return copy.copy(keenon_config)
+
+    async def aget(self, user):
+        """Async counterpart of get() for the ASGI views"""
+        if self.ttl and not self.alias:
+            keenon_config = self._local.get(user.pk)
+            if keenon_config is not None:
+                return copy.copy(keenon_config)
+        return await sync_to_async(self.get)(user)
+
+    def invalidate(self, user_id):
+        self.invalidate_many([user_id])
+
+    def invalidate_many(self, user_ids):
+        shared = self._shared()
+        for user_id in user_ids:
+            self._local.delete(user_id)
+            if shared is not None:
+                shared.delete(f'{self.key_prefix}{user_id}')
+
+    def clear(self):
+        """Drop the in-process entries (shared entries expire on their own)"""
+        self._local.delete_matching(lambda key: True)
+
+
+keenon_config_cache = KeenonConfigCache()
@@ -0,0 +1,231 @@
+"""
+Durable outbox for transactional email.
+
+Views call ``enqueue`` instead of sending: the message is stored in the
+EmailOutbox table inside the request's transaction, so the response does
+not wait on the email provider. ``deliver_batch`` claims due messages and
+sends them over one backend connection; failures are retried with
+exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS, then marked failed.
+
+Delivery runs in the ``send_queued_emails`` management command and, when
+EMAIL_OUTBOX_BACKGROUND_DELIVERY is on, in a daemon thread woken after each
+enqueue commits.
+
+Messages built from a template keep the placeholders in subject and body and
+their per-recipient values in ``substitutions``. Batching backends (SendGrid)
+receive them as is, so every message of a template shares one API call;
+other backends get the rendered text.
+"""
+
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(to_email, subject, body, html_body='', user=None, kind='', substitutions=None):
+    """
+    Store an email for delivery and return the EmailOutbox row.
+    ``substitutions`` maps placeholders in subject and bodies to this
+    recipient's values.
+    """
+    message = EmailOutbox.objects.create(
+        user=user,
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        substitutions=substitutions or {}
+    )
+    transaction.on_commit(outbox_worker.wake)
+    return message
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt after ``attempts`` failures"""
+    return min(settings.EMAIL_OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1), settings.EMAIL_OUTBOX_RETRY_BACKOFF_MAX)
+
+
+def claim_batch(batch_size):
+    """Mark up to ``batch_size`` due messages as sending and return them"""
+    now = timezone.now()
+    # Messages left in "sending" by a worker that died are due again
+    EmailOutbox.objects.filter(
+        status=EmailOutbox.STATUS_SENDING,
+        claimed_at__lt=now - timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+    ).update(status=EmailOutbox.STATUS_PENDING, claimed_by=None)
+
+    due = list(EmailOutbox.objects.filter(
+        status=EmailOutbox.STATUS_PENDING,
+        next_attempt_at__lte=now
+    ).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not due:
+        return []
+
+    # Another worker may claim some of the same rows; the status check keeps each row to one
+    claim = uuid.uuid4().hex
+    EmailOutbox.objects.filter(id__in=due, status=EmailOutbox.STATUS_PENDING).update(
+        status=EmailOutbox.STATUS_SENDING,
+        claimed_by=claim,
+        claimed_at=now
+    )
+    return list(EmailOutbox.objects.filter(claimed_by=claim, status=EmailOutbox.STATUS_SENDING).order_by('id'))
+
+
+def render(text, substitutions):
+    for placeholder, value in substitutions.items():
+        text = text.replace(placeholder, str(value))
+    return text
+
+
+def _email_message(message, connection, batching=False):
+    substitutions = message.substitutions or {}
+    # Batching backends substitute per recipient themselves
+    apply = (lambda text: text) if batching else (lambda text: render(text, substitutions))
+    email = EmailMultiAlternatives(
+        subject=apply(message.subject),
+        body=apply(message.body),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[message.to_email],
+        connection=connection
+    )
+    if message.html_body:
+        email.attach_alternative(apply(message.html_body), 'text/html')
+    if batching and substitutions:
+        email.substitutions = substitutions
+    return email
+
+
+def _send_one(connection, email):
+    """Send one message; return the error, or None when it was sent"""
+    try:
+        if not connection.send_messages([email]):
+            return 'The email backend did not send the message'
+    except Exception as e:
+        return e
+    return None
+
+
+def _record(message, error=None):
+    message.attempts += 1
+    message.claimed_by = None
+    message.claimed_at = None
+    if error is None:
+        message.status = EmailOutbox.STATUS_SENT
+        message.sent_at = timezone.now()
+        message.last_error = ''
+    else:
+        message.last_error = str(error)
+        if message.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            message.status = EmailOutbox.STATUS_FAILED
+        else:
+            message.status = EmailOutbox.STATUS_PENDING
+            message.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(message.attempts))
+    message.save(update_fields=[
+        'attempts', 'status', 'sent_at', 'last_error', 'next_attempt_at', 'claimed_by', 'claimed_at'
+    ])
+
+
+def deliver_batch(batch_size=None):
+    """
+    Send one batch of due messages over a single backend connection.
+    Returns ``(sent, failed)``; failed messages are rescheduled or given up.
+    """
+    messages = claim_batch(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not messages:
+        return 0, 0
+
+    try:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+    except Exception as e:
+        logger.warning('Email backend unavailable: %s', e)
+        for message in messages:
+            _record(message, e)
+        return 0, len(messages)
+
+    try:
+        batching = hasattr(connection, 'send_batch')
+        emails = [_email_message(message, connection, batching) for message in messages]
+        if batching:
+            # Batching backends (SendGrid) send messages of one template in one API call
+            errors = {}
+            for result in connection.send_batch(emails):
+                if not result.sent:
+                    errors.setdefault(id(result.message), result.error)
+            outcomes = [errors.get(id(email)) for email in emails]
+        else:
+            outcomes = [_send_one(connection, email) for email in emails]
+    finally:
+        connection.close()
+
+    sent = failed = 0
+    for message, error in zip(messages, outcomes):
+        if error is None:
+            sent += 1
+        else:
+            logger.warning('Could not send email %s to %s: %s', message.id, message.to_email, error)
+            failed += 1
+        _record(message, error)
+    return sent, failed
+
+
+def drain(batch_size=None):
+    """Deliver batches until no message is due. Returns ``(sent, failed)``"""
+    sent = failed = 0
+    while True:
+        batch_sent, batch_failed = deliver_batch(batch_size)
+        if not batch_sent and not batch_failed:
+            return sent, failed
+        sent += batch_sent
+        failed += batch_failed
+
+
+class OutboxWorker:
+    """Delivers the outbox in a daemon thread, on enqueue and every EMAIL_OUTBOX_POLL_INTERVAL seconds"""
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def wake(self):
+        """Deliver soon (called after an enqueue commits)"""
+        if not settings.EMAIL_OUTBOX_BACKGROUND_DELIVERY:
+            return
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        """Start the delivery thread once per process"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.EMAIL_OUTBOX_POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                close_old_connections()
+                drain()
+            except Exception as e:
+                logger.exception('Email outbox delivery failed: %s', e)
+            finally:
+                close_old_connections()
+
+
+outbox_worker = OutboxWorker()
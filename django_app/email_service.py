@@ -1,17 +1,27 @@
-from django.core.mail import send_mail
-from django.conf import settings
+from .email_outbox import enqueue
 
+# Placeholders replaced per recipient (SendGrid substitutions, or by the outbox)
+USERNAME = '-username-'
+VERIFICATION_LINK = '-verification_link-'
 
-def send_verification_email(user, verification_token, frontend_url='http://localhost:5173'):
+
+def queue_verification_email(user, verification_token, frontend_url='http://localhost:5173'):
     """
-    Send verification email to user
+    Queue the verification email for the user (delivered by the email outbox)
     
     Args:
         user: Django User instance
         verification_token: UUID token for verification
         frontend_url: Frontend base URL for verification link
+    
+    Returns the EmailOutbox row.
     """
-    verification_link = f"{frontend_url}/verify-email?token={verification_token}"
+    # The body is a template shared by every verification email, so the outbox
+    # can batch them; the per-user values travel as substitutions
+    substitutions = {
+        USERNAME: user.username,
+        VERIFICATION_LINK: f"{frontend_url}/verify-email?token={verification_token}"
+    }
     
     subject = 'Verifica tu cuenta - Robot Delivery Control'
     
@@ -59,14 +69,14 @@ def send_verification_email(user, verification_token, frontend_url='http://local
         <div class="container">
             <div class="content">
                 <h1 style="color: #667eea;">¡Bienvenido a Robot Delivery Control!</h1>
-                <p>Hola <strong>{user.username}</strong>,</p>
+                <p>Hola <strong>{USERNAME}</strong>,</p>
                 <p>Gracias por registrarte. Para completar tu registro y activar tu cuenta, por favor verifica tu dirección de correo electrónico.</p>
                 <p>Haz clic en el siguiente botón para verificar tu cuenta:</p>
                 <div style="text-align: center;">
-                    <a href="{verification_link}" class="button">Verificar mi cuenta</a>
+                    <a href="{VERIFICATION_LINK}" class="button">Verificar mi cuenta</a>
                 </div>
                 <p>O copia y pega este enlace en tu navegador:</p>
-                <p style="word-break: break-all; color: #667eea;">{verification_link}</p>
+                <p style="word-break: break-all; color: #667eea;">{VERIFICATION_LINK}</p>
                 <p><strong>Este enlace expira en 24 horas.</strong></p>
                 <p>Si no creaste esta cuenta, puedes ignorar este correo de forma segura.</p>
             </div>
@@ -83,12 +93,12 @@ def send_verification_email(user, verification_token, frontend_url='http://local
     plain_message = f"""
     ¡Bienvenido a Robot Delivery Control!
     
-    Hola {user.username},
+    Hola {USERNAME},
     
     Gracias por registrarte. Para completar tu registro y activar tu cuenta, por favor verifica tu dirección de correo electrónico.
     
     Copia y pega este enlace en tu navegador para verificar tu cuenta:
-    {verification_link}
+    {VERIFICATION_LINK}
     
     Este enlace expira en 24 horas.
     
@@ -99,23 +109,13 @@ def send_verification_email(user, verification_token, frontend_url='http://local
     Este es un correo automático, por favor no respondas.
     """
     
-    try:
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
+    return enqueue(
+        user.email, subject, plain_message, html_message, user=user, kind='verification', substitutions=substitutions
+    )
 
 
-def send_verification_success_email(user):
-    """Send confirmation email after successful verification"""
+def queue_verification_success_email(user):
+    """Queue the confirmation email sent after successful verification"""
     subject = 'Cuenta verificada exitosamente - Robot Delivery Control'
     
     html_message = f"""
@@ -174,16 +174,4 @@ def send_verification_success_email(user):
     Robot Delivery Control System
     """
     
-    try:
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"Error sending confirmation email: {e}")
-        return False
+    return enqueue(user.email, subject, plain_message, html_message, user=user, kind='verification_success')
@@ -0,0 +1,113 @@
+"""
+Execution of saved Endpoints, with an optional response cache for GETs.
+
+A GET endpoint with ``cache_ttl`` set is answered from memory for that many
+seconds. Entries are keyed by ``(credentials_key, path, params)``, so identical
+diagnostic calls made with the same Keenon credentials share one upstream
+request. Only 2xx responses are cached.
+"""
+
+import json
+
+from django.conf import settings
+
+from .fast_json import RawJSON, loads
+from .keenon_client import get_client
+from .ttl_cache import TTLCache
+
+
+def response_payload(response):
+    """
+    Body of a Keenon response for our JSON replies: JSON bodies are passed
+    through as raw bytes (no re-encoding), anything else as text. A body
+    labelled JSON is still parsed once, since splicing an invalid one (e.g. a
+    proxy's HTML error page) would break the whole reply.
+    """
+    content_type = response.headers.get('Content-Type')
+    if isinstance(content_type, str) and content_type.startswith('application/json') and response.content:
+        try:
+            loads(response.content)
+        except ValueError:
+            return response.text
+        return RawJSON(response.content)
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def send_endpoint(keenon_config, endpoint):
+    """Call Keenon as described by a saved endpoint"""
+    # params and body were validated and parsed when the endpoint was saved
+    kwargs = {'params': endpoint.params or {}}
+    if endpoint.method in ('POST', 'PUT'):
+        kwargs['json'] = endpoint.body
+    return get_client().request(endpoint.method, endpoint.path, keenon_config, **kwargs)
+
+
+class EndpointResult:
+    """Outcome of executing a saved endpoint"""
+
+    def __init__(self, status_code, payload, cache_age=None):
+        self.status_code = status_code
+        self.payload = payload
+        # Seconds since the cached response was fetched; None when Keenon was called
+        self.cache_age = cache_age
+
+    @property
+    def cached(self):
+        return self.cache_age is not None
+
+
+class _NotCacheable(Exception):
+    def __init__(self, result):
+        self.result = result
+
+
+class EndpointCache:
+    """Per-endpoint TTL cache of saved GET endpoint responses"""
+
+    def __init__(self, maxsize=None):
+        self._cache = TTLCache(0, maxsize=maxsize or settings.ENDPOINT_CACHE_MAXSIZE)
+
+    @staticmethod
+    def _key(keenon_config, endpoint):
+        return (keenon_config.credentials_key, endpoint.path, json.dumps(endpoint.params or {}, sort_keys=True))
+
+    def execute(self, keenon_config, endpoint, refresh=False):
+        """
+        Execute ``endpoint`` and return an EndpointResult. ``refresh`` skips
+        a cached response. Raises requests exceptions like the Keenon client.
+        """
+        if endpoint.method != 'GET' or not endpoint.cache_ttl:
+            response = send_endpoint(keenon_config, endpoint)
+            return EndpointResult(response.status_code, response_payload(response))
+
+        key = self._key(keenon_config, endpoint)
+        if refresh:
+            self._cache.delete(key)
+
+        loaded = []
+
+        def load():
+            response = send_endpoint(keenon_config, endpoint)
+            result = EndpointResult(response.status_code, response_payload(response))
+            if not 200 <= response.status_code < 300:
+                raise _NotCacheable(result)
+            loaded.append(True)
+            return result
+
+        try:
+            result = self._cache.get_or_load(key, load, ttl=endpoint.cache_ttl)
+        except _NotCacheable as e:
+            return e.result
+
+        if loaded:
+            return result
+        return EndpointResult(result.status_code, result.payload, round(self._cache.age(key) or 0, 3))
+
+    def invalidate(self, credentials_key=None):
+        self._cache.delete_matching(lambda key: credentials_key is None or key[0] == credentials_key)
+
+
+endpoint_cache = EndpointCache()
@@ -0,0 +1,71 @@
+"""
+Fast JSON encoding for API responses.
+
+``dumps`` uses orjson when it is installed (and FAST_JSON is on), falling
+back to the standard library otherwise. Types orjson does not know
+(Decimal, lazy translations, ...) and datetimes go through Django's
+encoder, so the output matches ``django.http.JsonResponse``.
+
+``RawJSON`` wraps bytes that are already valid JSON, typically a Keenon
+response body, so they are written into the response unchanged instead of
+being decoded and encoded again.
+"""
+
+import json
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_django_encoder = DjangoJSONEncoder()
+
+
+class RawJSON:
+    """Pre-serialized JSON embedded as-is by dumps()"""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data if isinstance(data, bytes) else data.encode()
+
+
+def dumps(data):
+    """Serialize ``data`` to JSON bytes"""
+    fragments = []
+    marker = uuid.uuid4().hex
+
+    def default(obj):
+        if isinstance(obj, RawJSON):
+            fragments.append(obj.data)
+            return f'{marker}{len(fragments) - 1}'
+        return _django_encoder.default(obj)
+
+    if orjson is not None and settings.FAST_JSON:
+        content = orjson.dumps(data, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+    else:
+        content = json.dumps(data, default=default).encode()
+
+    for index, fragment in enumerate(fragments):
+        content = content.replace(f'"{marker}{index}"'.encode(), fragment, 1)
+    return content
+
+
+def loads(content):
+    if orjson is not None and settings.FAST_JSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class JsonResponse(HttpResponse):
+    """Drop-in replacement for django.http.JsonResponse that encodes with dumps()"""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,251 @@
+"""
+Server-side fleet status polling.
+
+One background poller per store fetches the robot and task lists from Keenon
+on a fixed cadence and pushes the changes to every subscriber (the SSE stream
+in views.fleet_stream). Upstream load is O(stores) instead of O(open tabs).
+
+Subscribers are thread-safe queues for WSGI streams (``subscribe``) or
+asyncio queues for ASGI streams (``asubscribe``), so an open tab under ASGI
+does not hold a thread.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .keenon_client import ROBOT_LIST_PATH, TASK_LIST_PATH
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+def robot_key(robot):
+    return str(robot.get('robotId') or robot.get('robotCode') or robot.get('uuid'))
+
+
+def task_key(task):
+    return f"{task.get('robotId')}:{task.get('startTime')}"
+
+
+def diff_items(old, new):
+    """Compare two {key: item} dicts and return the upserted items and removed keys"""
+    return {
+        'upserted': [item for key, item in new.items() if old.get(key) != item],
+        'removed': [key for key in old if key not in new]
+    }
+
+
+def format_event(event, data, event_id=None):
+    """Encode a Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class AsyncSubscriber:
+    """Subscriber queue read from an event loop and fed from the poller thread"""
+
+    def __init__(self, poller, maxsize):
+        self._poller = poller
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=maxsize)
+
+    def put_nowait(self, event):
+        """Thread-safe; overflow is handled in the loop (never raises queue.Full)"""
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The event loop is closed: the stream is gone
+            pass
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow client missed diffs: start it over from a full snapshot
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(self._poller.snapshot_event())
+
+    async def get(self, timeout):
+        """Next event; raises asyncio.TimeoutError after ``timeout`` seconds"""
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class StorePoller:
+    """Polls one store and broadcasts snapshot diffs to its subscribers"""
+
+    def __init__(self, keenon_config, store_id, interval=None):
+        self.keenon_config = keenon_config
+        self.store_id = store_id
+        self.interval = settings.FLEET_POLL_INTERVAL if interval is None else interval
+        self.version = 0
+        self.robots = {}
+        self.tasks = {}
+        self.updated_at = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshot_event(self):
+        with self._lock:
+            return format_event('snapshot', {
+                'store_id': self.store_id,
+                'version': self.version,
+                'updated_at': self.updated_at,
+                'robots': list(self.robots.values()),
+                'tasks': list(self.tasks.values())
+            }, self.version)
+
+    def poll(self):
+        """Fetch robots and tasks once and broadcast what changed"""
+        params = {'storeId': self.store_id}
+        try:
+            robot_data = response_cache.get(self.keenon_config, ROBOT_LIST_PATH, params, refresh=True)
+            task_data = response_cache.get(self.keenon_config, TASK_LIST_PATH, params, refresh=True)
+        except Exception as e:
+            logger.warning('Fleet poll failed for store %s: %s', self.store_id, e)
+            self._broadcast(format_event('error', {'store_id': self.store_id, 'error': str(e)}))
+            return None
+
+        robots = {robot_key(robot): robot for robot in robot_data.get('data', []) or []}
+        tasks = {task_key(task): task for task in (task_data.get('data') or {}).get('list', [])}
+
+        with self._lock:
+            changes = {
+                'robots': diff_items(self.robots, robots),
+                'tasks': diff_items(self.tasks, tasks)
+            }
+            first_poll = self.updated_at is None
+            self.robots, self.tasks = robots, tasks
+            self.updated_at = timezone.now()
+            changed = any(part['upserted'] or part['removed'] for part in changes.values())
+            if changed:
+                self.version += 1
+            version = self.version
+
+        if changed and not first_poll:
+            self._broadcast(format_event('diff', {
+                'store_id': self.store_id,
+                'version': version,
+                **changes
+            }, version))
+        return changes
+
+    def subscribe(self):
+        """Register a subscriber queue; the first event it receives is a full snapshot"""
+        if self.updated_at is None:
+            self.poll()
+
+        subscriber = queue.Queue(maxsize=settings.FLEET_SUBSCRIBER_QUEUE_SIZE)
+        subscriber.put(self.snapshot_event())
+        return self._register(subscriber)
+
+    async def asubscribe(self):
+        """Async counterpart of subscribe(); returns an AsyncSubscriber"""
+        if self.updated_at is None:
+            await sync_to_async(self.poll)()
+
+        subscriber = AsyncSubscriber(self, settings.FLEET_SUBSCRIBER_QUEUE_SIZE)
+        subscriber._put(self.snapshot_event())
+        return self._register(subscriber)
+
+    def _register(self, subscriber):
+        with self._lock:
+            self._subscribers.add(subscriber)
+        self.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _broadcast(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A slow client missed diffs: start it over from a full snapshot
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(self.snapshot_event())
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name=f'fleet-poller-{self.store_id}', daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # Decide to exit under the lock so a concurrent subscribe() restarts the thread
+            with self._lock:
+                if not self._subscribers:
+                    break
+            try:
+                self.poll()
+            finally:
+                close_old_connections()
+        with self._lock:
+            self._thread = None
+        fleet_pollers.discard(self)
+
+
+class FleetPollerRegistry:
+    """Keeps one StorePoller per (credentials_key, store_id)"""
+
+    def __init__(self):
+        self._pollers = {}
+        self._lock = threading.Lock()
+
+    def get(self, keenon_config, store_id=None):
+        key = (keenon_config.credentials_key, store_id or keenon_config.store_id)
+        with self._lock:
+            poller = self._pollers.get(key)
+            if poller is None:
+                poller = StorePoller(keenon_config, key[1])
+                self._pollers[key] = poller
+            return poller
+
+    def discard(self, poller):
+        """Forget a poller that stopped because nobody was listening"""
+        with self._lock:
+            for key, registered in list(self._pollers.items()):
+                if registered is poller and not poller.subscriber_count:
+                    del self._pollers[key]
+
+    def stop_all(self):
+        with self._lock:
+            pollers = list(self._pollers.values())
+            self._pollers.clear()
+        for poller in pollers:
+            poller.stop()
+
+
+fleet_pollers = FleetPollerRegistry()
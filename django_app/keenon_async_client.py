@@ -0,0 +1,121 @@
+"""
+Async HTTP client for the Keenon open API, used by the ASGI views.
+
+One pooled ``httpx.AsyncClient`` is kept per event loop, so a single ASGI
+worker can have hundreds of Keenon calls in flight over reused connections.
+"""
+
+import asyncio
+import threading
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .circuit_breaker import circuit_breakers, retry_delay, RETRY_STATUS_CODES
+from .keenon_client import KeenonClient
+
+
+class AsyncKeenonClient:
+    """Keep-alive async HTTP client for the Keenon open API"""
+
+    def __init__(self, base_url=None, timeout=None, max_connections=None, transport=None):
+        self.base_url = (base_url or settings.KEENON_BASE_URL).rstrip('/')
+        self.timeout = timeout or settings.KEENON_TIMEOUT
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.KEENON_ASYNC_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.KEENON_POOL_MAXSIZE,
+        )
+        self.transport = transport
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _client(self):
+        # httpx clients are bound to the event loop they were created in
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    limits=self.limits,
+                    transport=self.transport,
+                )
+                self._clients[loop] = client
+        return client
+
+    async def request(self, method, path, keenon_config=None, headers=None, timeout=None, **kwargs):
+        """
+        Async counterpart of KeenonClient.request: renews an expiring token
+        first and retries once after a 401.
+        """
+        if keenon_config is None:
+            return await self._send(method, path, None, headers, timeout, **kwargs)
+
+        from .keenon_tokens import token_manager
+
+        await sync_to_async(token_manager.ensure_valid)(keenon_config)
+        response = await self._send(method, path, keenon_config, headers, timeout, **kwargs)
+        if response.status_code == 401 and await sync_to_async(token_manager.refresh_after_unauthorized)(keenon_config):
+            response = await self._send(method, path, keenon_config, headers, timeout, **kwargs)
+        return response
+
+    async def _send(self, method, path, keenon_config, headers, timeout, **kwargs):
+        """Async counterpart of KeenonClient._send (circuit breaker and GET retries)"""
+        request_headers = KeenonClient.auth_headers(keenon_config) if keenon_config is not None else {}
+        if headers:
+            request_headers.update(headers)
+
+        breaker = circuit_breakers.get(path, keenon_config.credentials_key if keenon_config is not None else None)
+        retries = settings.KEENON_GET_RETRIES if method == 'GET' else 0
+        attempt = 0
+        while True:
+            breaker.before_request()
+            try:
+                response = await self._client().request(
+                    method,
+                    path,
+                    headers=request_headers,
+                    timeout=timeout or httpx.Timeout(self.timeout, connect=settings.KEENON_CONNECT_TIMEOUT),
+                    **kwargs
+                )
+            except Exception as e:
+                breaker.record_failure()
+                if attempt >= retries or isinstance(e, httpx.ReadTimeout):
+                    raise
+            else:
+                breaker.record_response(response.status_code)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                    return response
+
+            await asyncio.sleep(retry_delay(attempt))
+            attempt += 1
+
+    async def get(self, path, keenon_config=None, **kwargs):
+        return await self.request('GET', path, keenon_config, **kwargs)
+
+    async def post(self, path, keenon_config=None, **kwargs):
+        return await self.request('POST', path, keenon_config, **kwargs)
+
+    async def aclose(self):
+        """Close the client of the running event loop"""
+        with self._lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_async_client():
+    """Return the process-wide AsyncKeenonClient, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AsyncKeenonClient()
+    return _client
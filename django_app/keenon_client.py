@@ -0,0 +1,153 @@
+"""
+Shared HTTP client for the Keenon open API.
+
+Every proxy view goes through a single pooled ``requests.Session`` so the
+TCP/TLS connections to Keenon are kept alive and reused between requests.
+"""
+
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .circuit_breaker import circuit_breakers, retry_delay, RETRY_STATUS_CODES
+
+
+TOKEN_PATH = '/api/open/oauth/token'
+TARGET_LIST_PATH = '/api/open/scene/v1/target/list'
+ROBOT_CALL_PATH = '/api/open/scene/v3/robot/call/task'
+ROBOT_LIST_PATH = '/api/open/data/v1/store/robot/list'
+STORE_LIST_PATH = '/api/open/data/v1/store/list'
+TASK_LIST_PATH = '/api/open/data/v1/store/task/food/list'
+
+circuit_breakers.known_paths.update([
+    TOKEN_PATH, TARGET_LIST_PATH, ROBOT_CALL_PATH, ROBOT_LIST_PATH, STORE_LIST_PATH, TASK_LIST_PATH
+])
+
+
+class KeenonAPIError(Exception):
+    """Raised when Keenon answers with a non-success status code"""
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.text = response.text
+        super().__init__(f'Keenon API returned status {self.status_code}')
+
+
+class KeenonClient:
+    """Keep-alive HTTP client for the Keenon open API"""
+
+    def __init__(self, base_url=None, timeout=None, pool_connections=None, pool_maxsize=None):
+        self.base_url = (base_url or settings.KEENON_BASE_URL).rstrip('/')
+        self.timeout = timeout or settings.KEENON_TIMEOUT
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections or settings.KEENON_POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize or settings.KEENON_POOL_MAXSIZE,
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    @staticmethod
+    def auth_headers(keenon_config):
+        """Build the Bearer headers for a UserKeenonConfig"""
+        return {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {keenon_config.access_token}'
+        }
+
+    def request(self, method, path, keenon_config=None, headers=None, timeout=None, **kwargs):
+        """
+        Send a request to Keenon. When ``keenon_config`` is given the
+        Authorization header is built from its access token, the token is
+        renewed first if it is about to expire, and a 401 answer is retried
+        once with a freshly issued token.
+        """
+        if keenon_config is None:
+            return self._send(method, path, None, headers, timeout, **kwargs)
+
+        from .keenon_tokens import token_manager
+
+        token_manager.ensure_valid(keenon_config)
+        response = self._send(method, path, keenon_config, headers, timeout, **kwargs)
+        if response.status_code == 401 and token_manager.refresh_after_unauthorized(keenon_config):
+            response = self._send(method, path, keenon_config, headers, timeout, **kwargs)
+        return response
+
+    def _send(self, method, path, keenon_config, headers, timeout, **kwargs):
+        """
+        Send one logical request through the path's circuit breaker. Only
+        idempotent GETs are retried, with jittered exponential backoff, and
+        not after a read timeout: Keenon may still be working on the request
+        and each retry would wait the full read timeout again.
+        """
+        request_headers = self.auth_headers(keenon_config) if keenon_config is not None else {}
+        if headers:
+            request_headers.update(headers)
+
+        breaker = circuit_breakers.get(path, keenon_config.credentials_key if keenon_config is not None else None)
+        retries = settings.KEENON_GET_RETRIES if method == 'GET' else 0
+        attempt = 0
+        while True:
+            breaker.before_request()
+            try:
+                response = self.session.request(
+                    method,
+                    self.url(path),
+                    headers=request_headers,
+                    timeout=timeout or (settings.KEENON_CONNECT_TIMEOUT, self.timeout),
+                    **kwargs
+                )
+            except Exception as e:
+                breaker.record_failure()
+                if attempt >= retries or isinstance(e, requests.exceptions.ReadTimeout):
+                    raise
+            else:
+                breaker.record_response(response.status_code)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                    return response
+
+            time.sleep(retry_delay(attempt))
+            attempt += 1
+
+    def get(self, path, keenon_config=None, **kwargs):
+        return self.request('GET', path, keenon_config, **kwargs)
+
+    def post(self, path, keenon_config=None, **kwargs):
+        return self.request('POST', path, keenon_config, **kwargs)
+
+    def fetch_token(self, client_id, client_secret, timeout=None):
+        """Request a new OAuth access token with the client credentials grant"""
+        return self.post(
+            TOKEN_PATH,
+            data={
+                'client_id': client_id,
+                'client_secret': client_secret,
+                'grant_type': 'client_credentials'
+            },
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            timeout=timeout
+        )
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide KeenonClient, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = KeenonClient()
+    return _client
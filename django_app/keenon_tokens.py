@@ -0,0 +1,233 @@
+"""
+Keenon OAuth token management.
+
+Tokens are renewed shortly before ``token_expires_at`` both on demand (before
+a proxy call is sent) and by a background thread. Concurrent refreshes for
+the same ``client_id`` are coalesced into a single call to the token endpoint.
+
+Tokens are pooled per ``client_id``: every UserKeenonConfig with the same
+client credentials shares one token, so N operators of one store cost a
+single refresh instead of N.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .keenon_client import get_client
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRefreshError(Exception):
+    """Raised when Keenon does not issue a new access token"""
+
+    def __init__(self, message, status_code=None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+class IssuedToken:
+    """Token held in the pool for a client_id"""
+
+    def __init__(self, client_secret, access_token, expires_at):
+        self.client_secret = client_secret
+        self.access_token = access_token
+        self.expires_at = expires_at
+
+
+class TokenManager:
+    """Renews UserKeenonConfig access tokens before they expire"""
+
+    def __init__(self, refresh_margin=None, check_interval=None):
+        self.refresh_margin = timedelta(seconds=(
+            settings.KEENON_TOKEN_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        ))
+        self.check_interval = settings.KEENON_TOKEN_REFRESH_INTERVAL if check_interval is None else check_interval
+        self._pool = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._thread = None
+
+    def _lock_for(self, client_id):
+        with self._locks_lock:
+            return self._locks.setdefault(client_id, threading.Lock())
+
+    def _is_fresh(self, expires_at):
+        return expires_at is not None and timezone.now() + self.refresh_margin < expires_at
+
+    def needs_refresh(self, keenon_config):
+        """True when the token is missing or expires within the refresh margin"""
+        return not keenon_config.access_token or not self._is_fresh(keenon_config.token_expires_at)
+
+    def pooled_token(self, keenon_config):
+        """
+        Return the fresh pooled token for the config's credentials, if any.
+        The client_secret must match so a client_id alone never grants a token.
+        """
+        issued = self._pool.get(keenon_config.client_id)
+        if (issued is not None
+                and issued.client_secret == keenon_config.client_secret
+                and self._is_fresh(issued.expires_at)):
+            return issued
+        return None
+
+    def refresh(self, keenon_config, force=False):
+        """
+        Renew the token of ``keenon_config`` and save it.
+
+        Callers that wait on a refresh already in flight for the same
+        client_id reuse its result instead of requesting another token.
+        With ``force`` the current token is treated as rejected, so a new
+        one is requested unless another caller has already replaced it.
+        """
+        client_id = keenon_config.client_id
+        stale_token = keenon_config.access_token
+
+        with self._lock_for(client_id):
+            if not force and not self.needs_refresh(keenon_config):
+                return keenon_config
+
+            issued = self.pooled_token(keenon_config)
+            if issued is not None and issued.access_token != stale_token:
+                self._apply(keenon_config, issued)
+                return keenon_config
+
+            issued = self._request_token(keenon_config)
+            self._pool[client_id] = issued
+            self._store(keenon_config, issued)
+            return keenon_config
+
+    def forget(self, client_id=None):
+        """Drop remembered tokens, e.g. after credentials change"""
+        with self._locks_lock:
+            if client_id is None:
+                self._pool.clear()
+            else:
+                self._pool.pop(client_id, None)
+
+    def ensure_valid(self, keenon_config):
+        """
+        Refresh the token if it is missing or about to expire.
+        Returns True when the config holds an access token afterwards.
+        """
+        self.start()
+        if self.needs_refresh(keenon_config):
+            issued = self.pooled_token(keenon_config)
+            if issued is not None:
+                self._apply(keenon_config, issued)
+            elif keenon_config.client_id and keenon_config.client_secret:
+                try:
+                    self.refresh(keenon_config)
+                except Exception as e:
+                    logger.warning('Could not refresh Keenon token for client %s: %s', keenon_config.client_id, e)
+        return bool(keenon_config.access_token)
+
+    def refresh_after_unauthorized(self, keenon_config):
+        """Renew a token Keenon answered 401 for. Returns True if the request can be retried"""
+        rejected_token = keenon_config.access_token
+        try:
+            self.refresh(keenon_config, force=True)
+        except Exception as e:
+            logger.warning('Could not refresh Keenon token for client %s: %s', keenon_config.client_id, e)
+            return False
+        return keenon_config.access_token != rejected_token
+
+    @staticmethod
+    def _request_token(keenon_config):
+        response = get_client().fetch_token(keenon_config.client_id, keenon_config.client_secret)
+
+        if response.status_code != 200:
+            raise TokenRefreshError(
+                f'Failed to refresh token (Status: {response.status_code})',
+                status_code=response.status_code,
+                response=response.text
+            )
+
+        response_data = response.json()
+        if 'access_token' not in response_data:
+            raise TokenRefreshError('No access_token in response', status_code=400, response=response_data)
+
+        expires_in = response_data.get('expires_in', 3600)
+        return IssuedToken(
+            keenon_config.client_secret,
+            response_data['access_token'],
+            timezone.now() + timedelta(seconds=expires_in)
+        )
+
+    @staticmethod
+    def _apply(keenon_config, issued):
+        keenon_config.access_token = issued.access_token
+        keenon_config.token_expires_at = issued.expires_at
+
+    @classmethod
+    def _store(cls, keenon_config, issued):
+        """Save a new token on every config that shares these credentials"""
+        from .config_cache import keenon_config_cache
+        from .models import UserKeenonConfig
+
+        cls._apply(keenon_config, issued)
+        sharing = UserKeenonConfig.objects.filter(
+            client_id=keenon_config.client_id,
+            client_secret=keenon_config.client_secret
+        )
+        sharing.update(
+            access_token=issued.access_token,
+            token_expires_at=issued.expires_at,
+            updated_at=timezone.now()
+        )
+        # update() sends no post_save signal
+        keenon_config_cache.invalidate_many(sharing.values_list('user_id', flat=True))
+
+    def refresh_expiring(self):
+        """Renew every still-valid token that expires within the refresh margin, once per credential"""
+        from .models import UserKeenonConfig
+
+        now = timezone.now()
+        expiring = UserKeenonConfig.objects.filter(
+            token_expires_at__gt=now,
+            token_expires_at__lte=now + self.refresh_margin
+        ).exclude(access_token__isnull=True).exclude(access_token='')
+
+        refreshed = 0
+        seen = set()
+        for keenon_config in expiring:
+            credentials = (keenon_config.client_id, keenon_config.client_secret)
+            if credentials in seen:
+                continue
+            seen.add(credentials)
+            try:
+                self.refresh(keenon_config)
+                refreshed += 1
+            except Exception as e:
+                logger.warning('Could not refresh Keenon token for client %s: %s', keenon_config.client_id, e)
+        return refreshed
+
+    def start(self):
+        """Start the background refresh thread once per process, if enabled"""
+        if self._thread is not None or not settings.KEENON_TOKEN_BACKGROUND_REFRESH:
+            return
+        with self._locks_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='keenon-token-refresh', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                close_old_connections()
+                self.refresh_expiring()
+            except Exception as e:
+                logger.exception('Keenon token refresh loop failed: %s', e)
+            finally:
+                close_old_connections()
+
+
+token_manager = TokenManager()
@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from django_app.order_stats import rebuild_point_usage
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user point usage counters from the robot order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Only rebuild the counters of this user')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['username']:
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['username']} does not exist")
+
+        count = rebuild_point_usage(user)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} point usage counters'))
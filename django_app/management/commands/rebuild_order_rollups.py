@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from datetime import datetime
+
+from django_app.order_stats import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily robot order rollups from the order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Only rebuild the rollups of this user')
+        parser.add_argument('--since', help='Only rebuild buckets from this date on (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['username']:
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['username']} does not exist")
+
+        since = None
+        if options['since']:
+            day = parse_date(options['since'])
+            if day is None:
+                raise CommandError(f"Invalid date: {options['since']}")
+            since = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+        count = rebuild_rollups(user, since)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} order rollups'))
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Count
+
+from django_app.email_outbox import drain
+from django_app.models import EmailOutbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the email outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages sent per backend connection')
+        parser.add_argument('--loop', action='store_true', help='Keep running and deliver new messages as they become due')
+        parser.add_argument('--interval', type=float, default=None, help='Seconds between deliveries with --loop')
+        parser.add_argument('--status', action='store_true', help='Only print the number of messages per status')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            counts = dict(EmailOutbox.objects.values_list('status').annotate(count=Count('id')))
+            for value, label in EmailOutbox.STATUS_CHOICES:
+                self.stdout.write(f'{label}: {counts.get(value, 0)}')
+            return
+
+        interval = options['interval'] or settings.EMAIL_OUTBOX_POLL_INTERVAL
+        while True:
+            sent, failed = drain(options['batch_size'])
+            if sent or failed or not options['loop']:
+                style = self.style.SUCCESS if not failed else self.style.WARNING
+                self.stdout.write(style(f'{sent} emails sent, {failed} failed'))
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(interval)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_app.models import UserKeenonConfig, TaskSyncState
+from django_app.task_mirror import config_for, sync_store
+
+
+class Command(BaseCommand):
+    help = 'Pull Keenon tasks into the local task mirror'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Only sync the store of this user (starts mirroring it)')
+        parser.add_argument('--full', action='store_true', help='Pull every task instead of the delta since the watermark')
+
+    def handle(self, *args, **options):
+        if options['username']:
+            try:
+                targets = [(UserKeenonConfig.objects.get(user__username=options['username']), None)]
+            except UserKeenonConfig.DoesNotExist:
+                raise CommandError(f"User {options['username']} has no Keenon configuration")
+        else:
+            targets = []
+            for state in TaskSyncState.objects.all():
+                keenon_config = config_for(state)
+                if keenon_config is not None:
+                    targets.append((keenon_config, state.store_id))
+
+        for keenon_config, store_id in targets:
+            store_id = store_id or keenon_config.store_id
+            try:
+                count = sync_store(keenon_config, store_id, full=options['full'])
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'Store {store_id}: {e}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(f'Store {store_id}: {count} tasks synced'))
@@ -0,0 +1,144 @@
+"""
+Negotiated response compression for API payloads.
+
+Like ``django.middleware.gzip.GZipMiddleware`` but:
+
+- Brotli is preferred when the ``brotli`` package is installed and the client
+  accepts ``br``; gzip is used otherwise.
+- Only COMPRESSION_CONTENT_TYPES are compressed, and regular responses only
+  from COMPRESSION_MIN_SIZE bytes on.
+- Streaming responses are compressed chunk by chunk with a flush after each
+  chunk, so streamed task lists and exports still arrive progressively.
+  Server-Sent Events are left alone.
+"""
+
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+def accepted_encodings(header):
+    """Return the content codings accepted by an Accept-Encoding header"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+class _GzipStream:
+    def __init__(self):
+        # wbits=31: gzip container
+        self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+    def compress_all(self, data):
+        return self._compressor.compress(data) + self.finish()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+    def compress_all(self, data):
+        return self._compressor.process(data) + self.finish()
+
+
+COMPRESSORS = {'gzip': _GzipStream}
+if brotli is not None:
+    COMPRESSORS['br'] = _BrotliStream
+
+
+def _compress_chunks(chunks, stream):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+async def _acompress_chunks(chunks, stream):
+    async for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress JSON/CSV/NDJSON responses with brotli or gzip"""
+
+    def _encoding_for(self, request):
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in COMPRESSORS:
+                return encoding
+        return None
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 304:
+            return response
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self._encoding_for(request)
+        if encoding is None:
+            return response
+
+        stream = COMPRESSORS[encoding]()
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _acompress_chunks(response.streaming_content, stream)
+            else:
+                response.streaming_content = _compress_chunks(response.streaming_content, stream)
+            # The compressed size is unknown until the stream ends
+            del response.headers['Content-Length']
+        else:
+            compressed = stream.compress_all(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag must not match the compressed representation (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
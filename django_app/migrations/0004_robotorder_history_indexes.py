@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-17 13:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0003_robotorder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='robotorder',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='robot_orders_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='robotorder',
+            index=models.Index(fields=['user', 'robot_uuid', '-created_at'], name='robot_orders_user_robot'),
+        ),
+        migrations.AddIndex(
+            model_name='robotorder',
+            index=models.Index(fields=['user', 'point_id', '-created_at'], name='robot_orders_user_point'),
+        ),
+    ]
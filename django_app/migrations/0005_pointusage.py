@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-17 13:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0004_robotorder_history_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('point_id', models.CharField(max_length=255)),
+                ('point_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('last_used_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='point_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'point_usage',
+                'indexes': [models.Index(fields=['user', '-count'], name='point_usage_user_count'), models.Index(fields=['user', '-last_used_at'], name='point_usage_user_last_used')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pointusage',
+            constraint=models.UniqueConstraint(fields=('user', 'point_id'), name='point_usage_user_point'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-17 13:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0005_pointusage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour/day, in TIME_ZONE')),
+                ('robot_uuid', models.CharField(max_length=255)),
+                ('point_id', models.CharField(max_length=255)),
+                ('status_code', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('success_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'order_rollups',
+                'indexes': [models.Index(fields=['user', 'granularity', 'bucket'], name='order_rollups_user_bucket')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='orderrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'granularity', 'bucket', 'robot_uuid', 'point_id', 'status_code'), name='order_rollups_unique_bucket'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.1 on 2026-10-17 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0006_orderrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=255)),
+                ('store_id', models.CharField(max_length=100)),
+                ('watermark', models.CharField(blank=True, help_text='Tasks started before this are final', max_length=64, null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_full_sync_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'task_sync_states',
+            },
+        ),
+        migrations.CreateModel(
+            name='KeenonTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=255)),
+                ('store_id', models.CharField(max_length=100)),
+                ('robot_id', models.CharField(max_length=255)),
+                ('start_time', models.CharField(max_length=64)),
+                ('end_time', models.CharField(blank=True, max_length=64, null=True)),
+                ('task_status', models.IntegerField(blank=True, null=True)),
+                ('task_mode', models.IntegerField(blank=True, null=True)),
+                ('data', models.JSONField(help_text='Task as returned by Keenon')),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'keenon_tasks',
+                'ordering': ['-start_time'],
+                'indexes': [models.Index(fields=['client_id', 'store_id', '-start_time'], name='keenon_tasks_store_start'), models.Index(fields=['client_id', 'store_id', 'task_status', '-start_time'], name='keenon_tasks_store_status'), models.Index(fields=['client_id', 'store_id', 'robot_id', '-start_time'], name='keenon_tasks_store_robot')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='keenontask',
+            constraint=models.UniqueConstraint(fields=('client_id', 'store_id', 'robot_id', 'start_time'), name='keenon_tasks_unique_task'),
+        ),
+        migrations.AddConstraint(
+            model_name='tasksyncstate',
+            constraint=models.UniqueConstraint(fields=('client_id', 'store_id'), name='task_sync_states_unique_store'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+import json
+
+from django.db import migrations, models
+
+
+def parse_text_fields(apps, schema_editor):
+    """Copy the JSON strings into the new fields; text that never parsed was ignored on execution"""
+    Endpoint = apps.get_model('django_app', 'Endpoint')
+    for endpoint in Endpoint.objects.all():
+        try:
+            params = json.loads(endpoint.params) if endpoint.params else {}
+        except ValueError:
+            params = {}
+        try:
+            body = json.loads(endpoint.body) if endpoint.body else None
+        except ValueError:
+            body = None
+        endpoint.params_json = params if isinstance(params, dict) else {}
+        endpoint.body_json = body
+        endpoint.save(update_fields=['params_json', 'body_json'])
+
+
+def dump_json_fields(apps, schema_editor):
+    Endpoint = apps.get_model('django_app', 'Endpoint')
+    for endpoint in Endpoint.objects.all():
+        endpoint.params = json.dumps(endpoint.params_json) if endpoint.params_json else ''
+        endpoint.body = json.dumps(endpoint.body_json) if endpoint.body_json is not None else ''
+        endpoint.save(update_fields=['params', 'body'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0007_keenon_task_mirror'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='endpoint',
+            name='params_json',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='endpoint',
+            name='body_json',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(parse_text_fields, dump_json_fields),
+        migrations.RemoveField(
+            model_name='endpoint',
+            name='params',
+        ),
+        migrations.RemoveField(
+            model_name='endpoint',
+            name='body',
+        ),
+        migrations.RenameField(
+            model_name='endpoint',
+            old_name='params_json',
+            new_name='params',
+        ),
+        migrations.RenameField(
+            model_name='endpoint',
+            old_name='body_json',
+            new_name='body',
+        ),
+    ]
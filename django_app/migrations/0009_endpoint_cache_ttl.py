@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0008_endpoint_json_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='endpoint',
+            name='cache_ttl',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds GET responses are served from cache (empty: no cache)', null=True),
+        ),
+    ]
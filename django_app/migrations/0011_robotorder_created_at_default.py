@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-17 13:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0010_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='robotorder',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0011_robotorder_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasksyncstate',
+            name='credentials',
+            field=models.CharField(blank=True, default='', help_text='credentials_key of the configuration that last synced the store', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0012_task_sync_state_credentials'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='substitutions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def backfill_point_usage(apps, schema_editor):
+    """Fill PointUsage from the order history saved before the counters existed"""
+    from django_app.order_stats import rebuild_point_usage
+
+    rebuild_point_usage(
+        order_model=apps.get_model('django_app', 'RobotOrder'),
+        usage_model=apps.get_model('django_app', 'PointUsage')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0013_email_outbox_substitutions'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_point_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def backfill_order_rollups(apps, schema_editor):
+    """Fill the hourly/daily OrderRollup buckets from the order history saved before them"""
+    from django_app.order_stats import rebuild_rollups
+
+    rebuild_rollups(
+        order_model=apps.get_model('django_app', 'RobotOrder'),
+        rollup_model=apps.get_model('django_app', 'OrderRollup')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0014_backfill_point_usage'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_rollups, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 import uuid
 from datetime import timedelta
 from django.utils import timezone
+from django.utils.crypto import salted_hmac
 
 
 class UserKeenonConfig(models.Model):
@@ -38,6 +39,23 @@ class UserKeenonConfig(models.Model):
         if not self.access_token or not self.token_expires_at:
             return False
         return timezone.now() < self.token_expires_at
+    
+    @property
+    def credentials_key(self):
+        """
+        Fingerprint of (client_id, client_secret). Data shared between users
+        (caches, pollers, the task mirror) is keyed by it, never by client_id
+        alone, so only callers holding the same secret can read it.
+        """
+        return salted_hmac('keenon-credentials', f'{self.client_id}\0{self.client_secret}').hexdigest()[:32]
+
+
+@receiver(post_save, sender=UserKeenonConfig)
+@receiver(post_delete, sender=UserKeenonConfig)
+def invalidate_keenon_config_cache(sender, instance, **kwargs):
+    """Drop the cached config when it is saved (views, admin) or deleted"""
+    from .config_cache import keenon_config_cache
+    keenon_config_cache.invalidate(instance.user_id)
 
 
 class Endpoint(models.Model):
@@ -52,8 +70,9 @@ class Endpoint(models.Model):
     name = models.CharField(max_length=255)
     method = models.CharField(max_length=10, choices=METHOD_CHOICES, default='GET')
     path = models.CharField(max_length=500)  # Without base URL
-    params = models.TextField(blank=True, null=True)  # JSON string
-    body = models.TextField(blank=True, null=True)  # JSON string
+    params = models.JSONField(default=dict, blank=True)  # Query parameters, validated on save
+    body = models.JSONField(blank=True, null=True)  # JSON request body, validated on save
+    cache_ttl = models.PositiveIntegerField(null=True, blank=True, help_text='Seconds GET responses are served from cache (empty: no cache)')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -116,6 +135,14 @@ def create_email_verification(sender, instance, created, **kwargs):
         EmailVerification.objects.create(user=instance)
 
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Drop the User cached for stateless JWT requests when it changes"""
+    from .authentication import user_cache
+    user_cache.invalidate(instance.pk)
+
+
 class RobotOrder(models.Model):
     """Model to store robot call history"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='robot_orders')
@@ -124,11 +151,168 @@ class RobotOrder(models.Model):
     point_name = models.CharField(max_length=255, blank=True, null=True)
     status_code = models.IntegerField()
     success = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Stamped when the order is queued, not when the write-behind buffer saves it
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         db_table = 'robot_orders'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a user's history on (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='robot_orders_user_created'),
+            models.Index(fields=['user', 'robot_uuid', '-created_at'], name='robot_orders_user_robot'),
+            models.Index(fields=['user', 'point_id', '-created_at'], name='robot_orders_user_point'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.point_name or self.point_id} - {self.created_at}"
+
+
+class PointUsage(models.Model):
+    """Per-user robot call counter for each point, kept up to date as orders are saved"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='point_usage')
+    point_id = models.CharField(max_length=255)
+    point_name = models.CharField(max_length=255, blank=True, null=True)
+    count = models.PositiveIntegerField(default=0)
+    last_used_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'point_usage'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'point_id'], name='point_usage_user_point'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-count'], name='point_usage_user_count'),
+            models.Index(fields=['user', '-last_used_at'], name='point_usage_user_last_used'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.point_name or self.point_id} ({self.count})"
+
+
+class OrderRollup(models.Model):
+    """Robot call counts per time bucket, robot, point and status code"""
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='order_rollups')
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField(help_text='Start of the hour/day, in TIME_ZONE')
+    robot_uuid = models.CharField(max_length=255)
+    point_id = models.CharField(max_length=255)
+    status_code = models.IntegerField()
+    count = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'order_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'granularity', 'bucket', 'robot_uuid', 'point_id', 'status_code'],
+                name='order_rollups_unique_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'granularity', 'bucket'], name='order_rollups_user_bucket'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.granularity} {self.bucket} - {self.count}"
+
+
+class KeenonTask(models.Model):
+    """Local mirror of a Keenon food-delivery task, keyed like the fleet poller (robotId, startTime)"""
+    client_id = models.CharField(max_length=255)
+    store_id = models.CharField(max_length=100)
+    robot_id = models.CharField(max_length=255)
+    start_time = models.CharField(max_length=64)
+    end_time = models.CharField(max_length=64, blank=True, null=True)
+    task_status = models.IntegerField(null=True, blank=True)
+    task_mode = models.IntegerField(null=True, blank=True)
+    data = models.JSONField(help_text='Task as returned by Keenon')
+    synced_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'keenon_tasks'
+        ordering = ['-start_time']
+        constraints = [
+            models.UniqueConstraint(fields=['client_id', 'store_id', 'robot_id', 'start_time'], name='keenon_tasks_unique_task'),
+        ]
+        indexes = [
+            models.Index(fields=['client_id', 'store_id', '-start_time'], name='keenon_tasks_store_start'),
+            models.Index(fields=['client_id', 'store_id', 'task_status', '-start_time'], name='keenon_tasks_store_status'),
+            models.Index(fields=['client_id', 'store_id', 'robot_id', '-start_time'], name='keenon_tasks_store_robot'),
+        ]
+    
+    def __str__(self):
+        return f"{self.store_id} - {self.robot_id} - {self.start_time}"
+
+
+class TaskSyncState(models.Model):
+    """Delta sync watermark of the task mirror for one store"""
+    client_id = models.CharField(max_length=255)
+    store_id = models.CharField(max_length=100)
+    watermark = models.CharField(max_length=64, blank=True, null=True, help_text='Tasks started before this are final')
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    last_full_sync_at = models.DateTimeField(null=True, blank=True)
+    credentials = models.CharField(
+        max_length=64, blank=True, default='',
+        help_text='credentials_key of the configuration that last synced the store'
+    )
+    
+    class Meta:
+        db_table = 'task_sync_states'
+        constraints = [
+            models.UniqueConstraint(fields=['client_id', 'store_id'], name='task_sync_states_unique_store'),
+        ]
+    
+    def __str__(self):
+        return f"{self.store_id} - {self.watermark or 'never synced'}"
+
+
+class EmailOutbox(models.Model):
+    """Email waiting to be delivered by the outbox worker (see email_outbox.py)"""
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='queued_emails')
+    kind = models.CharField(max_length=50, blank=True, help_text='e.g. verification, verification_success')
+    to_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    # Per-recipient values for placeholders in subject/body, so one template batches across recipients
+    substitutions = models.JSONField(default=dict, blank=True)
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Worker that claimed the message while it is being sent
+    claimed_by = models.CharField(max_length=32, blank=True, null=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'email_outbox'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_due'),
+        ]
+    
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} ({self.status})"
@@ -0,0 +1,140 @@
+"""
+Write-behind buffer for RobotOrder history.
+
+Robot call views hand their RobotOrder rows to ``order_buffer`` instead of
+saving them inline. A background thread writes them with one ``bulk_create``
+every ROBOT_ORDER_FLUSH_INTERVAL seconds, or as soon as ROBOT_ORDER_BUFFER_SIZE
+rows are waiting, so the history insert is off the robot-call latency path and
+SQLite's write lock is taken once per batch instead of once per call.
+Derived counters are updated in the same write (see order_stats).
+
+Pending rows are flushed at interpreter exit. Readers of the history call
+``flush()`` first so users always see their own latest calls.
+
+A batch rejected by the database (e.g. an order whose user was deleted
+meanwhile) is saved row by row and only the offending rows are dropped. On
+other errors the batch is kept for the next flush, but the buffer never holds
+more than ROBOT_ORDER_MAX_PENDING rows: the oldest are dropped first.
+"""
+
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections
+
+from .order_stats import record_orders
+
+logger = logging.getLogger(__name__)
+
+
+class OrderBuffer:
+    """Collects unsaved RobotOrder instances and saves them in batches"""
+
+    def __init__(self):
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, order):
+        self.extend([order])
+
+    def extend(self, orders):
+        """Queue unsaved RobotOrder instances for the next flush"""
+        if not orders:
+            return
+        with self._lock:
+            self._pending.extend(orders)
+            self._trim()
+            full = len(self._pending) >= settings.ROBOT_ORDER_BUFFER_SIZE
+        self.start()
+        if full:
+            self._wake.set()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _trim(self):
+        # Called with self._lock held
+        excess = len(self._pending) - settings.ROBOT_ORDER_MAX_PENDING
+        if excess > 0:
+            del self._pending[:excess]
+            logger.warning('Robot order buffer full, dropped the %d oldest unsaved orders', excess)
+
+    def flush(self):
+        """Save every pending order now; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                orders, self._pending = self._pending, []
+            if not orders:
+                return 0
+            try:
+                record_orders(orders, batch_size=settings.ROBOT_ORDER_BUFFER_SIZE)
+            except (IntegrityError, DataError):
+                return self._save_each(orders)
+            except Exception:
+                self._requeue(orders)
+                raise
+            return len(orders)
+
+    def _requeue(self, orders):
+        # Keep the rows for the next attempt instead of losing history
+        with self._lock:
+            self._pending[:0] = orders
+            self._trim()
+
+    def _save_each(self, orders):
+        """Save orders one at a time, dropping the ones the database rejects"""
+        written = 0
+        for index, order in enumerate(orders):
+            # bulk_create may have assigned ids before the batch was rolled back
+            order.pk = None
+            try:
+                record_orders([order])
+            except (IntegrityError, DataError) as e:
+                logger.error('Dropped robot order for user %s, point %s: %s', order.user_id, order.point_id, e)
+            except Exception:
+                self._requeue(orders[index:])
+                raise
+            else:
+                written += 1
+        return written
+
+    def start(self):
+        """Start the flush thread once per process"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='robot-order-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.ROBOT_ORDER_FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception as e:
+                logger.exception('Robot order flush failed: %s', e)
+            finally:
+                close_old_connections()
+
+
+order_buffer = OrderBuffer()
+
+
+@atexit.register
+def _drain():
+    try:
+        written = order_buffer.flush()
+    except Exception as e:
+        logger.exception('Could not save %d pending robot orders at shutdown: %s', len(order_buffer), e)
+    else:
+        if written:
+            logger.info('Saved %d pending robot orders at shutdown', written)
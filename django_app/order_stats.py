@@ -0,0 +1,210 @@
+"""
+Aggregates derived from RobotOrder history.
+
+``record_orders`` is the single place new orders are written: it inserts the
+rows and applies their increments to the PointUsage counters in the same
+transaction, so the dashboard reads one indexed row per point instead of
+grouping the whole history. Hourly and daily OrderRollup buckets are kept the
+same way for the analytics endpoint.
+
+``rebuild_point_usage`` and ``rebuild_rollups`` recompute the aggregates from
+scratch (see the ``backfill_point_usage`` and ``rebuild_order_rollups``
+commands).
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateTimeField, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Greatest, TruncDay, TruncHour
+
+from django.utils import timezone
+
+from .models import OrderRollup, PointUsage, RobotOrder
+
+ROLLUP_GRANULARITIES = (OrderRollup.HOUR, OrderRollup.DAY)
+
+
+def record_orders(orders, batch_size=None):
+    """Insert unsaved RobotOrder instances and update the derived counters"""
+    with transaction.atomic():
+        RobotOrder.objects.bulk_create(orders, batch_size=batch_size)
+        record_point_usage(orders)
+        record_rollups(orders)
+
+
+def record_point_usage(orders):
+    """Add saved orders to the (user, point_id) usage counters"""
+    usage = {}
+    for order in orders:
+        key = (order.user_id, order.point_id)
+        count, last_used_at, point_name = usage.get(key, (0, None, None))
+        if last_used_at is None or order.created_at >= last_used_at:
+            last_used_at, point_name = order.created_at, order.point_name
+        usage[key] = (count + 1, last_used_at, point_name)
+
+    for (user_id, point_id), (count, last_used_at, point_name) in usage.items():
+        _upsert(
+            PointUsage,
+            {'user_id': user_id, 'point_id': point_id},
+            {
+                'count': F('count') + count,
+                'last_used_at': Greatest('last_used_at', Value(last_used_at, output_field=DateTimeField())),
+                'point_name': point_name
+            },
+            {'count': count, 'last_used_at': last_used_at, 'point_name': point_name}
+        )
+
+
+def bucket_start(moment, granularity):
+    """Start of the hour or day (in TIME_ZONE) that contains ``moment``"""
+    local = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    if granularity == OrderRollup.DAY:
+        local = local.replace(hour=0)
+    return local
+
+
+def record_rollups(orders):
+    """Add saved orders to the hourly and daily OrderRollup buckets"""
+    buckets = {}
+    for order in orders:
+        for granularity in ROLLUP_GRANULARITIES:
+            key = (order.user_id, granularity, bucket_start(order.created_at, granularity),
+                   order.robot_uuid, order.point_id, order.status_code)
+            count, success_count = buckets.get(key, (0, 0))
+            buckets[key] = (count + 1, success_count + int(order.success))
+
+    for (user_id, granularity, bucket, robot_uuid, point_id, status_code), (count, success_count) in buckets.items():
+        _upsert(
+            OrderRollup,
+            {
+                'user_id': user_id, 'granularity': granularity, 'bucket': bucket,
+                'robot_uuid': robot_uuid, 'point_id': point_id, 'status_code': status_code
+            },
+            {'count': F('count') + count, 'success_count': F('success_count') + success_count},
+            {'count': count, 'success_count': success_count}
+        )
+
+
+def _upsert(model, lookup, changes, defaults):
+    """Apply ``changes`` to the row matching ``lookup``, creating it from ``defaults`` if missing"""
+    rows = model.objects.filter(**lookup)
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **defaults)
+    except IntegrityError:
+        # Another process created the row first
+        rows.update(**changes)
+
+
+def rebuild_point_usage(user=None, order_model=RobotOrder, usage_model=PointUsage):
+    """
+    Recompute PointUsage from RobotOrder history; returns the number of
+    counters. Data migrations pass their historical models.
+    """
+    orders = order_model.objects.all()
+    if user is not None:
+        orders = orders.filter(user=user)
+
+    latest_name = orders.filter(
+        user_id=OuterRef('user_id'), point_id=OuterRef('point_id')
+    ).order_by('-created_at', '-id').values('point_name')[:1]
+
+    rows = orders.order_by().values('user_id', 'point_id').annotate(
+        count=Count('id'),
+        last_used_at=Max('created_at'),
+        point_name=Subquery(latest_name)
+    )
+    counters = [usage_model(**row) for row in rows]
+
+    with transaction.atomic():
+        existing = usage_model.objects.all()
+        if user is not None:
+            existing = existing.filter(user=user)
+        existing.delete()
+        usage_model.objects.bulk_create(counters, batch_size=500)
+    return len(counters)
+
+
+def rebuild_rollups(user=None, since=None, order_model=RobotOrder, rollup_model=OrderRollup):
+    """
+    Recompute OrderRollup buckets from RobotOrder history, optionally only for
+    one user and/or from the bucket containing ``since`` on. Returns the number
+    of rollup rows written. Data migrations pass their historical models.
+    """
+    truncs = {OrderRollup.HOUR: TruncHour, OrderRollup.DAY: TruncDay}
+    tzinfo = timezone.get_current_timezone()
+    written = 0
+
+    with transaction.atomic():
+        for granularity in ROLLUP_GRANULARITIES:
+            orders = order_model.objects.all()
+            existing = rollup_model.objects.filter(granularity=granularity)
+            if user is not None:
+                orders = orders.filter(user=user)
+                existing = existing.filter(user=user)
+            if since is not None:
+                start = bucket_start(since, granularity)
+                orders = orders.filter(created_at__gte=start)
+                existing = existing.filter(bucket__gte=start)
+
+            rows = orders.order_by().annotate(
+                bucket=truncs[granularity]('created_at', tzinfo=tzinfo)
+            ).values('user_id', 'bucket', 'robot_uuid', 'point_id', 'status_code').annotate(
+                count=Count('id'),
+                success_count=Count('id', filter=Q(success=True))
+            )
+
+            existing.delete()
+            rollups = [rollup_model(granularity=granularity, **row) for row in rows]
+            rollup_model.objects.bulk_create(rollups, batch_size=500)
+            written += len(rollups)
+    return written
+
+
+def order_analytics(user, granularity, start=None, end=None, group_by=None, robot_uuid=None, point_id=None):
+    """
+    Call counts, success rates and status code distribution per bucket,
+    optionally split by ``robot_uuid`` or ``point_id`` (``group_by``).
+    The range covers whole buckets: ``start`` is rounded down to its bucket
+    and ``end`` should be a bucket boundary (get_order_analytics checks it).
+    """
+    rollups = OrderRollup.objects.filter(user=user, granularity=granularity)
+    if start is not None:
+        rollups = rollups.filter(bucket__gte=bucket_start(start, granularity))
+    if end is not None:
+        rollups = rollups.filter(bucket__lt=end)
+    if robot_uuid:
+        rollups = rollups.filter(robot_uuid=robot_uuid)
+    if point_id:
+        rollups = rollups.filter(point_id=point_id)
+
+    group_fields = ['bucket'] + ([group_by] if group_by else [])
+    rows = rollups.order_by(*group_fields).values(*group_fields, 'status_code').annotate(
+        calls=Sum('count'),
+        succeeded=Sum('success_count')
+    )
+
+    series = {}
+    for row in rows:
+        key = tuple(row[field] for field in group_fields)
+        entry = series.get(key)
+        if entry is None:
+            entry = {field: row[field] for field in group_fields}
+            entry.update({'calls': 0, 'succeeded': 0, 'status_codes': {}})
+            series[key] = entry
+        entry['calls'] += row['calls']
+        entry['succeeded'] += row['succeeded']
+        entry['status_codes'][str(row['status_code'])] = row['calls']
+
+    for entry in series.values():
+        entry['success_rate'] = round(entry['succeeded'] / entry['calls'], 4) if entry['calls'] else None
+    return list(series.values())
+
+
+def frequent_points(user, limit, order_by='count'):
+    """Return the user's most used (``count``) or most recently used (``recent``) points"""
+    ordering = ('-last_used_at', '-count') if order_by == 'recent' else ('-count', '-last_used_at')
+    return list(PointUsage.objects.filter(user=user).order_by(*ordering).values(
+        'point_id', 'point_name', 'count', 'last_used_at'
+    )[:limit])
@@ -0,0 +1,44 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .fast_json import dumps
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Lets DRF views negotiate a streamed media type. The views return a
+    StreamingHttpResponse, so nothing is rendered here.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class EventStreamRenderer(PassthroughRenderer):
+    """Accepts ``Accept: text/event-stream`` (EventSource) requests"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+
+class CSVRenderer(PassthroughRenderer):
+    """Streamed CSV exports (``?format=csv``)"""
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(PassthroughRenderer):
+    """Streamed newline-delimited JSON exports (``?format=ndjson``)"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with fast_json.dumps (orjson when available)"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Indented output (e.g. ``Accept: application/json; indent=4``) keeps DRF's encoder
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -0,0 +1,65 @@
+"""
+Short-lived cache of Keenon GET responses.
+
+Entries are keyed by ``(credentials_key, path, params)`` rather than by user,
+so every operator using the same Keenon credentials (client_id and secret) for
+a store or scene shares one upstream fetch.
+"""
+
+from django.conf import settings
+
+from .keenon_async_client import get_async_client
+from .keenon_client import get_client, KeenonAPIError
+from .ttl_cache import TTLCache
+
+
+class ResponseCache:
+    """TTL cache of decoded Keenon JSON payloads"""
+
+    def __init__(self, ttl=None):
+        self._cache = TTLCache(settings.KEENON_RESPONSE_CACHE_TTL if ttl is None else ttl)
+
+    @staticmethod
+    def _key(keenon_config, path, params):
+        return (keenon_config.credentials_key, path, tuple(sorted((params or {}).items())))
+
+    def get(self, keenon_config, path, params=None, refresh=False):
+        """
+        Return the JSON payload of ``GET path``, fetching it on a miss.
+        Raises KeenonAPIError on non-200 responses.
+        """
+        key = self._key(keenon_config, path, params)
+        if refresh:
+            self._cache.delete(key)
+        return self._cache.get_or_load(key, lambda: self._fetch(keenon_config, path, params))
+
+    async def aget(self, keenon_config, path, params=None, refresh=False):
+        """Async counterpart of get() for the ASGI views"""
+        key = self._key(keenon_config, path, params)
+        if refresh:
+            self._cache.delete(key)
+        payload = self._cache.get(key)
+        if payload is None:
+            response = await get_async_client().get(path, keenon_config, params=params)
+            if response.status_code != 200:
+                raise KeenonAPIError(response)
+            payload = response.json()
+            self._cache.set(key, payload)
+        return payload
+
+    def invalidate(self, credentials_key=None, path=None):
+        """Drop cached responses, optionally restricted to a set of credentials and/or path"""
+        self._cache.delete_matching(
+            lambda key: (credentials_key is None or key[0] == credentials_key)
+            and (path is None or key[1] == path)
+        )
+
+    @staticmethod
+    def _fetch(keenon_config, path, params):
+        response = get_client().get(path, keenon_config, params=params)
+        if response.status_code != 200:
+            raise KeenonAPIError(response)
+        return response.json()
+
+
+response_cache = ResponseCache()
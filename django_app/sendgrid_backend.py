@@ -1,12 +1,66 @@
 """
 Custom SendGrid Email Backend using REST API
 This bypasses SSL certificate issues with SMTP
+
+Messages are batched: messages with the same sender, subject and content
+become personalizations of a single ``/v3/mail/send`` call (up to
+SENDGRID_BATCH_SIZE recipients per call), sent over one keep-alive HTTP
+session. A message may carry a ``substitutions`` dict (placeholder -> value);
+it is sent as its personalization's substitutions, so templated messages
+with per-recipient values (like verification links) still share a call.
+
+``send_batch`` reports the outcome of every recipient. When SendGrid rejects
+a call with a 4xx, the call is split in halves and resent until the rejected
+personalizations are isolated, so one bad address does not fail the rest.
 """
 
+import json
 import os
+from email.utils import parseaddr
+
+import requests
+from django.conf import settings
 from django.core.mail.backends.base import BaseEmailBackend
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
+
+
+# 4xx answers that would reject every half of a split call alike
+UNSPLITTABLE_STATUS_CODES = (401, 403, 413, 429)
+
+
+class SendGridError(Exception):
+    """Raised by send_messages when some recipients were not accepted"""
+
+    def __init__(self, message, results=None):
+        super().__init__(message)
+        self.results = results or []
+
+
+class RecipientResult:
+    """Outcome of one recipient of one EmailMessage"""
+    __slots__ = ('message', 'recipient', 'status_code', 'error')
+
+    def __init__(self, message, recipient, status_code=None, error=None):
+        self.message = message
+        self.recipient = recipient
+        self.status_code = status_code
+        self.error = error
+
+    @property
+    def sent(self):
+        return self.error is None
+
+
+def _address(address):
+    name, email = parseaddr(address)
+    return {'email': email, 'name': name} if name else {'email': email}
+
+
+def _content(email_message):
+    """SendGrid content list; text/plain must come first"""
+    contents = [('text/html' if email_message.content_subtype == 'html' else 'text/plain', email_message.body)]
+    contents += [(mimetype, content) for content, mimetype in getattr(email_message, 'alternatives', [])]
+    contents.sort(key=lambda item: item[0] != 'text/plain')
+    return [{'type': mimetype, 'value': value} for mimetype, value in contents]
 
 
 class SendGridAPIBackend(BaseEmailBackend):
@@ -14,54 +68,158 @@ class SendGridAPIBackend(BaseEmailBackend):
     A Django email backend that uses SendGrid's REST API instead of SMTP.
     This is more reliable and doesn't have SSL certificate issues.
     """
-    
+
     def __init__(self, fail_silently=False, **kwargs):
         super().__init__(fail_silently=fail_silently, **kwargs)
         self.api_key = os.getenv('SENDGRID_API_KEY')
         if not self.api_key:
             if not self.fail_silently:
                 raise ValueError("SENDGRID_API_KEY environment variable is not set")
-        self.client = SendGridAPIClient(self.api_key) if self.api_key else None
-    
+        self.session = None
+
+    def open(self):
+        """Open the HTTP session reused by every API call until close()"""
+        if self.session is not None:
+            return False
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        })
+        return True
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
     def send_messages(self, email_messages):
         """
-        Send one or more EmailMessage objects and return the number sent.
+        Send one or more EmailMessage objects and return the number sent
+        (messages accepted for every recipient).
         """
-        if not self.client:
+        if not self.api_key:
             if not self.fail_silently:
-                raise ValueError("SendGrid client is not initialized")
+                raise ValueError("SendGrid API key is not configured")
             return 0
-        
-        num_sent = 0
+
+        results = self.send_batch(email_messages)
+        failed = {id(result.message) for result in results if not result.sent}
+        if failed and not self.fail_silently:
+            errors = sorted({result.error for result in results if not result.sent})
+            raise SendGridError(f"SendGrid rejected {len(failed)} message(s): {'; '.join(errors)}", results)
+        return sum(1 for message in email_messages if message.recipients() and id(message) not in failed)
+
+    def send_batch(self, email_messages):
+        """
+        Send ``email_messages`` in as few API calls as possible and return a
+        RecipientResult per recipient, in message order. Never raises for
+        SendGrid or network errors; they are reported in the results.
+        """
+        if not email_messages:
+            return []
+        new_session = self.open()
+        try:
+            results = []
+            for payload, groups in self._batches(email_messages):
+                results.extend(self._send(payload, groups))
+        finally:
+            if new_session:
+                self.close()
+
+        # Report in the order the messages were given
+        order = {id(message): index for index, message in enumerate(email_messages)}
+        results.sort(key=lambda result: order[id(result.message)])
+        return results
+
+    def _batches(self, email_messages):
+        """
+        Yield ``(payload, groups)`` API calls, where ``groups`` holds the
+        recipients of each personalization. Messages whose payload is
+        identical except for recipients and substitutions share a call, one
+        personalization per message (recipients of one message see each
+        other, as with SMTP).
+        """
+        batch_size = settings.SENDGRID_BATCH_SIZE
+        groups = {}
         for message in email_messages:
-            try:
-                self._send(message)
-                num_sent += 1
-            except Exception as e:
-                if not self.fail_silently:
-                    raise e
-        
-        return num_sent
-    
-    def _send(self, email_message):
-        """Send a single email message"""
-        from_email = Email(email_message.from_email)
-        to_email = To(email_message.to[0])  # SendGrid API handles one recipient at a time
-        subject = email_message.subject
-        
-        # Determine content type
-        if email_message.content_subtype == 'html':
-            content = Content("text/html", email_message.body)
-        else:
-            content = Content("text/plain", email_message.body)
-        
-        mail = Mail(from_email, to_email, subject, content)
-        
-        # Send email
-        response = self.client.send(mail)
-        
+            if not message.recipients():
+                continue
+            payload = {
+                'from': _address(message.from_email),
+                'subject': message.subject,
+                'content': _content(message)
+            }
+            if message.reply_to:
+                payload['reply_to'] = _address(message.reply_to[0])
+            key = json.dumps(payload, sort_keys=True)
+            groups.setdefault(key, (payload, []))[1].append(message)
+
+        for payload, messages in groups.values():
+            personalizations, recipient_groups, count = [], [], 0
+            for message in messages:
+                for personalization, personalization_recipients in self._personalizations(message, batch_size):
+                    if count and count + len(personalization_recipients) > batch_size:
+                        yield dict(payload, personalizations=personalizations), recipient_groups
+                        personalizations, recipient_groups, count = [], [], 0
+                    personalizations.append(personalization)
+                    recipient_groups.append(personalization_recipients)
+                    count += len(personalization_recipients)
+            if personalizations:
+                yield dict(payload, personalizations=personalizations), recipient_groups
+
+    @staticmethod
+    def _personalizations(message, batch_size):
+        """Personalizations of one message, split when it has more than batch_size recipients"""
+        # SendGrid rejects an address repeated within a personalization
+        fields, seen = [], set()
+        for field, addresses in (('to', message.to), ('cc', message.cc), ('bcc', message.bcc)):
+            for address in addresses:
+                email = _address(address)['email'].lower()
+                if email not in seen:
+                    seen.add(email)
+                    fields.append((field, address))
+
+        substitutions = {key: str(value) for key, value in (getattr(message, 'substitutions', None) or {}).items()}
+        extra = {'substitutions': substitutions} if substitutions else {}
+
+        for start in range(0, len(fields), batch_size):
+            chunk = fields[start:start + batch_size]
+            if not any(field == 'to' for field, _ in chunk):
+                # Every personalization needs a "to": each cc/bcc-only recipient gets their own copy
+                for _, address in chunk:
+                    yield {'to': [_address(address)], **extra}, [(message, address)]
+                continue
+            personalization = {}
+            for field, address in chunk:
+                personalization.setdefault(field, []).append(_address(address))
+            yield dict(personalization, **extra), [(message, address) for _, address in chunk]
+
+    def _send(self, payload, groups):
+        """
+        Post one call; if SendGrid rejects it with a 4xx, bisect its
+        personalizations so each one gets its own outcome.
+        """
+        results = self._post(payload, [recipient for group in groups for recipient in group])
+        status_code = results[0].status_code if results else None
+        if (len(groups) > 1 and status_code is not None and 400 <= status_code < 500
+                and status_code not in UNSPLITTABLE_STATUS_CODES):
+            half = len(groups) // 2
+            personalizations = payload['personalizations']
+            return (
+                self._send(dict(payload, personalizations=personalizations[:half]), groups[:half])
+                + self._send(dict(payload, personalizations=personalizations[half:]), groups[half:])
+            )
+        return results
+
+    def _post(self, payload, recipients):
+        try:
+            response = self.session.post(settings.SENDGRID_API_URL, json=payload, timeout=settings.SENDGRID_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            return [RecipientResult(message, address, error=f'Connection error: {e}') for message, address in recipients]
+
         # SendGrid returns 202 for success
+        error = None
         if response.status_code not in [200, 201, 202]:
-            raise Exception(f"SendGrid API returned {response.status_code}: {response.body}")
-        
-        return True
+            error = f"SendGrid API returned {response.status_code}: {response.text}"
+        return [RecipientResult(message, address, response.status_code, error) for message, address in recipients]
@@ -0,0 +1,96 @@
+"""
+In-process cache of Keenon scene target lists.
+
+Target lists are keyed by ``(credentials_key, scene_code)`` so that a scene is
+only served to callers using the same Keenon credentials that fetched it. Each
+entry carries a ``pointId -> pointName`` index for robot calls.
+"""
+
+from django.conf import settings
+
+from .keenon_async_client import get_async_client
+from .keenon_client import get_client, KeenonAPIError, TARGET_LIST_PATH
+from .ttl_cache import TTLCache
+
+
+class TargetList:
+    """A scene's targets plus an index of point names by point id"""
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.names = {
+            str(target.get('pointId')): target.get('pointName') or target.get('name')
+            for target in targets
+        }
+
+    def point_name(self, point_id):
+        return self.names.get(str(point_id))
+
+
+class TargetCache:
+    """TTL cache of TargetList objects with explicit invalidation"""
+
+    def __init__(self, ttl=None):
+        self._cache = TTLCache(settings.KEENON_TARGET_CACHE_TTL if ttl is None else ttl)
+
+    @staticmethod
+    def _key(keenon_config, scene_code):
+        return (keenon_config.credentials_key, scene_code or keenon_config.scene_code)
+
+    def get(self, keenon_config, scene_code=None, refresh=False):
+        """
+        Return the TargetList for a scene, fetching it from Keenon on a miss.
+        Raises KeenonAPIError on non-200 responses.
+        """
+        key = self._key(keenon_config, scene_code)
+        if refresh:
+            self._cache.delete(key)
+        return self._cache.get_or_load(key, lambda: self._fetch(keenon_config, key[1]))
+
+    def point_name(self, keenon_config, point_id, scene_code=None):
+        """
+        Look up a point name. An unknown point triggers one reload in case
+        the point was added after the list was cached.
+        """
+        name = self.get(keenon_config, scene_code).point_name(point_id)
+        if name is None:
+            name = self.get(keenon_config, scene_code, refresh=True).point_name(point_id)
+        return name
+
+    async def aget(self, keenon_config, scene_code=None, refresh=False):
+        """Async counterpart of get() for the ASGI views"""
+        key = self._key(keenon_config, scene_code)
+        if refresh:
+            self._cache.delete(key)
+        target_list = self._cache.get(key)
+        if target_list is None:
+            response = await get_async_client().get(TARGET_LIST_PATH, keenon_config, params={'sceneCode': key[1]})
+            if response.status_code != 200:
+                raise KeenonAPIError(response)
+            target_list = TargetList(response.json().get('data', []))
+            self._cache.set(key, target_list)
+        return target_list
+
+    async def apoint_name(self, keenon_config, point_id, scene_code=None):
+        """Async counterpart of point_name()"""
+        name = (await self.aget(keenon_config, scene_code)).point_name(point_id)
+        if name is None:
+            name = (await self.aget(keenon_config, scene_code, refresh=True)).point_name(point_id)
+        return name
+
+    def invalidate(self, scene_code=None, credentials_key=None):
+        """Drop cached scenes, optionally restricted to a scene and/or set of credentials"""
+        self._cache.delete_matching(
+            lambda key: (credentials_key is None or key[0] == credentials_key)
+            and (scene_code is None or key[1] == scene_code)
+        )
+
+    @staticmethod
+    def _fetch(keenon_config, scene_code):
+        response = get_client().get(TARGET_LIST_PATH, keenon_config, params={'sceneCode': scene_code})
+        if response.status_code != 200:
+            raise KeenonAPIError(response)
+        return TargetList(response.json().get('data', []))
+
+
+target_cache = TargetCache()
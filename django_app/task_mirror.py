@@ -0,0 +1,160 @@
+"""
+Local mirror of Keenon food-delivery tasks.
+
+``sync_store`` upserts a store's tasks into KeenonTask. After the first full
+pull only a delta is requested: tasks started at or after the store's
+watermark, which is the start time of the oldest task that can still change
+(not completed or failed yet), or of the newest task when all are final.
+Keenon has no "modified since" filter, so this is the narrowest window that
+still catches every status change. A full pull is repeated every
+KEENON_TASK_FULL_SYNC_INTERVAL seconds as a safety net.
+
+A background thread keeps every store that has been mirrored in sync;
+``tasks/list/?source=mirror`` then answers from the local table.
+
+Rows are keyed by client_id, but a store's mirror is only served to, and
+synced with, configurations whose full credentials (``credentials_key``)
+match the ones that last synced it successfully: a config with the right
+client_id and a wrong secret must not read another tenant's tasks.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .fleet import task_key
+from .models import KeenonTask, TaskSyncState, UserKeenonConfig
+from .task_pages import fetch_all_tasks
+
+logger = logging.getLogger(__name__)
+
+# taskStatus values after which a task no longer changes
+FINAL_TASK_STATUSES = (1, -1)
+
+TASK_UPDATE_FIELDS = ['end_time', 'task_status', 'task_mode', 'data', 'synced_at']
+
+TASK_UNIQUE_FIELDS = ['client_id', 'store_id', 'robot_id', 'start_time']
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _mirror_row(keenon_config, store_id, task):
+    return KeenonTask(
+        client_id=keenon_config.client_id,
+        store_id=store_id,
+        robot_id=str(task.get('robotId')),
+        start_time=str(task.get('startTime')),
+        end_time=str(task['endTime']) if task.get('endTime') is not None else None,
+        task_status=_as_int(task.get('taskStatus')),
+        task_mode=_as_int(task.get('taskMode')),
+        data=task,
+        synced_at=timezone.now()
+    )
+
+
+def _watermark(keenon_config, store_id):
+    tasks = KeenonTask.objects.filter(client_id=keenon_config.client_id, store_id=store_id)
+    oldest_open = tasks.exclude(task_status__in=FINAL_TASK_STATUSES).order_by('start_time').values_list('start_time', flat=True).first()
+    if oldest_open is not None:
+        return oldest_open
+    return tasks.order_by('-start_time').values_list('start_time', flat=True).first()
+
+
+def sync_store(keenon_config, store_id=None, full=False):
+    """
+    Pull a store's tasks into the mirror (a delta unless ``full`` or a full
+    sync is due) and return the number of tasks received.
+    Raises KeenonAPIError / RequestException when Keenon cannot be read.
+    """
+    store_id = store_id or keenon_config.store_id
+    state, _ = TaskSyncState.objects.get_or_create(client_id=keenon_config.client_id, store_id=store_id)
+
+    now = timezone.now()
+    full = full or state.watermark is None or state.last_full_sync_at is None or (
+        now - state.last_full_sync_at > timedelta(seconds=settings.KEENON_TASK_FULL_SYNC_INTERVAL)
+    )
+    extra_params = None if full else {settings.KEENON_TASK_SINCE_PARAM: state.watermark}
+
+    _, tasks = fetch_all_tasks(keenon_config, store_id, refresh=True, extra_params=extra_params)
+
+    # Pages can overlap while Keenon adds tasks; keep one row per task
+    rows = {task_key(task): _mirror_row(keenon_config, store_id, task) for task in tasks}
+
+    # MySQL upserts on any unique key (ON DUPLICATE KEY UPDATE) and rejects unique_fields
+    upsert = {'update_conflicts': True, 'update_fields': TASK_UPDATE_FIELDS}
+    if connections[KeenonTask.objects.db].features.supports_update_conflicts_with_target:
+        upsert['unique_fields'] = TASK_UNIQUE_FIELDS
+
+    with transaction.atomic():
+        KeenonTask.objects.bulk_create(rows.values(), batch_size=500, **upsert)
+        state.watermark = _watermark(keenon_config, store_id)
+        state.credentials = keenon_config.credentials_key
+        state.last_synced_at = now
+        if full:
+            state.last_full_sync_at = now
+        state.save()
+    return len(rows)
+
+
+def config_for(state):
+    """A UserKeenonConfig with the credentials that last synced ``state``, or None"""
+    for keenon_config in UserKeenonConfig.objects.filter(client_id=state.client_id):
+        if keenon_config.credentials_key == state.credentials:
+            return keenon_config
+    return None
+
+
+def sync_all():
+    """Sync every mirrored store once, with the credentials that last synced it"""
+    synced = 0
+    for state in TaskSyncState.objects.all():
+        keenon_config = config_for(state)
+        if keenon_config is None:
+            continue
+        try:
+            sync_store(keenon_config, state.store_id)
+            synced += 1
+        except Exception as e:
+            logger.warning('Task mirror sync failed for store %s: %s', state.store_id, e)
+    return synced
+
+
+class TaskMirrorSync:
+    """Runs sync_all() every KEENON_TASK_SYNC_INTERVAL seconds in a daemon thread"""
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the sync thread once per process, if enabled"""
+        if self._thread is not None or not settings.KEENON_TASK_BACKGROUND_SYNC:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='keenon-task-mirror', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.KEENON_TASK_SYNC_INTERVAL)
+            try:
+                close_old_connections()
+                sync_all()
+            except Exception as e:
+                logger.exception('Task mirror sync loop failed: %s', e)
+            finally:
+                close_old_connections()
+
+
+task_mirror_sync = TaskMirrorSync()
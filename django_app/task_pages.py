@@ -0,0 +1,104 @@
+"""
+Complete Keenon task lists.
+
+The task list endpoint is paginated. Page 1 is fetched first to learn
+``total`` and the page size Keenon actually honours. The remaining pages are
+then fetched concurrently (at most KEENON_TASK_PAGE_CONCURRENCY at a time)
+and returned in page order, so a busy store costs about two round trips
+instead of one per page.
+"""
+
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from .keenon_client import TASK_LIST_PATH
+from .response_cache import response_cache
+
+
+def page_params(store_id, page_no, extra=None):
+    return {
+        'storeId': store_id,
+        settings.KEENON_TASK_PAGE_PARAM: page_no,
+        settings.KEENON_TASK_PAGE_SIZE_PARAM: settings.KEENON_TASK_PAGE_SIZE,
+        **(extra or {})
+    }
+
+
+def _page_tasks(payload):
+    return (payload.get('data') or {}).get('list', []) or []
+
+
+def _page_count(total, first_page_size):
+    if not first_page_size or total <= first_page_size:
+        return 1
+    return min(math.ceil(total / first_page_size), settings.KEENON_TASK_MAX_PAGES)
+
+
+def _fetch_page(keenon_config, store_id, page_no, refresh, extra):
+    try:
+        return _page_tasks(response_cache.get(
+            keenon_config, TASK_LIST_PATH, page_params(store_id, page_no, extra), refresh=refresh
+        ))
+    finally:
+        # Runs in a worker thread: close any connection a token refresh opened
+        connections.close_all()
+
+
+def fetch_task_pages(keenon_config, store_id, refresh=False, extra_params=None):
+    """
+    Return ``(total, pages)`` where ``pages`` yields the task list of every
+    page in order. Page 1 is fetched before returning, so upstream errors
+    (KeenonAPIError, RequestException) surface before any output is sent.
+    ``extra_params`` are added to every page request.
+    """
+    first = response_cache.get(keenon_config, TASK_LIST_PATH, page_params(store_id, 1, extra_params), refresh=refresh)
+    first_tasks = _page_tasks(first)
+    total = (first.get('data') or {}).get('total', len(first_tasks))
+    page_count = _page_count(total, len(first_tasks))
+
+    def pages():
+        yield first_tasks
+        if page_count <= 1:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(settings.KEENON_TASK_PAGE_CONCURRENCY, page_count - 1))
+        try:
+            futures = [
+                executor.submit(_fetch_page, keenon_config, store_id, page_no, refresh, extra_params)
+                for page_no in range(2, page_count + 1)
+            ]
+            for future in futures:
+                yield future.result()
+        finally:
+            # Stop fetching if the consumer went away (e.g. a closed stream)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return total, pages()
+
+
+def fetch_all_tasks(keenon_config, store_id, refresh=False, extra_params=None):
+    """Return ``(total, tasks)`` with the tasks of every page merged in order"""
+    total, pages = fetch_task_pages(keenon_config, store_id, refresh, extra_params)
+    return total, [task for page in pages for task in page]
+
+
+async def afetch_all_tasks(keenon_config, store_id, refresh=False):
+    """Async counterpart of fetch_all_tasks for the ASGI views"""
+    first = await response_cache.aget(keenon_config, TASK_LIST_PATH, page_params(store_id, 1), refresh=refresh)
+    first_tasks = _page_tasks(first)
+    total = (first.get('data') or {}).get('total', len(first_tasks))
+    page_count = _page_count(total, len(first_tasks))
+
+    semaphore = asyncio.Semaphore(settings.KEENON_TASK_PAGE_CONCURRENCY)
+
+    async def fetch(page_no):
+        async with semaphore:
+            return _page_tasks(await response_cache.aget(
+                keenon_config, TASK_LIST_PATH, page_params(store_id, page_no), refresh=refresh
+            ))
+
+    rest = await asyncio.gather(*(fetch(page_no) for page_no in range(2, page_count + 1)))
+    return total, first_tasks + [task for page in rest for task in page]
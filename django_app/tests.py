@@ -1,13 +1,94 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import EmailVerification
+from unittest import mock
+from .models import EmailVerification, UserKeenonConfig
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import keenon_client, keenon_async_client
+from .target_cache import target_cache, TargetCache
+from .keenon_tokens import TokenManager, token_manager
+from .response_cache import response_cache
+from .fleet import StorePoller, fleet_pollers
+from .order_buffer import order_buffer
+from .models import RobotOrder, PointUsage, OrderRollup, KeenonTask, TaskSyncState, Endpoint
+from django.core.management import call_command
+from io import StringIO
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, circuit_breakers
+from .endpoint_cache import endpoint_cache
+from .task_mirror import config_for
+from . import fast_json
+from .middleware import CompressionMiddleware, accepted_encodings
+from .config_cache import KeenonConfigCache, keenon_config_cache
+from .authentication import StatelessJWTAuthentication, user_cache, user_is_active
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core import mail
+from .email_outbox import deliver_batch, drain, enqueue
+from .email_service import USERNAME, VERIFICATION_LINK, queue_verification_email
+from .models import EmailOutbox
+from .sendgrid_backend import SendGridAPIBackend, SendGridError
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import AsyncRequestFactory, RequestFactory
+from asgiref.sync import async_to_sync, sync_to_async
+from .views import streaming_content
+from django.http import HttpResponse, StreamingHttpResponse
+import gzip
+import importlib
+import zlib
+from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
+import requests
+import httpx
+import json
+import threading
+import time
 import uuid
 
 
+def make_keenon_response(status_code=200, payload=None):
+    """Build a fake Keenon HTTP response"""
+    response = mock.Mock()
+    response.status_code = status_code
+    response.json.return_value = payload if payload is not None else {}
+    response.text = str(payload)
+    return response
+
+
+class KeenonOperatorMixin:
+    """
+    Shared fixture: ``self.user`` ("operator") with a Keenon configuration
+    (``self.keenon_config``) holding a valid token, and ``self.client``
+    authenticated as them unless ``authenticate_client`` is False.
+    """
+    keenon_config_fields = {}
+    authenticate_client = True
+    
+    def create_operator(self, username='operator', token_expires_in=timedelta(hours=1), **fields):
+        user = User.objects.create_user(username=username, password='testpass123')
+        keenon_config = UserKeenonConfig.objects.create(**{
+            'user': user,
+            'client_id': 'client',
+            'client_secret': 'secret',
+            'store_id': 'store-1',
+            'access_token': 'token-1',
+            'token_expires_at': timezone.now() + token_expires_in,
+            **fields
+        })
+        return user, keenon_config
+    
+    def setUp(self):
+        super().setUp()
+        self.user, self.keenon_config = self.create_operator(**self.keenon_config_fields)
+        if self.authenticate_client:
+            self.client = APIClient()
+            self.client.force_authenticate(user=self.user)
+
+
 class EmailVerificationModelTest(TestCase):
     """Test EmailVerification model functionality"""
     
@@ -359,4 +440,1886 @@ class EmailVerificationSecurityTest(TestCase):
         self.assertFalse(self.email_verification.available)
 
 
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False)
+class KeenonClientTest(KeenonOperatorMixin, APITestCase):
+    """Test the shared pooled Keenon HTTP client"""
+    
+    keenon_config_fields = {'scene_code': 'scene-1'}
+    
+    def setUp(self):
+        response_cache.invalidate()
+        super().setUp()
+    
+    def test_get_client_is_shared(self):
+        """Test that every caller gets the same pooled session"""
+        self.assertIs(keenon_client.get_client(), keenon_client.get_client())
+    
+    def test_session_mounts_pooled_adapter(self):
+        """Test that the session keeps a bounded keep-alive pool per host"""
+        client = keenon_client.KeenonClient(pool_connections=2, pool_maxsize=7)
+        adapter = client.session.get_adapter('https://es.robotkeenon.com/')
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 7)
+    
+    def test_auth_headers_use_config_token(self):
+        """Test that Bearer headers are built from UserKeenonConfig"""
+        headers = keenon_client.KeenonClient.auth_headers(self.keenon_config)
+        self.assertEqual(headers['Authorization'], 'Bearer token-1')
+    
+    def test_robot_list_uses_shared_session(self):
+        """Test that proxy views go through the pooled session"""
+        session = keenon_client.get_client().session
+        with mock.patch.object(session, 'request', return_value=make_keenon_response(200, {'data': [{'id': 1}]})) as request:
+            response = self.client.get('/api/robot/list/')
+        
+        self.assertEqual(response.json(), {'success': True, 'data': [{'id': 1}]})
+        method, url = request.call_args.args
+        self.assertEqual(method, 'GET')
+        self.assertTrue(url.endswith(keenon_client.ROBOT_LIST_PATH))
+        self.assertEqual(request.call_args.kwargs['params'], {'storeId': 'store-1'})
+        self.assertEqual(request.call_args.kwargs['headers']['Authorization'], 'Bearer token-1')
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False, ROBOT_ORDER_FLUSH_INTERVAL=3600)
+class TargetCacheTest(KeenonOperatorMixin, APITestCase):
+    """Test the scene target cache shared by targets and robot calls"""
+    
+    keenon_config_fields = {'scene_code': 'scene-1'}
+    
+    targets_payload = {'data': [
+        {'pointId': 4, 'pointName': 'Mesa 4'},
+        {'pointId': '7', 'name': 'Barra'},
+    ]}
+    
+    def setUp(self):
+        target_cache.invalidate()
+        super().setUp()
+        self.session = keenon_client.get_client().session
+    
+    def tearDown(self):
+        target_cache.invalidate()
+    
+    def test_point_name_index(self):
+        """Test that point names are indexed by string point id"""
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, self.targets_payload)):
+            self.assertEqual(target_cache.point_name(self.keenon_config, '4'), 'Mesa 4')
+            self.assertEqual(target_cache.point_name(self.keenon_config, 7), 'Barra')
+    
+    def test_target_list_served_from_cache(self):
+        """Test that repeated target polls only hit Keenon once"""
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, self.targets_payload)) as request:
+            first = self.client.get('/api/targets/')
+            second = self.client.get('/api/targets/')
+        
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(len(second.json()['data']), 2)
+    
+    def test_robot_call_reuses_cached_targets(self):
+        """Test that a robot call only makes the call task request when targets are cached"""
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, self.targets_payload)):
+            self.client.get('/api/targets/')
+        
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, {'code': 0})) as request:
+            response = self.client.post('/api/robot/call/', {'uuid': 'robot-1', 'pointId': '4'}, format='json')
+        
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(request.call_count, 1)
+        self.assertTrue(request.call_args.args[1].endswith(keenon_client.ROBOT_CALL_PATH))
+        order_buffer.flush()
+        self.assertEqual(self.user.robot_orders.get().point_name, 'Mesa 4')
+    
+    def test_invalidate_forces_refetch(self):
+        """Test that explicit invalidation drops the cached scene"""
+        cache = TargetCache(ttl=60)
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, self.targets_payload)) as request:
+            cache.get(self.keenon_config)
+            cache.invalidate(scene_code='scene-1')
+            cache.get(self.keenon_config)
+        
+        self.assertEqual(request.call_count, 2)
+    
+    @override_settings(KEENON_GET_RETRIES=0)
+    def test_upstream_error_is_not_cached(self):
+        """Test that Keenon errors are reported and not cached"""
+        circuit_breakers.reset()
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(503, {'msg': 'down'})) as request:
+            first = self.client.get('/api/targets/')
+            self.client.get('/api/targets/')
+        
+        self.assertFalse(first.json()['success'])
+        self.assertEqual(first.json()['error'], 'Keenon API returned status 503')
+        self.assertEqual(request.call_count, 2)
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False)
+class TokenManagerTest(KeenonOperatorMixin, APITestCase):
+    """Test proactive and single-flight Keenon token refresh"""
+    
+    keenon_config_fields = {'scene_code': 'scene-1', 'access_token': 'old-token', 'token_expires_in': timedelta(seconds=30)}
+    
+    def setUp(self):
+        target_cache.invalidate()
+        token_manager.forget()
+        response_cache.invalidate()
+        super().setUp()
+        self.session = keenon_client.get_client().session
+        self.token_response = make_keenon_response(200, {'access_token': 'new-token', 'expires_in': 3600})
+    
+    def tearDown(self):
+        target_cache.invalidate()
+    
+    def test_ensure_valid_renews_expiring_token(self):
+        """Test that a token expiring within the margin is renewed before use"""
+        manager = TokenManager(refresh_margin=300)
+        with mock.patch.object(self.session, 'request', return_value=self.token_response) as request:
+            self.assertTrue(manager.ensure_valid(self.keenon_config))
+        
+        self.assertTrue(request.call_args.args[1].endswith(keenon_client.TOKEN_PATH))
+        self.keenon_config.refresh_from_db()
+        self.assertEqual(self.keenon_config.access_token, 'new-token')
+    
+    def test_fresh_token_is_not_renewed(self):
+        """Test that a token outside the margin is left alone"""
+        manager = TokenManager(refresh_margin=10)
+        with mock.patch.object(self.session, 'request') as request:
+            self.assertTrue(manager.ensure_valid(self.keenon_config))
+        
+        request.assert_not_called()
+    
+    def test_concurrent_refreshes_are_coalesced(self):
+        """Test that concurrent refreshes for one client_id make a single token call"""
+        manager = TokenManager(refresh_margin=300)
+        configs = [UserKeenonConfig.objects.get(pk=self.keenon_config.pk) for _ in range(5)]
+        
+        def slow_token(*args, **kwargs):
+            time.sleep(0.05)
+            return self.token_response
+        
+        def store(keenon_config, issued):
+            keenon_config.access_token = issued.access_token
+            keenon_config.token_expires_at = issued.expires_at
+        
+        with mock.patch.object(self.session, 'request', side_effect=slow_token) as request, \
+                mock.patch.object(TokenManager, '_store', staticmethod(store)):
+            threads = [threading.Thread(target=manager.refresh, args=(config,)) for config in configs]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual({config.access_token for config in configs}, {'new-token'})
+    
+    def test_unauthorized_request_is_retried_once(self):
+        """Test that a 401 renews the token and retries the request"""
+        self.keenon_config.token_expires_at = timezone.now() + timedelta(hours=1)
+        self.keenon_config.save()
+        responses = [
+            make_keenon_response(401, {'msg': 'expired'}),
+            self.token_response,
+            make_keenon_response(200, {'data': [{'id': 1}]}),
+        ]
+        with mock.patch.object(self.session, 'request', side_effect=responses) as request:
+            response = self.client.get('/api/robot/list/')
+        
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(request.call_args.kwargs['headers']['Authorization'], 'Bearer new-token')
+    
+    def test_refresh_token_view(self):
+        """Test that the manual refresh endpoint goes through the token manager"""
+        with mock.patch.object(self.session, 'request', return_value=self.token_response):
+            response = self.client.post('/api/token/refresh/')
+        
+        self.assertTrue(response.json()['success'])
+        self.keenon_config.refresh_from_db()
+        self.assertEqual(self.keenon_config.access_token, 'new-token')
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False)
+class SharedCredentialsTest(APITestCase):
+    """Test token pooling and response caching across users with the same credentials"""
+    
+    def setUp(self):
+        token_manager.forget()
+        response_cache.invalidate()
+        self.configs = []
+        for username in ('waiter1', 'waiter2', 'waiter3'):
+            user = User.objects.create_user(username=username, password='testpass123')
+            self.configs.append(UserKeenonConfig.objects.create(
+                user=user,
+                client_id='shared-client',
+                client_secret='shared-secret',
+                store_id='store-1',
+                access_token='old-token',
+                token_expires_at=timezone.now() + timedelta(seconds=30)
+            ))
+        self.session = keenon_client.get_client().session
+        self.token_response = make_keenon_response(200, {'access_token': 'pooled-token', 'expires_in': 3600})
+    
+    def tearDown(self):
+        token_manager.forget()
+        response_cache.invalidate()
+    
+    def test_one_refresh_serves_every_user(self):
+        """Test that users sharing credentials cost a single token refresh"""
+        with mock.patch.object(self.session, 'request', return_value=self.token_response) as request:
+            for keenon_config in self.configs:
+                self.assertTrue(token_manager.ensure_valid(keenon_config))
+        
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(
+            set(UserKeenonConfig.objects.values_list('access_token', flat=True)),
+            {'pooled-token'}
+        )
+    
+    def test_pooled_token_requires_matching_secret(self):
+        """Test that a client_id alone does not grant access to the pooled token"""
+        with mock.patch.object(self.session, 'request', return_value=self.token_response):
+            token_manager.ensure_valid(self.configs[0])
+        
+        intruder = User.objects.create_user(username='intruder', password='testpass123')
+        intruder_config = UserKeenonConfig.objects.create(
+            user=intruder,
+            client_id='shared-client',
+            client_secret='wrong-secret',
+            store_id='store-1'
+        )
+        self.assertIsNone(token_manager.pooled_token(intruder_config))
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(401, {})):
+            self.assertFalse(token_manager.ensure_valid(intruder_config))
+    
+    def test_robot_list_fetched_once_per_store(self):
+        """Test that operators of one store share the robot list response"""
+        robots = make_keenon_response(200, {'data': [{'id': 'robot-1'}]})
+        with mock.patch.object(self.session, 'request', side_effect=[self.token_response, robots]) as request:
+            for keenon_config in self.configs:
+                client = APIClient()
+                client.force_authenticate(user=keenon_config.user)
+                response = client.get('/api/robot/list/')
+                self.assertEqual(response.json()['data'], [{'id': 'robot-1'}])
+        
+        self.assertEqual(request.call_count, 2)
+    
+    def test_client_id_alone_does_not_share_cached_data(self):
+        """Test that copying another tenant's client_id does not expose their cached responses"""
+        robots = make_keenon_response(200, {'data': [{'id': 'victim-robot'}]})
+        victim = APIClient()
+        victim.force_authenticate(user=self.configs[0].user)
+        with mock.patch.object(self.session, 'request', side_effect=[self.token_response, robots]):
+            victim.get('/api/robot/list/')
+        
+        intruder = User.objects.create_user(username='intruder', password='testpass123')
+        UserKeenonConfig.objects.create(
+            user=intruder, client_id='own-client', client_secret='own-secret', store_id='store-9',
+            access_token='own-token', token_expires_at=timezone.now() + timedelta(hours=1)
+        )
+        client = APIClient()
+        client.force_authenticate(user=intruder)
+        client.put('/api/keenon/config/update/', {
+            'client_id': 'shared-client', 'client_secret': 'wrong-secret', 'store_id': 'store-1'
+        }, format='json')
+        
+        # The token of the old credentials is dropped on update
+        self.assertIsNone(UserKeenonConfig.objects.get(user=intruder).access_token)
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(401, {})):
+            self.assertFalse(client.get('/api/robot/list/').json()['success'])
+        
+        # Even with a token, the cache entry of the victim's credentials is not reused
+        UserKeenonConfig.objects.filter(user=intruder).update(
+            access_token='own-token', token_expires_at=timezone.now() + timedelta(hours=1)
+        )
+        keenon_config_cache.invalidate(intruder.pk)
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(401, {})) as request:
+            response = client.get('/api/robot/list/')
+        self.assertFalse(response.json()['success'])
+        self.assertGreaterEqual(request.call_count, 1)
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False, ROBOT_ORDER_FLUSH_INTERVAL=3600)
+class AsyncProxyViewsTest(KeenonOperatorMixin, TestCase):
+    """Test the async (ASGI) Keenon proxy endpoints"""
+    
+    keenon_config_fields = {'scene_code': 'scene-1'}
+    authenticate_client = False
+    
+    def setUp(self):
+        target_cache.invalidate()
+        response_cache.invalidate()
+        super().setUp()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.upstream_requests = []
+    
+    def tearDown(self):
+        target_cache.invalidate()
+        response_cache.invalidate()
+    
+    def mock_keenon(self, handler):
+        def record(request):
+            self.upstream_requests.append(request)
+            return handler(request)
+        client = keenon_async_client.AsyncKeenonClient(transport=httpx.MockTransport(record))
+        return mock.patch.object(keenon_async_client, '_client', client)
+    
+    def test_requires_authentication(self):
+        """Test that async endpoints reject anonymous requests"""
+        response = self.client.get('/api/async/robot/list/')
+        self.assertEqual(response.status_code, 401)
+    
+    def test_robot_list(self):
+        """Test that the async robot list proxies Keenon with the user's token"""
+        with self.mock_keenon(lambda request: httpx.Response(200, json={'data': [{'id': 'robot-1'}]})):
+            response = self.client.get('/api/async/robot/list/', **self.auth)
+        
+        self.assertEqual(response.json(), {'success': True, 'data': [{'id': 'robot-1'}]})
+        upstream = self.upstream_requests[0]
+        self.assertEqual(upstream.url.path, keenon_client.ROBOT_LIST_PATH)
+        self.assertEqual(upstream.url.params['storeId'], 'store-1')
+        self.assertEqual(upstream.headers['Authorization'], 'Bearer token-1')
+    
+    @override_settings(KEENON_GET_RETRIES=0)
+    def test_upstream_error(self):
+        """Test that Keenon errors are reported like the synchronous views"""
+        circuit_breakers.reset()
+        with self.mock_keenon(lambda request: httpx.Response(503, text='down')):
+            response = self.client.get('/api/async/store/list/', **self.auth)
+        
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(response.json()['error'], 'Keenon API returned status 503')
+    
+    def test_call_robot_task_records_order(self):
+        """Test that the async robot call resolves the point name and stores the order"""
+        def handler(request):
+            if request.url.path == keenon_client.TARGET_LIST_PATH:
+                return httpx.Response(200, json={'data': [{'pointId': 4, 'pointName': 'Mesa 4'}]})
+            return httpx.Response(200, json={'code': 0})
+        
+        with self.mock_keenon(handler):
+            response = self.client.post(
+                '/api/async/robot/call/',
+                json.dumps({'uuid': 'robot-1', 'pointId': '4'}),
+                content_type='application/json',
+                **self.auth
+            )
+        
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(json.loads(self.upstream_requests[-1].content)['storeId'], 'store-1')
+        order_buffer.flush()
+        self.assertEqual(self.user.robot_orders.get().point_name, 'Mesa 4')
+    
+    @override_settings(KEENON_TASK_PAGE_SIZE=2)
+    def test_task_list_fetches_every_page(self):
+        """Test that the async task list merges all pages in order"""
+        def handler(request):
+            page_no = int(request.url.params['pageNo'])
+            tasks = [{'id': n} for n in range(page_no * 2 - 1, min(page_no * 2, 5) + 1)]
+            return httpx.Response(200, json={'data': {'total': 5, 'list': tasks}})
+        
+        with self.mock_keenon(handler):
+            response = self.client.get('/api/async/tasks/list/', **self.auth)
+        
+        self.assertEqual(response.json()['total'], 5)
+        self.assertEqual([task['id'] for task in response.json()['data']], [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.upstream_requests), 3)
+    
+    def test_task_list_mirror_and_stream_modes(self):
+        """Test that ?source=mirror and ?stream=1 behave like the synchronous task list"""
+        tasks = [{'robotId': 'robot-1', 'startTime': '2026-01-01 10:00:00', 'taskStatus': 1}]
+        upstream = make_keenon_response(200, {'data': {'total': 1, 'list': tasks}})
+        with mock.patch.object(keenon_client.get_client().session, 'request', return_value=upstream):
+            mirrored = self.client.get('/api/async/tasks/list/', {'source': 'mirror'}, **self.auth)
+            streamed = self.client.get('/api/async/tasks/list/', {'stream': '1', 'refresh': '1'}, **self.auth)
+            streamed_body = b''.join(streamed.streaming_content)
+        
+        self.assertEqual(mirrored.json()['page'], 1)
+        self.assertEqual(mirrored.json()['data'], tasks)
+        self.assertTrue(KeenonTask.objects.exists())
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(json.loads(streamed_body), {'success': True, 'total': 1, 'data': tasks})
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False, ROBOT_BATCH_CONCURRENCY=10, ROBOT_ORDER_FLUSH_INTERVAL=3600)
+class RobotBatchCallTest(KeenonOperatorMixin, APITestCase):
+    """Test concurrent batch robot dispatch"""
+    
+    keenon_config_fields = {'scene_code': 'scene-1'}
+    
+    def setUp(self):
+        target_cache.invalidate()
+        super().setUp()
+        self.session = keenon_client.get_client().session
+        self.url = '/api/robot/call/batch/'
+    
+    def tearDown(self):
+        target_cache.invalidate()
+    
+    def fake_keenon(self, method, url, **kwargs):
+        if url.endswith(keenon_client.TARGET_LIST_PATH):
+            return make_keenon_response(200, {'data': [{'pointId': 1, 'pointName': 'Mesa 1'}]})
+        time.sleep(0.2)
+        if kwargs['json']['uuid'] == 'broken-robot':
+            return make_keenon_response(400, {'msg': 'robot busy'})
+        return make_keenon_response(200, {'code': 0})
+    
+    def test_batch_dispatch_runs_concurrently(self):
+        """Test that a batch costs about one call's latency and saves every order"""
+        calls = [{'uuid': f'robot-{i}', 'pointId': '1'} for i in range(5)]
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            started = time.monotonic()
+            response = self.client.post(self.url, {'calls': calls}, format='json')
+            elapsed = time.monotonic() - started
+        
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['succeeded'], 5)
+        self.assertEqual([result['target']['uuid'] for result in data['results']], [call['uuid'] for call in calls])
+        self.assertLess(elapsed, 0.8)
+        order_buffer.flush()
+        self.assertEqual(self.user.robot_orders.filter(point_name='Mesa 1').count(), 5)
+    
+    def test_batch_reports_per_item_results(self):
+        """Test that a failing call does not hide the others"""
+        calls = [{'uuid': 'robot-1', 'pointId': '1'}, {'uuid': 'broken-robot', 'pointId': '1'}]
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            response = self.client.post(self.url, {'calls': calls}, format='json')
+        
+        data = response.json()
+        self.assertFalse(data['success'])
+        self.assertEqual(data['succeeded'], 1)
+        self.assertEqual(data['results'][1]['status_code'], 400)
+        order_buffer.flush()
+        self.assertEqual(self.user.robot_orders.filter(success=False).count(), 1)
+    
+    def test_batch_validation(self):
+        """Test that malformed batches are rejected before dispatching"""
+        response = self.client.post(self.url, {'calls': [{'uuid': 'robot-1'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.post(self.url, {'calls': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.post(self.url, [{'uuid': 'robot-1', 'pointId': '1'}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False, FLEET_POLL_INTERVAL=3600)
+class FleetStreamTest(KeenonOperatorMixin, APITestCase):
+    """Test the per-store fleet poller and its SSE stream"""
+    
+    def setUp(self):
+        response_cache.invalidate()
+        super().setUp()
+        self.session = keenon_client.get_client().session
+        self.robots = [{'robotId': 'r1', 'battery': 90}, {'robotId': 'r2', 'battery': 80}]
+    
+    def tearDown(self):
+        fleet_pollers.stop_all()
+        response_cache.invalidate()
+    
+    def fake_keenon(self, method, url, **kwargs):
+        if url.endswith(keenon_client.ROBOT_LIST_PATH):
+            return make_keenon_response(200, {'data': self.robots})
+        return make_keenon_response(200, {'data': {'total': 0, 'list': []}})
+    
+    def test_poller_broadcasts_diffs(self):
+        """Test that subscribers get a snapshot and then only the changes"""
+        poller = StorePoller(self.keenon_config, 'store-1')
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            subscriber = poller.subscribe()
+            self.robots = [{'robotId': 'r1', 'battery': 85}]
+            poller.poll()
+        poller.stop()
+        
+        snapshot = subscriber.get_nowait()
+        self.assertTrue(snapshot.startswith('id: 1\nevent: snapshot'))
+        diff = subscriber.get_nowait()
+        self.assertIn('event: diff', diff)
+        payload = json.loads(diff.split('data: ', 1)[1])
+        self.assertEqual(payload['robots'], {'upserted': [{'robotId': 'r1', 'battery': 85}], 'removed': ['r2']})
+        self.assertEqual(payload['tasks'], {'upserted': [], 'removed': []})
+    
+    def test_unchanged_poll_sends_nothing(self):
+        """Test that an identical snapshot produces no event"""
+        poller = StorePoller(self.keenon_config, 'store-1')
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            subscriber = poller.subscribe()
+            poller.poll()
+        poller.stop()
+        
+        subscriber.get_nowait()
+        self.assertTrue(subscriber.empty())
+    
+    def test_stream_shares_one_poller_per_store(self):
+        """Test that the SSE endpoint streams the snapshot and reuses the store's poller"""
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon) as request:
+            first = self.client.get('/api/fleet/stream/', HTTP_ACCEPT='text/event-stream')
+            second = self.client.get('/api/fleet/stream/', HTTP_ACCEPT='text/event-stream')
+            first_event = next(iter(first.streaming_content)).decode()
+            next(iter(second.streaming_content))
+        
+        self.assertEqual(first['Content-Type'], 'text/event-stream')
+        self.assertIn('event: snapshot', first_event)
+        self.assertEqual(request.call_count, 2)
+        poller = fleet_pollers.get(self.keenon_config)
+        self.assertEqual(poller.subscriber_count, 2)
+        
+        first.close()
+        second.close()
+        self.assertEqual(poller.subscriber_count, 0)
+    
+    def test_async_subscriber(self):
+        """Test that an event loop subscriber gets the snapshot and the diffs broadcast by the poller thread"""
+        poller = StorePoller(self.keenon_config, 'store-1')
+        
+        async def listen():
+            subscriber = await poller.asubscribe()
+            snapshot = await subscriber.get(1)
+            self.robots = [{'robotId': 'r1', 'battery': 85}]
+            await sync_to_async(poller.poll, thread_sensitive=False)()
+            diff = await subscriber.get(1)
+            poller.unsubscribe(subscriber)
+            return snapshot, diff
+        
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            snapshot, diff = async_to_sync(listen)()
+        poller.stop()
+        
+        self.assertIn('event: snapshot', snapshot)
+        self.assertIn('event: diff', diff)
+        self.assertEqual(poller.subscriber_count, 0)
+
+
+class CircuitBreakerTest(TestCase):
+    """Test the per-path circuit breaker"""
+    
+    def test_opens_after_consecutive_failures(self):
+        """Test that the circuit opens at the failure threshold and fails fast"""
+        breaker = CircuitBreaker('/path', failure_threshold=3, reset_timeout=60)
+        for _ in range(3):
+            breaker.before_request()
+            breaker.record_failure()
+        
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+    
+    def test_success_resets_failure_count(self):
+        """Test that only consecutive failures count"""
+        breaker = CircuitBreaker('/path', failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_response(200)
+        breaker.record_failure()
+        breaker.before_request()
+    
+    def test_half_open_allows_single_probe(self):
+        """Test that after the reset timeout exactly one probe goes through"""
+        breaker = CircuitBreaker('/path', failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        breaker.opened_at -= 61
+        
+        breaker.before_request()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+        
+        breaker.record_response(200)
+        breaker.before_request()
+    
+    def test_failed_probe_reopens(self):
+        """Test that a failing probe opens the circuit again"""
+        breaker = CircuitBreaker('/path', failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        breaker.opened_at -= 61
+        breaker.before_request()
+        breaker.record_response(503)
+        
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+
+
+@override_settings(
+    KEENON_TOKEN_BACKGROUND_REFRESH=False,
+    KEENON_GET_RETRIES=2,
+    KEENON_RETRY_BACKOFF=0.001,
+    KEENON_CIRCUIT_FAILURE_THRESHOLD=3
+)
+class KeenonResilienceTest(TestCase):
+    """Test retries and fail-fast behaviour of the Keenon client"""
+    
+    def setUp(self):
+        circuit_breakers.reset()
+        self.keenon_client = keenon_client.KeenonClient()
+        self.keenon_config = mock.Mock(access_token=None)
+    
+    def tearDown(self):
+        circuit_breakers.reset()
+    
+    def test_get_retried_on_transient_errors(self):
+        """Test that GETs are retried after timeouts and 503s"""
+        responses = [requests.exceptions.ConnectTimeout('slow'), make_keenon_response(503), make_keenon_response(200)]
+        with mock.patch.object(self.keenon_client.session, 'request', side_effect=responses) as request:
+            response = self.keenon_client.get('/api/open/data/v1/store/list')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.call_count, 3)
+    
+    def test_post_is_not_retried(self):
+        """Test that non-idempotent requests are sent only once"""
+        with mock.patch.object(self.keenon_client.session, 'request', return_value=make_keenon_response(503)) as request:
+            response = self.keenon_client.post(keenon_client.ROBOT_CALL_PATH, json={})
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(request.call_count, 1)
+    
+    def test_open_circuit_fails_fast(self):
+        """Test that requests are not sent while the path's circuit is open"""
+        with mock.patch.object(self.keenon_client.session, 'request', side_effect=requests.exceptions.ConnectTimeout('down')) as request:
+            with self.assertRaises(requests.exceptions.ConnectTimeout):
+                self.keenon_client.get(keenon_client.STORE_LIST_PATH)
+            with self.assertRaises(CircuitOpenError):
+                self.keenon_client.get(keenon_client.STORE_LIST_PATH)
+        
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(circuit_breakers.states()[keenon_client.STORE_LIST_PATH], 'open')
+        
+        # Other paths keep working
+        with mock.patch.object(self.keenon_client.session, 'request', return_value=make_keenon_response(200)):
+            self.assertEqual(self.keenon_client.get(keenon_client.ROBOT_LIST_PATH).status_code, 200)
+    
+    def test_read_timeout_not_retried(self):
+        """Test that a GET whose response timed out is not sent again"""
+        with mock.patch.object(self.keenon_client.session, 'request', side_effect=requests.exceptions.ReadTimeout('slow')) as request:
+            with self.assertRaises(requests.exceptions.ReadTimeout):
+                self.keenon_client.get(keenon_client.STORE_LIST_PATH)
+        
+        self.assertEqual(request.call_count, 1)
+    
+    def test_breakers_are_per_credentials(self):
+        """Test that one tenant's open circuit does not fail fast another tenant's calls"""
+        failing = mock.Mock(access_token='a', credentials_key='creds-a')
+        healthy = mock.Mock(access_token='b', credentials_key='creds-b')
+        with mock.patch('django_app.keenon_tokens.token_manager.ensure_valid'):
+            with mock.patch.object(self.keenon_client.session, 'request', side_effect=requests.exceptions.ConnectionError('down')):
+                with self.assertRaises(requests.exceptions.ConnectionError):
+                    self.keenon_client.get(keenon_client.STORE_LIST_PATH, failing)
+            with mock.patch.object(self.keenon_client.session, 'request', return_value=make_keenon_response(200)):
+                self.assertEqual(self.keenon_client.get(keenon_client.STORE_LIST_PATH, healthy).status_code, 200)
+        
+        self.assertEqual(circuit_breakers.states('creds-a'), {keenon_client.STORE_LIST_PATH: 'open'})
+        self.assertEqual(circuit_breakers.states('creds-b'), {keenon_client.STORE_LIST_PATH: 'closed'})
+    
+    def test_unknown_paths_share_one_breaker(self):
+        """Test that arbitrary endpoint paths do not each add a breaker"""
+        first = circuit_breakers.get('/api/custom/1', 'creds')
+        self.assertIs(circuit_breakers.get('/api/custom/2', 'creds'), first)
+        self.assertEqual(list(circuit_breakers.states('creds')), ['*'])
+        
+        circuit_breakers.forget('creds')
+        self.assertEqual(circuit_breakers.states('creds'), {})
+
+
+@override_settings(ROBOT_ORDER_BUFFER_SIZE=3, ROBOT_ORDER_FLUSH_INTERVAL=3600)
+class OrderBufferTest(APITestCase):
+    """Test write-behind saving of robot order history"""
+    
+    def setUp(self):
+        order_buffer.flush()
+        self.user = User.objects.create_user(username='operator', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+    
+    def make_order(self, point_id='1'):
+        return RobotOrder(user=self.user, robot_uuid='robot-1', point_id=point_id, status_code=200, success=True)
+    
+    def test_orders_are_saved_on_flush(self):
+        """Test that queued orders reach the database in one flush"""
+        order_buffer.extend([self.make_order('1'), self.make_order('2')])
+        self.assertEqual(RobotOrder.objects.count(), 0)
+        
+        self.assertEqual(order_buffer.flush(), 2)
+        self.assertEqual(RobotOrder.objects.count(), 2)
+        self.assertEqual(len(order_buffer), 0)
+    
+    def test_full_buffer_wakes_flush_thread(self):
+        """Test that reaching ROBOT_ORDER_BUFFER_SIZE triggers an early flush"""
+        with mock.patch.object(order_buffer, '_wake') as wake:
+            order_buffer.extend([self.make_order(), self.make_order()])
+            wake.set.assert_not_called()
+            order_buffer.add(self.make_order())
+            wake.set.assert_called_once()
+        order_buffer.flush()
+    
+    def test_failed_flush_keeps_orders(self):
+        """Test that orders survive a failed write and are saved by the next flush"""
+        order_buffer.add(self.make_order())
+        with mock.patch.object(RobotOrder.objects, 'bulk_create', side_effect=Exception('database is locked')):
+            with self.assertRaises(Exception):
+                order_buffer.flush()
+        
+        self.assertEqual(len(order_buffer), 1)
+        self.assertEqual(order_buffer.flush(), 1)
+    
+    @override_settings(ROBOT_ORDER_MAX_PENDING=2)
+    def test_buffer_is_bounded(self):
+        """Test that the oldest unsaved orders are dropped beyond ROBOT_ORDER_MAX_PENDING"""
+        with self.assertLogs('django_app.order_buffer', 'WARNING'):
+            order_buffer.extend([self.make_order('1'), self.make_order('2'), self.make_order('3')])
+        
+        self.assertEqual(len(order_buffer), 2)
+        order_buffer.flush()
+        self.assertEqual(sorted(RobotOrder.objects.values_list('point_id', flat=True)), ['2', '3'])
+    
+    def test_created_at_is_queue_time(self):
+        """Test that an order keeps the time it was queued, not the time it was flushed"""
+        order = self.make_order()
+        order_buffer.add(order)
+        queued_at = order.created_at
+        
+        with mock.patch('django.utils.timezone.now', return_value=queued_at + timedelta(minutes=5)):
+            order_buffer.flush()
+        
+        self.assertEqual(RobotOrder.objects.get().created_at, queued_at)
+    
+    def test_history_includes_buffered_orders(self):
+        """Test that the history endpoint shows orders that were not flushed yet"""
+        order_buffer.add(self.make_order('7'))
+        
+        response = self.client.get('/api/robot/orders/')
+        
+        self.assertEqual([order['point_id'] for order in response.json()['orders']], ['7'])
+
+
+class OrderBufferIntegrityTest(TransactionTestCase):
+    """Test flushing a batch with a row the database rejects (foreign keys are checked at commit)"""
+    
+    def setUp(self):
+        order_buffer.flush()
+        self.user = User.objects.create_user(username='operator', password='testpass123')
+    
+    def make_order(self, point_id):
+        return RobotOrder(user=self.user, robot_uuid='robot-1', point_id=point_id, status_code=200, success=True)
+    
+    def test_rejected_order_does_not_block_others(self):
+        """Test that an order the database rejects is dropped and the rest of the batch saved"""
+        orphan = RobotOrder(user_id=self.user.pk + 1000, robot_uuid='robot-1', point_id='9', status_code=200)
+        order_buffer.extend([self.make_order('1'), orphan, self.make_order('2')])
+        
+        with self.assertLogs('django_app.order_buffer', 'ERROR'):
+            self.assertEqual(order_buffer.flush(), 2)
+        
+        self.assertEqual(len(order_buffer), 0)
+        self.assertEqual(sorted(RobotOrder.objects.values_list('point_id', flat=True)), ['1', '2'])
+
+
+@override_settings(ROBOT_ORDERS_PAGE_SIZE=2)
+class RobotOrderHistoryTest(APITestCase):
+    """Test keyset pagination and filters of the robot order history"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='operator', password='testpass123')
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        
+        same_time = timezone.now()
+        orders = [
+            RobotOrder(user=self.user, robot_uuid=f'robot-{i % 2}', point_id=str(i), status_code=200, success=i != 3)
+            for i in range(5)
+        ]
+        orders.append(RobotOrder(user=other, robot_uuid='robot-0', point_id='9', status_code=200, success=True))
+        RobotOrder.objects.bulk_create(orders)
+        # Ties on created_at must still paginate without gaps or repeats
+        RobotOrder.objects.update(created_at=same_time)
+    
+    def test_cursor_walks_every_order_once(self):
+        """Test that following next_cursor returns each order exactly once, newest first"""
+        seen = []
+        cursor = None
+        while True:
+            response = self.client.get('/api/robot/orders/', {'cursor': cursor} if cursor else {})
+            data = response.json()
+            self.assertLessEqual(len(data['orders']), 2)
+            seen.extend(order['point_id'] for order in data['orders'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        
+        self.assertEqual(seen, ['4', '3', '2', '1', '0'])
+    
+    def test_filters(self):
+        """Test filtering by robot and success"""
+        response = self.client.get('/api/robot/orders/', {'robot_uuid': 'robot-1', 'success': 'false', 'limit': 10})
+        self.assertEqual([order['point_id'] for order in response.json()['orders']], ['3'])
+    
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get('/api/robot/orders/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ROBOT_ORDER_FLUSH_INTERVAL=3600)
+class PointUsageTest(APITestCase):
+    """Test the incrementally maintained point usage counters"""
+    
+    def setUp(self):
+        order_buffer.flush()
+        self.user = User.objects.create_user(username='operator', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+    
+    def add_orders(self, *point_ids):
+        order_buffer.extend([
+            RobotOrder(user=self.user, robot_uuid='robot-1', point_id=point_id, point_name=f'Mesa {point_id}',
+                       status_code=200, success=True)
+            for point_id in point_ids
+        ])
+        order_buffer.flush()
+    
+    def test_counters_follow_saved_orders(self):
+        """Test that every flush increments the counters"""
+        self.add_orders('1', '2', '1')
+        self.add_orders('1')
+        
+        counters = {usage.point_id: usage.count for usage in PointUsage.objects.filter(user=self.user)}
+        self.assertEqual(counters, {'1': 3, '2': 1})
+    
+    def test_frequent_and_recent_points(self):
+        """Test top-N by count and by last use"""
+        self.add_orders('1', '1', '2')
+        self.add_orders('3')
+        
+        by_count = self.client.get('/api/robot/points/frequent/', {'limit': 2}).json()['points']
+        self.assertEqual([point['point_id'] for point in by_count], ['1', '3'])
+        
+        recent = self.client.get('/api/robot/points/frequent/', {'order': 'recent', 'limit': 1}).json()['points']
+        self.assertEqual(recent[0]['point_id'], '3')
+        
+        history = self.client.get('/api/robot/orders/').json()
+        self.assertEqual(history['most_frequent_point']['point_id'], '1')
+        self.assertEqual(history['most_frequent_point']['count'], 2)
+    
+    def test_backfill_command(self):
+        """Test that the backfill rebuilds counters from existing history"""
+        RobotOrder.objects.bulk_create([
+            RobotOrder(user=self.user, robot_uuid='robot-1', point_id='5', point_name='Barra',
+                       status_code=200, success=True)
+            for _ in range(3)
+        ])
+        self.assertFalse(PointUsage.objects.exists())
+        
+        out = StringIO()
+        call_command('backfill_point_usage', stdout=out)
+        
+        usage = PointUsage.objects.get(user=self.user, point_id='5')
+        self.assertEqual((usage.count, usage.point_name), (3, 'Barra'))
+        self.assertIn('Rebuilt 1', out.getvalue())
+    
+    def test_migration_backfills_existing_history(self):
+        """Test that the data migration fills the counters from orders saved before them"""
+        RobotOrder.objects.bulk_create([
+            RobotOrder(user=self.user, robot_uuid='robot-1', point_id='5', point_name='Barra', status_code=200)
+            for _ in range(2)
+        ])
+        migration = importlib.import_module('django_app.migrations.0014_backfill_point_usage')
+        
+        migration.backfill_point_usage(django_apps, None)
+        
+        history = self.client.get('/api/robot/orders/').json()
+        self.assertEqual(history['most_frequent_point'], {'point_id': '5', 'point_name': 'Barra', 'count': 2})
+
+
+@override_settings(ROBOT_ORDER_FLUSH_INTERVAL=3600)
+class OrderAnalyticsTest(APITestCase):
+    """Test the hourly/daily order rollups and the analytics endpoint"""
+    
+    def setUp(self):
+        order_buffer.flush()
+        self.user = User.objects.create_user(username='operator', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/robot/orders/analytics/'
+        order_buffer.extend([
+            RobotOrder(user=self.user, robot_uuid='robot-1', point_id='1', status_code=200, success=True),
+            RobotOrder(user=self.user, robot_uuid='robot-1', point_id='2', status_code=200, success=True),
+            RobotOrder(user=self.user, robot_uuid='robot-2', point_id='1', status_code=400, success=False),
+        ])
+        order_buffer.flush()
+    
+    def test_rollups_are_maintained_on_write(self):
+        """Test that saving orders fills both hourly and daily buckets"""
+        for granularity in ('hour', 'day'):
+            rollups = OrderRollup.objects.filter(user=self.user, granularity=granularity)
+            self.assertEqual(sum(rollup.count for rollup in rollups), 3)
+            self.assertEqual(sum(rollup.success_count for rollup in rollups), 2)
+    
+    def test_daily_series(self):
+        """Test calls, success rate and status distribution per bucket"""
+        series = self.client.get(self.url, {'granularity': 'day'}).json()['series']
+        
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]['calls'], 3)
+        self.assertEqual(series[0]['succeeded'], 2)
+        self.assertEqual(series[0]['status_codes'], {'200': 2, '400': 1})
+        self.assertAlmostEqual(series[0]['success_rate'], 0.6667)
+    
+    def test_group_by_robot(self):
+        """Test splitting buckets per robot"""
+        series = self.client.get(self.url, {'granularity': 'hour', 'group_by': 'robot'}).json()['series']
+        
+        by_robot = {entry['robot_uuid']: entry['calls'] for entry in series}
+        self.assertEqual(by_robot, {'robot-1': 2, 'robot-2': 1})
+    
+    def test_range_filter(self):
+        """Test that buckets outside [start, end) are excluded"""
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        response = self.client.get(self.url, {'start': tomorrow})
+        self.assertEqual(response.json()['series'], [])
+        
+        response = self.client.get(self.url, {'start': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_range_must_cover_whole_buckets(self):
+        """Test that an end inside a bucket is rejected instead of counting the whole bucket"""
+        now = timezone.localtime()
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        
+        response = self.client.get(self.url, {'granularity': 'hour', 'end': (hour + timedelta(minutes=30)).isoformat()})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end must be a bucket boundary', response.json()['error'])
+        
+        response = self.client.get(self.url, {'granularity': 'day', 'end': (timezone.localdate() + timedelta(days=1)).isoformat()})
+        self.assertEqual(sum(entry['calls'] for entry in response.json()['series']), 3)
+    
+    def test_rebuild_matches_history(self):
+        """Test that the rebuild command recomputes buckets from moved orders"""
+        two_days_ago = timezone.now() - timedelta(days=2)
+        RobotOrder.objects.filter(robot_uuid='robot-2').update(created_at=two_days_ago)
+        
+        call_command('rebuild_order_rollups', stdout=StringIO())
+        
+        series = self.client.get(self.url, {'granularity': 'day'}).json()['series']
+        self.assertEqual([entry['calls'] for entry in series], [1, 2])
+        self.assertEqual(OrderRollup.objects.filter(granularity='hour').count(), 3)
+    
+    def test_migration_backfills_existing_history(self):
+        """Test that the data migration fills the buckets from orders saved before the rollups"""
+        OrderRollup.objects.all().delete()
+        migration = importlib.import_module('django_app.migrations.0015_backfill_order_rollups')
+        
+        migration.backfill_order_rollups(django_apps, None)
+        
+        series = self.client.get(self.url, {'granularity': 'day'}).json()['series']
+        self.assertEqual([entry['calls'] for entry in series], [3])
+
+
+class RobotOrderExportTest(APITestCase):
+    """Test the streamed robot order export"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='operator', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/robot/orders/export/'
+        RobotOrder.objects.bulk_create([
+            RobotOrder(user=self.user, robot_uuid='robot-1', point_id=str(i), point_name=f'Mesa, {i}',
+                       status_code=200, success=True)
+            for i in range(3)
+        ])
+    
+    @override_settings(ROBOT_ORDERS_EXPORT_CHUNK_SIZE=2)
+    def test_csv_export(self):
+        """Test that the CSV export streams a header plus one row per order"""
+        response = self.client.get(self.url)
+        
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,robot_uuid,point_id,point_name,status_code,success,created_at')
+        self.assertEqual(len(lines), 4)
+        self.assertIn('"Mesa, 0"', lines[1])
+    
+    def test_ndjson_export(self):
+        """Test NDJSON output selected with ?format=ndjson"""
+        response = self.client.get(self.url, {'format': 'ndjson', 'point_id': '2'})
+        
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['point_name'], 'Mesa, 2')
+    
+    def test_date_range(self):
+        """Test that orders outside [start, end) are left out"""
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        response = self.client.get(self.url, {'format': 'ndjson', 'start': tomorrow})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+        
+        response = self.client.get(self.url, {'end': 'soon'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_streaming_content_under_asgi(self):
+        """Test that sync content is served as an async iterator to ASGI requests only"""
+        rows = iter(['a', 'b', 'c'])
+        self.assertIs(streaming_content(RequestFactory().get('/'), rows), rows)
+        
+        content = streaming_content(AsyncRequestFactory().get('/'), rows, batch_size=2)
+        
+        async def consume():
+            return [chunk async for chunk in content]
+        self.assertEqual(async_to_sync(consume)(), ['ab', 'c'])
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False, KEENON_TASK_PAGE_SIZE=10, KEENON_TASK_PAGE_CONCURRENCY=5)
+class TaskListPaginationTest(KeenonOperatorMixin, APITestCase):
+    """Test that the task list proxy returns every page"""
+    
+    failing_page = None
+    
+    def setUp(self):
+        response_cache.invalidate()
+        circuit_breakers.reset()
+        super().setUp()
+        self.session = keenon_client.get_client().session
+        self.total = 45
+    
+    def tearDown(self):
+        response_cache.invalidate()
+    
+    def fake_keenon(self, method, url, params=None, **kwargs):
+        page_no, page_size = params['pageNo'], params['pageSize']
+        if page_no > 1:
+            time.sleep(0.2)
+        if page_no == self.failing_page:
+            return make_keenon_response(500, {'msg': 'boom'})
+        first = (page_no - 1) * page_size
+        tasks = [{'robotId': 'robot-1', 'startTime': n} for n in range(first, min(first + page_size, self.total))]
+        return make_keenon_response(200, {'data': {'total': self.total, 'list': tasks}})
+    
+    def test_pages_fetched_concurrently_and_merged_in_order(self):
+        """Test that 5 pages cost about one extra round trip and keep their order"""
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon) as request:
+            started = time.monotonic()
+            response = self.client.get('/api/tasks/list/')
+            elapsed = time.monotonic() - started
+        
+        data = response.json()
+        self.assertEqual(data['total'], 45)
+        self.assertEqual([task['startTime'] for task in data['data']], list(range(45)))
+        self.assertEqual(request.call_count, 5)
+        self.assertLess(elapsed, 0.6)
+    
+    def test_streamed_task_list(self):
+        """Test that ?stream=1 produces the same JSON document"""
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            response = self.client.get('/api/tasks/list/', {'stream': '1'})
+            data = json.loads(b''.join(response.streaming_content))
+        
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['data']), 45)
+    
+    @override_settings(KEENON_GET_RETRIES=0)
+    def test_stream_reports_failed_page(self):
+        """Test that a page failing mid-stream still yields valid JSON with an error"""
+        self.failing_page = 3
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            response = self.client.get('/api/tasks/list/', {'stream': '1'})
+            data = json.loads(b''.join(response.streaming_content))
+        
+        self.assertIn('error', data)
+        self.assertEqual(len(data['data']), 20)
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False, KEENON_TASK_BACKGROUND_SYNC=False)
+class TaskMirrorTest(KeenonOperatorMixin, APITestCase):
+    """Test the local Keenon task mirror and its delta sync"""
+    
+    def setUp(self):
+        response_cache.invalidate()
+        circuit_breakers.reset()
+        super().setUp()
+        self.session = keenon_client.get_client().session
+        self.url = '/api/tasks/list/'
+        self.upstream_tasks = [
+            {'robotId': 'robot-1', 'startTime': '2026-01-01 10:00:00', 'taskStatus': 1},
+            {'robotId': 'robot-2', 'startTime': '2026-01-01 11:00:00', 'taskStatus': 0},
+            {'robotId': 'robot-1', 'startTime': '2026-01-01 12:00:00', 'taskStatus': 1},
+        ]
+        self.upstream_params = []
+    
+    def tearDown(self):
+        response_cache.invalidate()
+    
+    def fake_keenon(self, method, url, params=None, **kwargs):
+        self.upstream_params.append(params)
+        since = params.get('startTime')
+        tasks = [task for task in self.upstream_tasks if since is None or task['startTime'] >= since]
+        return make_keenon_response(200, {'data': {'total': len(tasks), 'list': tasks}})
+    
+    def get(self, **params):
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            return self.client.get(self.url, {'source': 'mirror', **params}).json()
+    
+    def test_first_visit_mirrors_store(self):
+        """Test that the first mirror read pulls every task, newest first"""
+        data = self.get()
+        
+        self.assertEqual(data['total'], 3)
+        self.assertEqual([task['startTime'] for task in data['data']][0], '2026-01-01 12:00:00')
+        self.assertNotIn('startTime', self.upstream_params[0])
+        
+        # Later reads are local
+        self.get()
+        self.assertEqual(len(self.upstream_params), 1)
+    
+    def test_delta_sync_from_oldest_open_task(self):
+        """Test that a refresh only asks for tasks since the oldest unfinished one"""
+        self.get()
+        self.upstream_tasks[1]['taskStatus'] = 1
+        self.upstream_tasks.append({'robotId': 'robot-2', 'startTime': '2026-01-01 13:00:00', 'taskStatus': 0})
+        
+        data = self.get(refresh='1')
+        
+        self.assertEqual(self.upstream_params[-1]['startTime'], '2026-01-01 11:00:00')
+        self.assertEqual(data['total'], 4)
+        self.assertEqual(KeenonTask.objects.get(robot_id='robot-2', start_time='2026-01-01 11:00:00').task_status, 1)
+        self.assertEqual(TaskSyncState.objects.get().watermark, '2026-01-01 13:00:00')
+    
+    def test_filters_and_pagination(self):
+        """Test robot/status filters and page slicing on the mirror"""
+        self.get()
+        
+        data = self.get(robotId='robot-1', taskStatus='1', page_size='1', page='2')
+        
+        self.assertEqual(data['total'], 2)
+        self.assertEqual([task['startTime'] for task in data['data']], ['2026-01-01 10:00:00'])
+    
+    def test_upsert_without_conflict_target(self):
+        """Test that backends like MySQL upsert without unique_fields"""
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(KeenonTask.objects, 'bulk_create') as bulk_create:
+            self.get()
+        
+        kwargs = bulk_create.call_args.kwargs
+        self.assertTrue(kwargs['update_conflicts'])
+        self.assertNotIn('unique_fields', kwargs)
+    
+    def test_mirror_requires_matching_credentials(self):
+        """Test that a config with the same client_id but another secret cannot read the mirror"""
+        self.get()
+        intruder = User.objects.create_user(username='intruder', password='testpass123')
+        UserKeenonConfig.objects.create(user=intruder, client_id='client', client_secret='wrong', store_id='store-1')
+        self.client.force_authenticate(user=intruder)
+        
+        def reject_token(method, url, **kwargs):
+            if url.endswith(keenon_client.TOKEN_PATH):
+                return make_keenon_response(401, {'error': 'invalid_client'})
+            return self.fake_keenon(method, url, **kwargs)
+        
+        with mock.patch.object(self.session, 'request', side_effect=reject_token):
+            data = self.client.get(self.url, {'source': 'mirror'}).json()
+        
+        self.assertNotIn('data', data)
+        self.assertEqual(TaskSyncState.objects.get().credentials, UserKeenonConfig.objects.get(user=self.user).credentials_key)
+    
+    def test_sync_all_uses_matching_credentials(self):
+        """Test that the background sync picks the config whose credentials synced the store"""
+        self.get()
+        intruder = User.objects.create_user(username='intruder', password='testpass123')
+        UserKeenonConfig.objects.create(user=intruder, client_id='client', client_secret='wrong', store_id='store-1')
+        # The owner's config is no longer the first one with this client_id
+        owner_config = UserKeenonConfig.objects.get(user=self.user)
+        owner_config.delete()
+        owner_config.pk = None
+        owner_config.save()
+        
+        self.assertEqual(config_for(TaskSyncState.objects.get()).user, self.user)
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False)
+class EndpointJSONTest(KeenonOperatorMixin, APITestCase):
+    """Test that saved endpoints store validated, pre-parsed params and body"""
+    
+    def setUp(self):
+        circuit_breakers.reset()
+        super().setUp()
+    
+    def test_json_strings_are_parsed_on_create(self):
+        """Test that the form's JSON text is stored as structured data"""
+        response = self.client.post('/api/endpoints/create/', {
+            'name': 'Robots', 'method': 'POST', 'path': '/api/x',
+            'params': '{"storeId": "store-1"}', 'body': '{"uuid": "robot-1"}'
+        }, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        endpoint = Endpoint.objects.get()
+        self.assertEqual(endpoint.params, {'storeId': 'store-1'})
+        self.assertEqual(endpoint.body, {'uuid': 'robot-1'})
+    
+    def test_invalid_json_is_rejected(self):
+        """Test that malformed params or body are refused at save time"""
+        response = self.client.post('/api/endpoints/create/', {'name': 'Bad', 'path': '/api/x', 'params': '{oops'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('params', response.json()['error'])
+        
+        response = self.client.post('/api/endpoints/create/', {'name': 'Bad', 'path': '/api/x', 'params': '[1, 2]'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        
+        endpoint = Endpoint.objects.create(user=self.user, name='Ok', path='/api/x')
+        response = self.client.put(f'/api/endpoints/{endpoint.id}/update/', {'body': '{"a":'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Endpoint.objects.exclude(pk=endpoint.pk).exists())
+    
+    def test_execute_uses_stored_structure(self):
+        """Test that execution sends the stored params and body as-is"""
+        endpoint = Endpoint.objects.create(
+            user=self.user, name='Call', method='POST', path='/api/x',
+            params={'storeId': 'store-1'}, body={'uuid': 'robot-1'}
+        )
+        session = keenon_client.get_client().session
+        with mock.patch.object(session, 'request', return_value=make_keenon_response(200, {'code': 0})) as request:
+            response = self.client.post(f'/api/endpoints/{endpoint.id}/execute/')
+        
+        self.assertEqual(response.json()['status_code'], 200)
+        self.assertEqual(request.call_args.kwargs['params'], {'storeId': 'store-1'})
+        self.assertEqual(request.call_args.kwargs['json'], {'uuid': 'robot-1'})
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False, ENDPOINT_BATCH_CONCURRENCY=10)
+class EndpointBatchExecuteTest(KeenonOperatorMixin, APITestCase):
+    """Test concurrent execution of saved endpoints"""
+    
+    def setUp(self):
+        circuit_breakers.reset()
+        super().setUp()
+        self.session = keenon_client.get_client().session
+        self.endpoints = [
+            Endpoint.objects.create(user=self.user, name=f'Endpoint {i}', method='GET', path=f'/api/{i}')
+            for i in range(4)
+        ]
+        self.url = '/api/endpoints/execute/'
+    
+    def fake_keenon(self, method, url, **kwargs):
+        time.sleep(0.2)
+        if url.endswith('/api/3'):
+            return make_keenon_response(404, {'msg': 'not found'})
+        return make_keenon_response(200, {'url': url})
+    
+    def test_all_endpoints_run_concurrently(self):
+        """Test that a batch costs about one call's latency and reports each endpoint"""
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            started = time.monotonic()
+            data = self.client.post(self.url, {'all': True}, format='json').json()
+            elapsed = time.monotonic() - started
+        
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(data['total'], 4)
+        self.assertEqual(data['succeeded'], 3)
+        self.assertEqual([result['id'] for result in data['results']], [endpoint.id for endpoint in self.endpoints])
+        self.assertEqual(data['results'][3]['status_code'], 404)
+        self.assertGreaterEqual(data['results'][0]['latency_ms'], 200)
+    
+    def test_concurrency_cap(self):
+        """Test that concurrency=1 runs the selected endpoints one after another"""
+        ids = [self.endpoints[0].id, self.endpoints[1].id]
+        with mock.patch.object(self.session, 'request', side_effect=self.fake_keenon):
+            started = time.monotonic()
+            data = self.client.post(self.url, {'ids': ids, 'concurrency': 1}, format='json').json()
+            elapsed = time.monotonic() - started
+        
+        self.assertTrue(data['success'])
+        self.assertGreaterEqual(elapsed, 0.4)
+    
+    def test_unknown_or_foreign_ids(self):
+        """Test that endpoints of other users cannot be executed"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        foreign = Endpoint.objects.create(user=other, name='Foreign', path='/api/x')
+        
+        response = self.client.post(self.url, {'ids': [self.endpoints[0].id, foreign.id]}, format='json')
+        
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.post(self.url, {'ids': []}, format='json').status_code, 400)
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False)
+class EndpointCacheTest(KeenonOperatorMixin, APITestCase):
+    """Test the optional response cache of saved GET endpoints"""
+    
+    def setUp(self):
+        endpoint_cache.invalidate()
+        circuit_breakers.reset()
+        super().setUp()
+        self.session = keenon_client.get_client().session
+        self.endpoint = Endpoint.objects.create(
+            user=self.user, name='Stores', method='GET', path='/api/open/data/v1/store/list', cache_ttl=60
+        )
+        self.url = f'/api/endpoints/{self.endpoint.id}/execute/'
+    
+    def tearDown(self):
+        endpoint_cache.invalidate()
+    
+    def test_repeated_get_is_served_from_cache(self):
+        """Test that the second execution does not reach Keenon and reports its age"""
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, {'data': []})) as request:
+            first = self.client.post(self.url).json()
+            second = self.client.post(self.url).json()
+        
+        self.assertEqual(request.call_count, 1)
+        self.assertFalse(first['cached'])
+        self.assertIsNone(first['cache_age'])
+        self.assertTrue(second['cached'])
+        self.assertGreaterEqual(second['cache_age'], 0)
+        self.assertEqual(second['response'], {'data': []})
+    
+    def test_force_refresh(self):
+        """Test that force_refresh bypasses the cached response"""
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, {'data': []})) as request:
+            self.client.post(self.url)
+            response = self.client.post(self.url, {'force_refresh': True}, format='json').json()
+        
+        self.assertEqual(request.call_count, 2)
+        self.assertFalse(response['cached'])
+    
+    def test_errors_and_uncached_endpoints_always_call_keenon(self):
+        """Test that error responses and endpoints without cache_ttl are not cached"""
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(404, {'msg': 'missing'})) as request:
+            self.client.post(self.url)
+            self.client.post(self.url)
+        self.assertEqual(request.call_count, 2)
+        
+        self.endpoint.cache_ttl = None
+        self.endpoint.save()
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, {'data': []})) as request:
+            self.client.post(self.url)
+            self.client.post(self.url)
+        self.assertEqual(request.call_count, 2)
+    
+    def test_cache_ttl_validation(self):
+        """Test that cache_ttl must be a non-negative number of seconds"""
+        response = self.client.post('/api/endpoints/create/', {'name': 'x', 'path': '/x', 'cache_ttl': 'soon'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.post('/api/endpoints/create/', {'name': 'x', 'path': '/x', 'cache_ttl': 30}, format='json')
+        self.assertEqual(response.json()['endpoint']['cache_ttl'], 30)
+
+
+class FastJSONTest(TestCase):
+    """Test the fast JSON encoder used by API responses"""
+    
+    payload = {
+        'when': timezone.now(),
+        'price': Decimal('1.50'),
+        'name': 'Mesa ñ',
+        'items': [1, None, True]
+    }
+    
+    def test_matches_django_encoding(self):
+        """Test that orjson and the stdlib fallback produce the same values as Django"""
+        expected = json.loads(json.dumps(self.payload, cls=DjangoJSONEncoder))
+        self.assertEqual(json.loads(fast_json.dumps(self.payload)), expected)
+        with override_settings(FAST_JSON=False):
+            self.assertEqual(json.loads(fast_json.dumps(self.payload)), expected)
+    
+    def test_raw_json_is_embedded_unchanged(self):
+        """Test that pre-serialized fragments are spliced in at any depth"""
+        raw = fast_json.RawJSON(b'{"data":[{"id":1}],"msg":"ok"}')
+        data = {'success': True, 'results': [{'response': raw}, {'response': raw}]}
+        
+        for enabled in (True, False):
+            with override_settings(FAST_JSON=enabled):
+                decoded = json.loads(fast_json.dumps(data))
+            self.assertEqual(decoded['results'][1]['response'], {'data': [{'id': 1}], 'msg': 'ok'})
+    
+    def test_json_response(self):
+        """Test the JsonResponse replacement"""
+        response = fast_json.JsonResponse({'ok': True}, status=201)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), {'ok': True})
+        with self.assertRaises(TypeError):
+            fast_json.JsonResponse([1, 2])
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False)
+class EndpointPassthroughTest(KeenonOperatorMixin, APITestCase):
+    """Test that JSON bodies of saved endpoint calls are passed through unchanged"""
+    
+    def setUp(self):
+        circuit_breakers.reset()
+        super().setUp()
+    
+    def test_upstream_json_is_not_decoded(self):
+        """Test that the Keenon body reaches the client without a decode/encode round trip"""
+        upstream = requests.Response()
+        upstream.status_code = 200
+        upstream.headers['Content-Type'] = 'application/json;charset=UTF-8'
+        upstream._content = b'{"code":0,"data":{"robots":[1,2]}}'
+        endpoint = Endpoint.objects.create(user=self.user, name='Robots', path='/api/robots')
+        
+        with mock.patch.object(keenon_client.get_client().session, 'request', return_value=upstream):
+            with mock.patch.object(requests.Response, 'json', side_effect=AssertionError('decoded')):
+                response = self.client.post(f'/api/endpoints/{endpoint.id}/execute/')
+        
+        self.assertIn(b'"response":{"code":0,"data":{"robots":[1,2]}}', response.content)
+        self.assertEqual(response.json()['response']['data']['robots'], [1, 2])
+    
+    def test_malformed_json_body_is_sent_as_text(self):
+        """Test that a body labelled JSON but not parseable is returned as text, keeping the reply valid"""
+        upstream = requests.Response()
+        upstream.status_code = 502
+        upstream.headers['Content-Type'] = 'application/json'
+        upstream._content = b'<html>502 Bad Gateway</html>'
+        endpoint = Endpoint.objects.create(user=self.user, name='Robots', path='/api/robots')
+        
+        with mock.patch.object(keenon_client.get_client().session, 'request', return_value=upstream):
+            response = self.client.post(f'/api/endpoints/{endpoint.id}/execute/')
+        
+        self.assertEqual(response.json()['response'], '<html>502 Bad Gateway</html>')
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False)
+class ConditionalGetTest(KeenonOperatorMixin, APITestCase):
+    """Test ETag / If-None-Match on the polled Keenon proxy endpoints"""
+    
+    robots_payload = {'data': [{'uuid': 'robot-1', 'robotName': 'T8'}]}
+    
+    def setUp(self):
+        target_cache.invalidate()
+        response_cache.invalidate()
+        super().setUp()
+        self.session = keenon_client.get_client().session
+    
+    def tearDown(self):
+        response_cache.invalidate()
+    
+    def test_matching_etag_returns_304(self):
+        """Test that an unchanged robot list is answered without a body"""
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, self.robots_payload)):
+            first = self.client.get('/api/robot/list/')
+            second = self.client.get('/api/robot/list/', HTTP_IF_NONE_MATCH=first['ETag'])
+        
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('"'))
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b'')
+        self.assertEqual(second['ETag'], first['ETag'])
+    
+    def test_changed_data_returns_new_etag(self):
+        """Test that a refreshed list with new data is sent in full"""
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, self.robots_payload)):
+            first = self.client.get('/api/robot/list/')
+        changed = {'data': self.robots_payload['data'] + [{'uuid': 'robot-2', 'robotName': 'T9'}]}
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, changed)):
+            second = self.client.get('/api/robot/list/?refresh=1', HTTP_IF_NONE_MATCH=first['ETag'])
+        
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(len(second.json()['data']), 2)
+    
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_weak_etag_of_compressed_response_matches(self):
+        """Test that the weakened ETag of a gzipped response still revalidates"""
+        with mock.patch.object(self.session, 'request', return_value=make_keenon_response(200, {'data': [{'pointId': i} for i in range(100)]})):
+            first = self.client.get('/api/targets/', HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get('/api/targets/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=first['ETag'])
+        
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertTrue(first['ETag'].startswith('W/'))
+        self.assertEqual(second.status_code, 304)
+    
+    def test_errors_have_no_etag(self):
+        """Test that error responses are never marked as cacheable"""
+        UserKeenonConfig.objects.filter(user=self.user).delete()
+        response = self.client.get('/api/store/list/')
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False)
+class KeenonConfigCacheTest(KeenonOperatorMixin, APITestCase):
+    """Test the per-user UserKeenonConfig cache and its invalidation"""
+    
+    keenon_config_fields = {'scene_code': 'scene-1'}
+    
+    def setUp(self):
+        keenon_config_cache.clear()
+        token_manager.forget()
+        super().setUp()
+    
+    def config_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q for q in queries.captured_queries if 'user_keenon_configs' in q['sql']]
+    
+    def test_config_is_loaded_once(self):
+        """Test that repeated requests do not query the config again"""
+        _, first = self.config_queries('/api/keenon/config/')
+        response, second = self.config_queries('/api/keenon/config/')
+        
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+        self.assertEqual(response.json()['config']['scene_code'], 'scene-1')
+    
+    def test_saves_invalidate_the_cache(self):
+        """Test that updates through the API, the admin (save) and deletes are seen at once"""
+        self.client.get('/api/keenon/config/')
+        self.client.put('/api/keenon/config/update/', {
+            'client_id': 'client', 'client_secret': 'secret', 'store_id': 'store-1', 'scene_code': 'scene-2'
+        }, format='json')
+        self.assertEqual(self.client.get('/api/keenon/config/').json()['config']['scene_code'], 'scene-2')
+        
+        self.keenon_config.refresh_from_db()
+        self.keenon_config.store_id = 'store-9'
+        self.keenon_config.save()
+        self.assertEqual(self.client.get('/api/keenon/config/').json()['config']['store_id'], 'store-9')
+        
+        self.keenon_config.delete()
+        self.assertEqual(self.client.get('/api/keenon/config/').status_code, 404)
+    
+    def test_token_refresh_invalidates_every_sharing_user(self):
+        """Test that tokens stored with update() still invalidate the cache"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        UserKeenonConfig.objects.create(user=other, client_id='client', client_secret='secret', store_id='store-1')
+        keenon_config_cache.get(self.user)
+        keenon_config_cache.get(other)
+        
+        token_response = make_keenon_response(200, {'access_token': 'token-2', 'expires_in': 3600})
+        with mock.patch.object(keenon_client.get_client().session, 'request', return_value=token_response):
+            self.client.post('/api/token/refresh/')
+        
+        self.assertEqual(keenon_config_cache.get(self.user).access_token, 'token-2')
+        self.assertEqual(keenon_config_cache.get(other).access_token, 'token-2')
+    
+    def test_returned_configs_are_copies(self):
+        """Test that changing a returned config does not change the cached one"""
+        keenon_config_cache.get(self.user).access_token = 'changed'
+        self.assertEqual(keenon_config_cache.get(self.user).access_token, 'token-1')
+    
+    def test_shared_backend(self):
+        """Test a cache stored in a Django cache alias"""
+        cache = KeenonConfigCache(alias='default')
+        cache.invalidate(self.user.pk)
+        with self.assertNumQueries(1):
+            cache.get(self.user)
+            self.assertEqual(cache.get(self.user).client_id, 'client')
+        cache.invalidate(self.user.pk)
+        with self.assertNumQueries(1):
+            cache.get(self.user)
+
+
+@override_settings(KEENON_TOKEN_BACKGROUND_REFRESH=False, ROBOT_ORDER_FLUSH_INTERVAL=3600)
+class StatelessJWTAuthenticationTest(KeenonOperatorMixin, TestCase):
+    """Test claims-based authentication without per-request User queries"""
+    
+    authenticate_client = False
+    
+    def setUp(self):
+        user_cache.invalidate()
+        keenon_config_cache.clear()
+        response_cache.invalidate()
+        super().setUp()
+        response = self.client.post('/api/auth/login/', {'username': 'operator', 'password': 'testpass123'})
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}"}
+    
+    def authenticate(self):
+        request = RequestFactory().get('/api/robot/list/', **self.auth)
+        return StatelessJWTAuthentication().authenticate(request)[0]
+    
+    def test_login_adds_claims(self):
+        """Test that username and verification state are read from the token"""
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertTrue(user and user.is_authenticated)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.username, 'operator')
+            self.assertFalse(user.is_verified)
+    
+    def test_full_user_is_loaded_once(self):
+        """Test that model access goes through the user cache"""
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().email, self.user.email)
+            self.assertIsInstance(self.authenticate(), User)
+        
+        order = RobotOrder(user=self.authenticate(), robot_uuid='robot-1', point_id='4', status_code=200)
+        self.assertEqual(order.user_id, self.user.pk)
+    
+    def test_user_save_invalidates_cache(self):
+        self.authenticate().email
+        self.user.email = 'new@example.com'
+        self.user.save()
+        self.assertEqual(self.authenticate().email, 'new@example.com')
+    
+    def test_proxy_request_without_queries(self):
+        """Test that a cached proxy read needs no database query at all"""
+        rest_framework = dict(settings.REST_FRAMEWORK, DEFAULT_AUTHENTICATION_CLASSES=[
+            'django_app.authentication.StatelessJWTAuthentication'
+        ])
+        client = keenon_async_client.AsyncKeenonClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={'data': [{'id': 'robot-1'}]})
+        ))
+        with override_settings(REST_FRAMEWORK=rest_framework), mock.patch.object(keenon_async_client, '_client', client):
+            self.client.get('/api/async/robot/list/', **self.auth)
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/async/robot/list/', **self.auth)
+        
+        self.assertEqual(response.json()['data'], [{'id': 'robot-1'}])
+    
+    def test_removed_user_cannot_queue_orders(self):
+        """Test that a token of a deactivated or deleted user does not call robots or queue orders"""
+        rest_framework = dict(settings.REST_FRAMEWORK, DEFAULT_AUTHENTICATION_CLASSES=[
+            'django_app.authentication.StatelessJWTAuthentication'
+        ])
+        self.assertTrue(user_is_active(self.authenticate()))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        user_cache.invalidate()
+        self.assertFalse(user_is_active(self.authenticate()))
+        
+        with override_settings(REST_FRAMEWORK=rest_framework), mock.patch.object(keenon_async_client, '_client') as client:
+            response = self.client.post(
+                '/api/async/robot/call/', {'uuid': 'robot-1', 'pointId': '4'}, content_type='application/json', **self.auth
+            )
+        
+        self.assertEqual(response.status_code, 401)
+        client.post.assert_not_called()
+        self.assertEqual(len(order_buffer), 0)
+        
+        self.user.delete()
+        self.assertFalse(user_is_active(self.authenticate()))
+
+
+@override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_RETRY_BACKOFF=30)
+class EmailOutboxTest(APITestCase):
+    """Test queued email delivery with retries"""
+    
+    def test_register_queues_verification_email(self):
+        """Test that registration stores the email instead of sending it"""
+        response = self.client.post('/api/auth/register/', {
+            'username': 'newuser',
+            'email': 'newuser@example.com',
+            'password': 'newpass123'
+        })
+        
+        self.assertTrue(response.data['email_queued'])
+        self.assertEqual(len(mail.outbox), 0)
+        message = EmailOutbox.objects.get()
+        self.assertEqual((message.to_email, message.kind, message.status), ('newuser@example.com', 'verification', 'pending'))
+        token = EmailVerification.objects.get(user__username='newuser').verification_token
+        self.assertIn(str(token), message.substitutions[VERIFICATION_LINK])
+        
+        # Backends without per-recipient substitutions get the rendered text
+        drain()
+        self.assertIn(f'verify-email?token={token}', mail.outbox[0].body)
+        self.assertIn('Hola <strong>newuser</strong>', mail.outbox[0].alternatives[0][0])
+        self.assertNotIn(VERIFICATION_LINK, mail.outbox[0].body)
+    
+    def test_deliver_batch(self):
+        """Test that due messages are sent with their HTML alternative"""
+        enqueue('a@example.com', 'Hola', 'texto', '<p>html</p>')
+        enqueue('b@example.com', 'Hola', 'texto')
+        
+        self.assertEqual(drain(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '<p>html</p>')
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.STATUS_SENT, attempts=1).count(), 2)
+        self.assertEqual(deliver_batch(), (0, 0))
+    
+    def test_failures_are_retried_with_backoff(self):
+        """Test exponential backoff and giving up after the last attempt"""
+        message = enqueue('a@example.com', 'Hola', 'texto')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('provider down')):
+            self.assertEqual(deliver_batch(), (0, 1))
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts, message.last_error), ('pending', 1, 'provider down'))
+            self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=25))
+            # Not due yet
+            self.assertEqual(deliver_batch(), (0, 0))
+            
+            EmailOutbox.objects.update(next_attempt_at=timezone.now())
+            deliver_batch()
+            message.refresh_from_db()
+            self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=55))
+            
+            EmailOutbox.objects.update(next_attempt_at=timezone.now())
+            deliver_batch()
+        
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', 3))
+    
+    def test_abandoned_claims_are_retried(self):
+        """Test that messages left in sending by a dead worker are delivered"""
+        message = enqueue('a@example.com', 'Hola', 'texto')
+        EmailOutbox.objects.update(status=EmailOutbox.STATUS_SENDING, claimed_by='dead', claimed_at=timezone.now())
+        self.assertEqual(deliver_batch(), (0, 0))
+        
+        EmailOutbox.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(deliver_batch(), (1, 0))
+        message.refresh_from_db()
+        self.assertEqual(message.status, EmailOutbox.STATUS_SENT)
+    
+    def test_send_queued_emails_command(self):
+        enqueue('a@example.com', 'Hola', 'texto')
+        out = StringIO()
+        call_command('send_queued_emails', stdout=out)
+        self.assertIn('1 emails sent, 0 failed', out.getvalue())
+        
+        out = StringIO()
+        call_command('send_queued_emails', '--status', stdout=out)
+        self.assertIn('Sent: 1', out.getvalue())
+
+
+@override_settings(SENDGRID_BATCH_SIZE=1000)
+@mock.patch.dict('os.environ', {'SENDGRID_API_KEY': 'sg-key'})
+class SendGridBackendTest(TestCase):
+    """Test batched sending through the SendGrid REST API"""
+    
+    def setUp(self):
+        self.post = mock.patch('requests.Session.post', return_value=make_keenon_response(202, {})).start()
+        self.addCleanup(mock.patch.stopall)
+    
+    def message(self, *to, body='Hola'):
+        email = EmailMultiAlternatives('Aviso', body, 'Robot Delivery <noreply@example.com>', list(to))
+        email.attach_alternative(f'<p>{body}</p>', 'text/html')
+        return email
+    
+    def test_identical_messages_share_one_call(self):
+        """Test that messages with the same content become personalizations of one call"""
+        messages = [self.message('a@example.com'), self.message('b@example.com', 'c@example.com')]
+        results = SendGridAPIBackend().send_batch(messages)
+        
+        self.assertEqual(self.post.call_count, 1)
+        payload = self.post.call_args.kwargs['json']
+        self.assertEqual(payload['from'], {'email': 'noreply@example.com', 'name': 'Robot Delivery'})
+        self.assertEqual([item['type'] for item in payload['content']], ['text/plain', 'text/html'])
+        self.assertEqual(payload['personalizations'], [
+            {'to': [{'email': 'a@example.com'}]},
+            {'to': [{'email': 'b@example.com'}, {'email': 'c@example.com'}]},
+        ])
+        self.assertEqual([(r.recipient, r.sent, r.status_code) for r in results], [
+            ('a@example.com', True, 202), ('b@example.com', True, 202), ('c@example.com', True, 202)
+        ])
+    
+    @override_settings(SENDGRID_BATCH_SIZE=2)
+    def test_batches_respect_recipient_limit(self):
+        """Test that calls are split at SENDGRID_BATCH_SIZE recipients on one session"""
+        backend = SendGridAPIBackend()
+        with backend:
+            session = backend.session
+            self.assertEqual(backend.send_messages([self.message(f'{i}@example.com') for i in range(5)]), 5)
+            self.assertIs(backend.session, session)
+        
+        self.assertEqual([len(call.kwargs['json']['personalizations']) for call in self.post.call_args_list], [2, 2, 1])
+        self.assertIsNone(backend.session)
+    
+    def test_different_content_and_bcc_only(self):
+        """Test that different content is sent separately and bcc-only recipients get a to"""
+        bcc_only = EmailMessage('Aviso', 'Hola', 'noreply@example.com', bcc=['x@example.com', 'y@example.com'])
+        SendGridAPIBackend().send_batch([self.message('a@example.com', body='Uno'), self.message('b@example.com', body='Dos'), bcc_only])
+        
+        self.assertEqual(self.post.call_count, 3)
+        self.assertEqual(self.post.call_args.kwargs['json']['personalizations'], [
+            {'to': [{'email': 'x@example.com'}]}, {'to': [{'email': 'y@example.com'}]}
+        ])
+    
+    def test_rejected_call_is_reported_per_recipient(self):
+        """Test that only the recipients of the rejected call fail"""
+        self.post.side_effect = [make_keenon_response(202, {}), make_keenon_response(400, {'errors': ['bad']})]
+        messages = [self.message('a@example.com', body='Uno'), self.message('b@example.com', body='Dos')]
+        
+        results = SendGridAPIBackend().send_batch(messages)
+        self.assertEqual([result.sent for result in results], [True, False])
+        self.assertEqual(results[1].status_code, 400)
+        
+        self.post.side_effect = None
+        self.post.return_value = make_keenon_response(400, {})
+        with self.assertRaises(SendGridError) as raised:
+            SendGridAPIBackend().send_messages(messages)
+        self.assertEqual(len(raised.exception.results), 2)
+        self.assertEqual(SendGridAPIBackend(fail_silently=True).send_messages(messages), 0)
+    
+    @override_settings(EMAIL_BACKEND='django_app.sendgrid_backend.SendGridAPIBackend')
+    def test_outbox_sends_identical_emails_in_one_call(self):
+        """Test that the outbox delivers a batch of identical notifications with one request"""
+        for index in range(3):
+            enqueue(f'{index}@example.com', 'Aviso', 'Hola', '<p>Hola</p>')
+        self.post.side_effect = None
+        
+        self.assertEqual(deliver_batch(), (3, 0))
+        self.assertEqual(self.post.call_count, 1)
+        self.assertEqual(len(self.post.call_args.kwargs['json']['personalizations']), 3)
+    
+    @override_settings(EMAIL_BACKEND='django_app.sendgrid_backend.SendGridAPIBackend')
+    def test_verification_emails_share_one_call(self):
+        """Test that verification emails for different users batch with per-recipient substitutions"""
+        users = [User.objects.create_user(username=f'user{i}', email=f'{i}@example.com') for i in range(2)]
+        for user in users:
+            queue_verification_email(user, uuid.uuid4())
+        
+        self.assertEqual(deliver_batch(), (2, 0))
+        self.assertEqual(self.post.call_count, 1)
+        payload = self.post.call_args.kwargs['json']
+        self.assertIn(VERIFICATION_LINK, payload['content'][0]['value'])
+        self.assertEqual([p['substitutions'][USERNAME] for p in payload['personalizations']], ['user0', 'user1'])
+    
+    def test_rejected_call_is_split_per_recipient(self):
+        """Test that a 4xx for a shared call is bisected so only the bad recipient fails"""
+        def post(url, json, **kwargs):
+            emails = [p['to'][0]['email'] for p in json['personalizations']]
+            return make_keenon_response(400 if 'bad@example.com' in emails else 202, {})
+        self.post.side_effect = post
+        messages = [self.message(address) for address in ('a@example.com', 'bad@example.com', 'c@example.com', 'd@example.com')]
+        
+        results = SendGridAPIBackend().send_batch(messages)
+        
+        self.assertEqual([(r.recipient, r.sent) for r in results], [
+            ('a@example.com', True), ('bad@example.com', False), ('c@example.com', True), ('d@example.com', True)
+        ])
+        self.assertEqual(self.post.call_count, 5)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTest(TestCase):
+    """Test negotiated compression of API responses"""
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.body = json.dumps({'data': [{'pointId': i, 'pointName': f'Mesa {i}'} for i in range(50)]})
+    
+    def process(self, response, accept_encoding='gzip, deflate'):
+        request = self.factory.get('/api/targets/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+    
+    def test_large_json_is_gzipped(self):
+        """Test that JSON above the threshold is compressed and marked as such"""
+        response = self.process(HttpResponse(self.body, content_type='application/json'))
+        
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(len(response.content), len(self.body) / 3)
+        self.assertEqual(gzip.decompress(response.content).decode(), self.body)
+    
+    def test_small_or_unaccepted_responses_are_untouched(self):
+        """Test the size threshold, content negotiation and content type filter"""
+        small = self.process(HttpResponse('{"ok": true}', content_type='application/json'))
+        self.assertFalse(small.has_header('Content-Encoding'))
+        
+        refused = self.process(HttpResponse(self.body, content_type='application/json'), 'gzip;q=0, identity')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        
+        html = self.process(HttpResponse(self.body, content_type='text/html'))
+        self.assertFalse(html.has_header('Content-Encoding'))
+    
+    def test_streaming_chunks_are_flushed(self):
+        """Test that each streamed chunk can be decoded as soon as it arrives"""
+        response = self.process(StreamingHttpResponse(iter(['{"data": [', '1, 2', ']}']), content_type='application/json'))
+        
+        decompressor = zlib.decompressobj(31)
+        chunks = list(response.streaming_content)
+        self.assertEqual(decompressor.decompress(chunks[0]), b'{"data": [')
+        self.assertEqual(b''.join(decompressor.decompress(chunk) for chunk in chunks[1:]), b'1, 2]}')
+    
+    def test_event_stream_is_not_compressed(self):
+        """Test that Server-Sent Events are passed through"""
+        response = self.process(StreamingHttpResponse(iter(['data: 1\n\n']), content_type='text/event-stream'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+    
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip;q=0.5, br;q=0, deflate'), {'gzip', 'deflate'})
+
+
 print("✅ All test classes defined. Run with: python3 manage.py test django_app")
@@ -0,0 +1,93 @@
+"""
+Small thread-safe in-process cache with per-entry expiry.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Dictionary-like cache whose entries expire ``ttl`` seconds after being
+    stored. The oldest entries are evicted once ``maxsize`` is reached.
+    """
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (value, stored_at, expires_at)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, stored_at, expires_at = item
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        now = time.monotonic()
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, now, now + (self.ttl if ttl is None else ttl))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Return the cached value for ``key`` or call ``loader()`` to build it.
+        Concurrent misses on the same key wait for a single loader call.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                value = self.get(key, _MISSING)
+                if value is _MISSING:
+                    value = loader()
+                    self.set(key, value, ttl)
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+        return value
+
+    def age(self, key):
+        """Seconds since ``key`` was stored, or None if it is not cached"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or time.monotonic() >= item[2]:
+                return None
+            return time.monotonic() - item[1]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate):
+        """Delete every entry whose key satisfies ``predicate(key)``"""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+
+_MISSING = object()
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views, auth_views
+from . import views, auth_views, async_views
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
@@ -24,12 +24,17 @@ urlpatterns = [
     # Protected endpoints (require authentication)
     path('targets/', views.get_target_list, name='target-list'),
     path('robot/call/', views.call_robot_task, name='robot-call'),
+    path('robot/call/batch/', views.call_robot_task_batch, name='robot-call-batch'),
     path('robot/orders/', views.get_robot_orders, name='robot-orders'),
+    path('robot/points/frequent/', views.get_frequent_points, name='robot-frequent-points'),
+    path('robot/orders/analytics/', views.get_order_analytics, name='robot-order-analytics'),
+    path('robot/orders/export/', views.export_robot_orders, name='robot-order-export'),
     path('token/refresh/', views.refresh_token, name='refresh-token'),
     path('endpoints/', views.endpoint_list, name='endpoint-list'),
     path('endpoints/create/', views.endpoint_create, name='endpoint-create'),
     path('endpoints/<int:endpoint_id>/update/', views.endpoint_update, name='endpoint-update'),
     path('endpoints/<int:endpoint_id>/execute/', views.endpoint_execute, name='endpoint-execute'),
+    path('endpoints/execute/', views.endpoint_execute_batch, name='endpoint-execute-batch'),
     
     # Robot endpoints
     path('robot/list/', views.get_robot_list, name='robot-list'),
@@ -39,4 +44,14 @@ urlpatterns = [
     
     # Task endpoints
     path('tasks/list/', views.get_task_list, name='task-list'),
+    
+    # Fleet status stream (Server-Sent Events)
+    path('fleet/stream/', views.fleet_stream, name='fleet-stream'),
+    
+    # Async (ASGI) versions of the Keenon proxy endpoints
+    path('async/targets/', async_views.get_target_list, name='async-target-list'),
+    path('async/robot/call/', async_views.call_robot_task, name='async-robot-call'),
+    path('async/robot/list/', async_views.get_robot_list, name='async-robot-list'),
+    path('async/store/list/', async_views.get_store_list, name='async-store-list'),
+    path('async/tasks/list/', async_views.get_task_list, name='async-task-list'),
 ]
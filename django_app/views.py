@@ -1,14 +1,116 @@
-from django.http import JsonResponse
-from rest_framework.decorators import api_view, permission_classes
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
-from .models import Endpoint, UserKeenonConfig, RobotOrder
+from .models import Endpoint, UserKeenonConfig, RobotOrder, PointUsage, OrderRollup, KeenonTask, TaskSyncState
+from .keenon_client import (
+    get_client, KeenonAPIError, ROBOT_CALL_PATH, ROBOT_LIST_PATH, STORE_LIST_PATH
+)
+from .response_cache import response_cache
+from .fleet import fleet_pollers
+from .order_buffer import order_buffer
+from .order_stats import bucket_start, frequent_points, order_analytics
+from .renderers import EventStreamRenderer, CSVRenderer, NDJSONRenderer, FastJSONRenderer
+from .fast_json import JsonResponse, dumps
+from .keenon_tokens import token_manager, TokenRefreshError
+from .target_cache import target_cache
+from .task_pages import fetch_task_pages
+from .task_mirror import sync_store, task_mirror_sync
+from .endpoint_cache import endpoint_cache
+from .config_cache import keenon_config_cache
+from .circuit_breaker import circuit_breakers
+from .authentication import user_is_active
+import base64
+import binascii
+import csv
+import hashlib
+import itertools
 import json
+import asyncio
+import logging
+import queue
+import time
+from datetime import datetime
 import requests
-from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
 from django.utils import timezone
-from django.db.models import Count
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db.models import Q
 
-KEENON_BASE_URL = 'https://es.robotkeenon.com'
+logger = logging.getLogger(__name__)
+
+ROBOT_CALL_STATUS_MESSAGES = {
+    200: 'Éxito',
+    201: 'Creado',
+    400: 'Petición incorrecta',
+    401: 'No autorizado',
+    403: 'Prohibido',
+    404: 'No encontrado',
+    500: 'Error del servidor',
+    502: 'Bad Gateway',
+    503: 'Servicio no disponible'
+}
+
+
+def keenon_error_response(status_code, details):
+    """Build the JSON error returned to the frontend when Keenon answers non-200"""
+    if status_code == 401:
+        return JsonResponse({
+            'success': False,
+            'error': 'Token expired. Please refresh the Keenon token from Dashboard.',
+            'details': details,
+            'status_code': 401
+        }, status=200)
+    return JsonResponse({
+        'success': False,
+        'error': f'Keenon API returned status {status_code}',
+        'details': details
+    }, status=200)
+
+
+def conditional_json_response(request, data):
+    """
+    JsonResponse for polled data, with an ETag computed from the encoded body.
+    Answers 304 Not Modified (no body) when the client's If-None-Match matches.
+    """
+    content = dumps(data)
+    etag = '"%s"' % hashlib.md5(content, usedforsecurity=False).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    # Per-user data: the browser may keep it but must revalidate every poll
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _is_asgi(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def streaming_content(request, content, batch_size=1):
+    """
+    Adapt a sync iterator for StreamingHttpResponse. Under ASGI, Django
+    buffers a sync iterator completely before sending it, so there the
+    iterator is advanced ``batch_size`` items at a time in the sync thread
+    (where its database cursor lives) and served as an async iterator.
+    """
+    if not _is_asgi(request):
+        return content
+    
+    next_batch = sync_to_async(lambda: list(itertools.islice(content, batch_size)))
+    
+    async def stream():
+        while True:
+            batch = await next_batch()
+            if not batch:
+                return
+            yield batch[0][:0].join(batch)
+    return stream()
 
 
 @api_view(['GET'])
@@ -20,61 +122,32 @@ def get_target_list(request):
     """
     try:
         try:
-            keenon_config = UserKeenonConfig.objects.get(user=request.user)
+            keenon_config = keenon_config_cache.get(request.user)
         except UserKeenonConfig.DoesNotExist:
             return JsonResponse({
                 'success': False,
                 'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
             }, status=200)
         
-        if not keenon_config.access_token:
+        if not token_manager.ensure_valid(keenon_config):
             return JsonResponse({
                 'success': False,
                 'error': 'Access token not found. Please refresh your token.'
             }, status=200)
         
         scene_code = request.GET.get('sceneCode', keenon_config.scene_code)
-        
-        target_url = f"{KEENON_BASE_URL}/api/open/scene/v1/target/list"
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {keenon_config.access_token}'
-        }
-        
-        params = {
-            'sceneCode': scene_code
-        }
+        refresh = request.GET.get('refresh') in ('1', 'true')
         
         try:
-            response = requests.get(
-                target_url,
-                headers=headers,
-                params=params,
-                timeout=30
-            )
+            target_list = target_cache.get(keenon_config, scene_code, refresh=refresh)
             
-            if response.status_code == 200:
-                target_data = response.json()
-                
-                return JsonResponse({
-                    'success': True,
-                    'data': target_data.get('data', [])
-                }, status=200)
-            elif response.status_code == 401:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Token expired. Please refresh the Keenon token from Dashboard.',
-                    'details': response.text,
-                    'status_code': 401
-                }, status=200)
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Keenon API returned status {response.status_code}',
-                    'details': response.text
-                }, status=200)
-                
+            return conditional_json_response(request, {
+                'success': True,
+                'data': target_list.targets
+            })
+        
+        except KeenonAPIError as e:
+            return keenon_error_response(e.status_code, e.text)
         except requests.exceptions.RequestException as e:
             return JsonResponse({
                 'success': False,
@@ -107,53 +180,29 @@ def call_robot_task(request):
         uuid = data['uuid']
         point_id = data['pointId']
         
+        # A stateless token outlives its user; don't call robots or queue orders for a removed account
+        if not user_is_active(request.user):
+            return JsonResponse({'error': 'User account is inactive or no longer exists'}, status=401)
+        
         try:
-            keenon_config = UserKeenonConfig.objects.get(user=request.user)
+            keenon_config = keenon_config_cache.get(request.user)
         except UserKeenonConfig.DoesNotExist:
             return JsonResponse({
                 'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
             }, status=404)
 
-        if not keenon_config.access_token:
+        if not token_manager.ensure_valid(keenon_config):
             return JsonResponse({
                 'error': 'Access token not found. Please refresh your token.'
             }, status=401)
         
-        # Obtener el nombre del punto desde los targets
+        # Obtener el nombre del punto desde la caché de targets
         point_name = None
-        scene_code = keenon_config.scene_code
-        target_url = f"{KEENON_BASE_URL}/api/open/scene/v1/target/list"
         
         try:
-            target_response = requests.get(
-                target_url,
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {keenon_config.access_token}'
-                },
-                params={'sceneCode': scene_code},
-                timeout=10
-            )
-            
-            if target_response.status_code == 200:
-                target_data = target_response.json()
-                print(f"DEBUG - Target API Response: {target_data}")
-                targets = target_data.get('data', [])
-                # Convertir ambos a string para comparación robusta
-                point_id_str = str(point_id)
-                print(f"DEBUG - Buscando point_id: {point_id_str}")
-                for target in targets:
-                    print(f"DEBUG - Target: pointId={target.get('pointId')}, pointName={target.get('pointName')}, name={target.get('name')}")
-                    if str(target.get('pointId')) == point_id_str:
-                        point_name = target.get('pointName') or target.get('name')
-                        print(f"DEBUG - MATCH! point_name={point_name}")
-                        break
-                if not point_name:
-                    print(f"DEBUG - No se encontró el nombre para point_id {point_id_str}")
+            point_name = target_cache.point_name(keenon_config, point_id)
         except Exception as e:
             print(f"Error obteniendo nombre del punto: {e}")
-            import traceback
-            traceback.print_exc()
             pass  # Si falla, continuamos sin el nombre
         
         keenon_payload = {
@@ -162,46 +211,23 @@ def call_robot_task(request):
             "storeId": keenon_config.store_id
         }
         
-        keenon_url = "https://es.robotkeenon.com/api/open/scene/v3/robot/call/task"
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {keenon_config.access_token}'
-        }
-        
         try:
-            response = requests.post(
-                keenon_url,
-                json=keenon_payload,
-                headers=headers,
-                timeout=30
-            )
+            response = get_client().post(ROBOT_CALL_PATH, keenon_config, json=keenon_payload)
             
             is_success = response.status_code in [200, 201]
             status_code = response.status_code
             
-            # Guardar la orden en el historial
-            RobotOrder.objects.create(
+            # Guardar la orden en el historial (se escribe en segundo plano)
+            order_buffer.add(RobotOrder(
                 user=request.user,
                 robot_uuid=uuid,
                 point_id=point_id,
                 point_name=point_name or point_id,
                 status_code=status_code,
                 success=is_success
-            )
+            ))
             
-            status_messages = {
-                200: 'Éxito',
-                201: 'Creado',
-                400: 'Petición incorrecta',
-                401: 'No autorizado',
-                403: 'Prohibido',
-                404: 'No encontrado',
-                500: 'Error del servidor',
-                502: 'Bad Gateway',
-                503: 'Servicio no disponible'
-            }
-            status_message = status_messages.get(status_code, f'Código {status_code}')
+            status_message = ROBOT_CALL_STATUS_MESSAGES.get(status_code, f'Código {status_code}')
             
             try:
                 response_data = response.json()
@@ -232,6 +258,131 @@ def call_robot_task(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def _dispatch_robot_call(keenon_config, uuid, point_id):
+    """Send one robot call task to Keenon and describe the outcome"""
+    result = {
+        'target': {
+            'uuid': uuid,
+            'pointId': point_id
+        }
+    }
+    
+    try:
+        response = get_client().post(ROBOT_CALL_PATH, keenon_config, json={
+            "uuid": uuid,
+            "pointId": point_id,
+            "storeId": keenon_config.store_id
+        })
+    except requests.exceptions.RequestException as e:
+        result.update({
+            'success': False,
+            'error': 'Error de conexión con Keenon',
+            'details': str(e)
+        })
+        return result
+    finally:
+        # Runs in a worker thread: close any connection a token refresh opened
+        connections.close_all()
+    
+    try:
+        response_data = response.json()
+    except ValueError:
+        response_data = response.text
+    
+    status_code = response.status_code
+    result.update({
+        'success': status_code in [200, 201],
+        'status_code': status_code,
+        'status_message': ROBOT_CALL_STATUS_MESSAGES.get(status_code, f'Código {status_code}'),
+        'keenon_response': response_data
+    })
+    return result
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def call_robot_task_batch(request):
+    """
+    Send several robots at once. Calls are dispatched concurrently (at most
+    ROBOT_BATCH_CONCURRENCY at a time) and the orders are saved together.
+    Recibe: {"calls": [{"uuid": "d3b7a3c371d51206d24755f9f2a80f62", "pointId": "4"}, ...]}
+    """
+    try:
+        calls = request.data.get('calls') if isinstance(request.data, dict) else None
+        
+        if not isinstance(calls, list) or not calls:
+            return JsonResponse({
+                'error': 'calls must be a non-empty list of {uuid, pointId}'
+            }, status=400)
+        
+        if len(calls) > settings.ROBOT_BATCH_MAX_CALLS:
+            return JsonResponse({
+                'error': f'A batch can contain at most {settings.ROBOT_BATCH_MAX_CALLS} calls'
+            }, status=400)
+        
+        for index, call in enumerate(calls):
+            if not isinstance(call, dict) or 'uuid' not in call or 'pointId' not in call:
+                return JsonResponse({
+                    'error': f'uuid and pointId are required (item {index})'
+                }, status=400)
+        
+        if not user_is_active(request.user):
+            return JsonResponse({'error': 'User account is inactive or no longer exists'}, status=401)
+        
+        try:
+            keenon_config = keenon_config_cache.get(request.user)
+        except UserKeenonConfig.DoesNotExist:
+            return JsonResponse({
+                'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
+            }, status=404)
+        
+        if not token_manager.ensure_valid(keenon_config):
+            return JsonResponse({
+                'error': 'Access token not found. Please refresh your token.'
+            }, status=401)
+        
+        # Point names are resolved once from the cached target list
+        target_list = None
+        try:
+            target_list = target_cache.get(keenon_config)
+        except Exception as e:
+            logger.warning('Could not load point names for a robot batch: %s', e)
+        
+        with ThreadPoolExecutor(max_workers=min(settings.ROBOT_BATCH_CONCURRENCY, len(calls))) as executor:
+            results = list(executor.map(
+                lambda call: _dispatch_robot_call(keenon_config, call['uuid'], call['pointId']),
+                calls
+            ))
+        
+        orders = []
+        for call, result in zip(calls, results):
+            if 'status_code' not in result:
+                continue
+            point_name = target_list.point_name(call['pointId']) if target_list else None
+            orders.append(RobotOrder(
+                user=request.user,
+                robot_uuid=call['uuid'],
+                point_id=call['pointId'],
+                point_name=point_name or call['pointId'],
+                status_code=result['status_code'],
+                success=result['success']
+            ))
+        order_buffer.extend(orders)
+        
+        succeeded = sum(1 for result in results if result['success'])
+        
+        return JsonResponse({
+            'success': succeeded == len(results),
+            'total': len(results),
+            'succeeded': succeeded,
+            'results': results
+        }, status=200)
+        
+    except Exception as e:
+        logger.exception('Robot batch call failed: %s', e)
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def refresh_token(request):
@@ -240,7 +391,7 @@ def refresh_token(request):
     """
     try:
         try:
-            keenon_config = UserKeenonConfig.objects.get(user=request.user)
+            keenon_config = keenon_config_cache.get(request.user)
         except UserKeenonConfig.DoesNotExist:
             return JsonResponse({
                 'success': False,
@@ -253,52 +404,22 @@ def refresh_token(request):
                 'error': 'Client ID or Client Secret not configured'
             }, status=400)
         
-        token_url = "https://es.robotkeenon.com/api/open/oauth/token"
-        
-        token_data = {
-            'client_id': keenon_config.client_id,
-            'client_secret': keenon_config.client_secret,
-            'grant_type': 'client_credentials'
-        }
-        
-        token_headers = {
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-        
-        response = requests.post(
-            token_url,
-            data=token_data,
-            headers=token_headers,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            response_data = response.json()
-            
-            if 'access_token' in response_data:
-                keenon_config.access_token = response_data['access_token']
-                
-                expires_in = response_data.get('expires_in', 3600)
-                keenon_config.token_expires_at = timezone.now() + timedelta(seconds=expires_in)
-                keenon_config.save()
-                
-                return JsonResponse({
-                    'success': True,
-                    'message': 'Token refreshed successfully',
-                    'expires_in': expires_in
-                }, status=200)
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'No access_token in response',
-                    'response': response_data
-                }, status=400)
-        else:
+        try:
+            token_manager.refresh(keenon_config, force=True)
+        except TokenRefreshError as e:
             return JsonResponse({
                 'success': False,
-                'error': f'Failed to refresh token (Status: {response.status_code})',
-                'response': response.text
-            }, status=response.status_code)
+                'error': str(e),
+                'response': e.response
+            }, status=e.status_code)
+        
+        expires_in = int((keenon_config.token_expires_at - timezone.now()).total_seconds())
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Token refreshed successfully',
+            'expires_in': expires_in
+        }, status=200)
             
     except requests.exceptions.RequestException as e:
         return JsonResponse({
@@ -321,6 +442,37 @@ def endpoint_list(request):
     return JsonResponse(list(endpoints), safe=False)
 
 
+def _parse_endpoint_json(value, field, default=None):
+    """
+    Validate an endpoint's params/body. Accepts a JSON string (as sent by the
+    endpoint form) or an already decoded value; raises ValueError otherwise.
+    params must be a JSON object.
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return default
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON in {field}: {e}')
+    if field == 'params' and not isinstance(value, dict):
+        raise ValueError('params must be a JSON object')
+    return value
+
+
+def _parse_cache_ttl(value):
+    """Validate an endpoint's cache_ttl (seconds, empty for no caching)"""
+    if value in (None, ''):
+        return None
+    try:
+        ttl = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('cache_ttl must be a number of seconds')
+    if ttl < 0 or ttl > settings.ENDPOINT_CACHE_MAX_TTL:
+        raise ValueError(f'cache_ttl must be between 0 and {settings.ENDPOINT_CACHE_MAX_TTL} seconds')
+    return ttl or None
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def endpoint_create(request):
@@ -328,13 +480,21 @@ def endpoint_create(request):
     try:
         data = request.data
         
+        try:
+            params = _parse_endpoint_json(data.get('params'), 'params', default={})
+            body = _parse_endpoint_json(data.get('body'), 'body')
+            cache_ttl = _parse_cache_ttl(data.get('cache_ttl'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
         endpoint = Endpoint.objects.create(
             user=request.user,
             name=data.get('name', 'Unnamed'),
             method=data.get('method', 'GET'),
             path=data.get('path', ''),
-            params=data.get('params', ''),
-            body=data.get('body', '')
+            params=params,
+            body=body,
+            cache_ttl=cache_ttl
         )
         
         return JsonResponse({
@@ -345,7 +505,8 @@ def endpoint_create(request):
                 'method': endpoint.method,
                 'path': endpoint.path,
                 'params': endpoint.params,
-                'body': endpoint.body
+                'body': endpoint.body,
+                'cache_ttl': endpoint.cache_ttl
             }
         }, status=201)
     except Exception as e:
@@ -360,11 +521,19 @@ def endpoint_update(request, endpoint_id):
         endpoint = Endpoint.objects.get(id=endpoint_id, user=request.user)
         data = request.data
         
+        try:
+            if 'params' in data:
+                endpoint.params = _parse_endpoint_json(data['params'], 'params', default={})
+            if 'body' in data:
+                endpoint.body = _parse_endpoint_json(data['body'], 'body')
+            if 'cache_ttl' in data:
+                endpoint.cache_ttl = _parse_cache_ttl(data['cache_ttl'])
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
         endpoint.name = data.get('name', endpoint.name)
         endpoint.method = data.get('method', endpoint.method)
         endpoint.path = data.get('path', endpoint.path)
-        endpoint.params = data.get('params', endpoint.params)
-        endpoint.body = data.get('body', endpoint.body)
         endpoint.save()
         
         return JsonResponse({
@@ -375,7 +544,8 @@ def endpoint_update(request, endpoint_id):
                 'method': endpoint.method,
                 'path': endpoint.path,
                 'params': endpoint.params,
-                'body': endpoint.body
+                'body': endpoint.body,
+                'cache_ttl': endpoint.cache_ttl
             }
         }, status=200)
     except Endpoint.DoesNotExist:
@@ -384,66 +554,43 @@ def endpoint_update(request, endpoint_id):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+ENDPOINT_METHODS = ('GET', 'DELETE', 'POST', 'PUT')
+
+
+def _force_refresh(request):
+    return request.GET.get('refresh') in ('1', 'true') or request.data.get('force_refresh') in (True, 'true', '1')
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def endpoint_execute(request, endpoint_id):
     """Execute a saved endpoint owned by the current user"""
     try:
         try:
-            keenon_config = UserKeenonConfig.objects.get(user=request.user)
+            keenon_config = keenon_config_cache.get(request.user)
         except UserKeenonConfig.DoesNotExist:
             return JsonResponse({
                 'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
             }, status=404)
         
-        if not keenon_config.access_token:
+        if not token_manager.ensure_valid(keenon_config):
             return JsonResponse({
                 'error': 'Access token not found. Please refresh your token.'
             }, status=401)
         
         endpoint = Endpoint.objects.get(id=endpoint_id, user=request.user)
         
-        full_url = f"{KEENON_BASE_URL}{endpoint.path}"
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {keenon_config.access_token}'
-        }
-        
-        params_dict = {}
-        if endpoint.params:
-            try:
-                params_dict = json.loads(endpoint.params)
-            except:
-                pass
-        
-        body_dict = None
-        if endpoint.body:
-            try:
-                body_dict = json.loads(endpoint.body)
-            except:
-                pass
-        
-        if endpoint.method == 'GET':
-            response = requests.get(full_url, headers=headers, params=params_dict, timeout=30)
-        elif endpoint.method == 'POST':
-            response = requests.post(full_url, headers=headers, json=body_dict, params=params_dict, timeout=30)
-        elif endpoint.method == 'PUT':
-            response = requests.put(full_url, headers=headers, json=body_dict, params=params_dict, timeout=30)
-        elif endpoint.method == 'DELETE':
-            response = requests.delete(full_url, headers=headers, params=params_dict, timeout=30)
-        else:
+        if endpoint.method not in ENDPOINT_METHODS:
             return JsonResponse({'error': 'Invalid method'}, status=400)
         
-        try:
-            response_data = response.json()
-        except:
-            response_data = response.text
+        result = endpoint_cache.execute(keenon_config, endpoint, refresh=_force_refresh(request))
         
         return JsonResponse({
             'success': True,
-            'status_code': response.status_code,
-            'response': response_data,
+            'status_code': result.status_code,
+            'response': result.payload,
+            'cached': result.cached,
+            'cache_age': result.cache_age,
             'endpoint': {
                 'name': endpoint.name,
                 'method': endpoint.method,
@@ -462,6 +609,119 @@ def endpoint_execute(request, endpoint_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def _run_endpoint(keenon_config, endpoint, refresh=False):
+    """Execute one saved endpoint and describe the outcome with its latency"""
+    result = {
+        'id': endpoint.id,
+        'name': endpoint.name,
+        'method': endpoint.method,
+        'path': endpoint.path
+    }
+    if endpoint.method not in ENDPOINT_METHODS:
+        result.update({'success': False, 'error': 'Invalid method'})
+        return result
+    
+    started = time.monotonic()
+    try:
+        outcome = endpoint_cache.execute(keenon_config, endpoint, refresh=refresh)
+    except requests.exceptions.RequestException as e:
+        result.update({
+            'success': False,
+            'error': 'Request failed',
+            'details': str(e),
+            'latency_ms': round((time.monotonic() - started) * 1000, 1)
+        })
+        return result
+    finally:
+        # Runs in a worker thread: close any connection a token refresh opened
+        connections.close_all()
+    
+    result.update({
+        'success': outcome.status_code < 400,
+        'status_code': outcome.status_code,
+        'latency_ms': round((time.monotonic() - started) * 1000, 1),
+        'cached': outcome.cached,
+        'cache_age': outcome.cache_age,
+        'response': outcome.payload
+    })
+    return result
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def endpoint_execute_batch(request):
+    """
+    Execute several saved endpoints concurrently (at most ``concurrency``,
+    capped by ENDPOINT_BATCH_CONCURRENCY, at a time).
+    Recibe: {"ids": [1, 2, 3]} o {"all": true}, opcional "concurrency"
+    """
+    try:
+        data = request.data
+        ids = data.get('ids')
+        run_all = data.get('all') in (True, 'true', '1')
+        
+        if not run_all:
+            try:
+                ids = [int(endpoint_id) for endpoint_id in ids] if isinstance(ids, list) else []
+            except (TypeError, ValueError):
+                ids = []
+            if not ids:
+                return JsonResponse({'error': 'ids must be a non-empty list of endpoint ids, or set all to true'}, status=400)
+        
+        try:
+            concurrency = int(data.get('concurrency', settings.ENDPOINT_BATCH_CONCURRENCY))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'concurrency must be an integer'}, status=400)
+        concurrency = min(max(concurrency, 1), settings.ENDPOINT_BATCH_CONCURRENCY)
+        
+        endpoints = Endpoint.objects.filter(user=request.user).order_by('id')
+        if not run_all:
+            endpoints = endpoints.filter(id__in=ids)
+        endpoints = list(endpoints[:settings.ENDPOINT_BATCH_MAX + 1])
+        
+        if len(endpoints) > settings.ENDPOINT_BATCH_MAX:
+            return JsonResponse({
+                'error': f'A batch can contain at most {settings.ENDPOINT_BATCH_MAX} endpoints'
+            }, status=400)
+        
+        if not run_all:
+            missing = set(ids) - {endpoint.id for endpoint in endpoints}
+            if missing:
+                return JsonResponse({'error': f'Endpoints not found: {", ".join(map(str, sorted(missing)))}'}, status=404)
+        
+        try:
+            keenon_config = keenon_config_cache.get(request.user)
+        except UserKeenonConfig.DoesNotExist:
+            return JsonResponse({
+                'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
+            }, status=404)
+        
+        if not token_manager.ensure_valid(keenon_config):
+            return JsonResponse({
+                'error': 'Access token not found. Please refresh your token.'
+            }, status=401)
+        
+        started = time.monotonic()
+        results = []
+        if endpoints:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(endpoints))) as executor:
+                refresh = _force_refresh(request)
+                results = list(executor.map(lambda endpoint: _run_endpoint(keenon_config, endpoint, refresh), endpoints))
+        
+        succeeded = sum(1 for result in results if result['success'])
+        
+        return JsonResponse({
+            'success': succeeded == len(results),
+            'total': len(results),
+            'succeeded': succeeded,
+            'elapsed_ms': round((time.monotonic() - started) * 1000, 1),
+            'results': results
+        }, status=200)
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_robot_list(request):
@@ -471,59 +731,34 @@ def get_robot_list(request):
     """
     try:
         try:
-            keenon_config = UserKeenonConfig.objects.get(user=request.user)
+            keenon_config = keenon_config_cache.get(request.user)
         except UserKeenonConfig.DoesNotExist:
             return JsonResponse({
                 'success': False,
                 'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
             }, status=200)
         
-        if not keenon_config.access_token:
+        if not token_manager.ensure_valid(keenon_config):
             return JsonResponse({
                 'success': False,
                 'error': 'Access token not found. Please refresh your token.'
             }, status=200)
         
-        robot_url = f"{KEENON_BASE_URL}/api/open/data/v1/store/robot/list"
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {keenon_config.access_token}'
-        }
-        
         params = {
             'storeId': keenon_config.store_id
         }
+        refresh = request.GET.get('refresh') in ('1', 'true')
         
         try:
-            response = requests.get(
-                robot_url,
-                headers=headers,
-                params=params,
-                timeout=30
-            )
+            robot_data = response_cache.get(keenon_config, ROBOT_LIST_PATH, params, refresh=refresh)
             
-            if response.status_code == 200:
-                robot_data = response.json()
-                
-                return JsonResponse({
-                    'success': True,
-                    'data': robot_data.get('data', [])
-                }, status=200)
-            elif response.status_code == 401:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Token expired. Please refresh the Keenon token from Dashboard.',
-                    'details': response.text,
-                    'status_code': 401
-                }, status=200)
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Keenon API returned status {response.status_code}',
-                    'details': response.text
-                }, status=200)
-                
+            return conditional_json_response(request, {
+                'success': True,
+                'data': robot_data.get('data', [])
+            })
+        
+        except KeenonAPIError as e:
+            return keenon_error_response(e.status_code, e.text)
         except requests.exceptions.RequestException as e:
             return JsonResponse({
                 'success': False,
@@ -543,7 +778,7 @@ def get_robot_list(request):
 def get_keenon_config(request):
     """Get current user's Keenon API configuration"""
     try:
-        keenon_config = UserKeenonConfig.objects.get(user=request.user)
+        keenon_config = keenon_config_cache.get(request.user)
         return JsonResponse({
             'success': True,
             'config': {
@@ -587,11 +822,22 @@ def update_keenon_config(request):
         )
         
         if not created:
+            old_client_id = keenon_config.client_id
+            old_credentials_key = keenon_config.credentials_key
             keenon_config.client_id = data['client_id']
             keenon_config.client_secret = data['client_secret']
             keenon_config.store_id = data['store_id']
             if 'scene_code' in data:
                 keenon_config.scene_code = data['scene_code']
+            if keenon_config.credentials_key != old_credentials_key:
+                # The token was issued for the old credentials; the new ones must earn their own
+                keenon_config.access_token = None
+                keenon_config.token_expires_at = None
+                token_manager.forget(old_client_id)
+                circuit_breakers.forget(old_credentials_key)
+                target_cache.invalidate(credentials_key=old_credentials_key)
+                response_cache.invalidate(credentials_key=old_credentials_key)
+                endpoint_cache.invalidate(credentials_key=old_credentials_key)
             keenon_config.save()
         
         return JsonResponse({
@@ -619,54 +865,31 @@ def get_store_list(request):
     """
     try:
         try:
-            keenon_config = UserKeenonConfig.objects.get(user=request.user)
+            keenon_config = keenon_config_cache.get(request.user)
         except UserKeenonConfig.DoesNotExist:
             return JsonResponse({
                 'success': False,
                 'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
             }, status=200)
         
-        if not keenon_config.access_token:
+        if not token_manager.ensure_valid(keenon_config):
             return JsonResponse({
                 'success': False,
                 'error': 'Access token not found. Please refresh your token.'
             }, status=200)
         
-        store_url = f"{KEENON_BASE_URL}/api/open/data/v1/store/list"
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {keenon_config.access_token}'
-        }
+        refresh = request.GET.get('refresh') in ('1', 'true')
         
         try:
-            response = requests.get(
-                store_url,
-                headers=headers,
-                timeout=30
-            )
+            store_data = response_cache.get(keenon_config, STORE_LIST_PATH, refresh=refresh)
             
-            if response.status_code == 200:
-                store_data = response.json()
-                
-                return JsonResponse({
-                    'success': True,
-                    'data': store_data.get('data', [])
-                }, status=200)
-            elif response.status_code == 401:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Token expired. Please refresh the Keenon token from Dashboard.',
-                    'details': response.text,
-                    'status_code': 401
-                }, status=200)
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Keenon API returned status {response.status_code}',
-                    'details': response.text
-                }, status=200)
-                
+            return conditional_json_response(request, {
+                'success': True,
+                'data': store_data.get('data', [])
+            })
+        
+        except KeenonAPIError as e:
+            return keenon_error_response(e.status_code, e.text)
         except requests.exceptions.RequestException as e:
             return JsonResponse({
                 'success': False,
@@ -681,6 +904,88 @@ def get_store_list(request):
         }, status=500)
 
 
+def mirrored_task_list(request, keenon_config, store_id, refresh):
+    """
+    get_task_list answered from the local task mirror (``?source=mirror``).
+    Filters: robotId, taskStatus, start, end (compared with startTime, end is
+    exclusive). Pagination: page, page_size.
+    """
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = min(max(int(request.GET.get('page_size', settings.ROBOT_ORDERS_PAGE_SIZE)), 1), settings.ROBOT_ORDERS_MAX_PAGE_SIZE)
+        task_status = int(request.GET['taskStatus']) if request.GET.get('taskStatus') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'page, page_size and taskStatus must be integers'}, status=400)
+    
+    state = TaskSyncState.objects.filter(client_id=keenon_config.client_id, store_id=store_id).first()
+    if state is None or refresh or state.credentials != keenon_config.credentials_key:
+        # First visit of this store, explicit refresh, or other credentials: pull it now.
+        # Only credentials Keenon accepts get to read the mirror.
+        try:
+            sync_store(keenon_config, store_id)
+        except KeenonAPIError as e:
+            return keenon_error_response(e.status_code, e.text)
+        except requests.exceptions.RequestException as e:
+            return JsonResponse({
+                'success': False,
+                'error': 'Connection error with Keenon API',
+                'details': str(e)
+            }, status=200)
+        state = TaskSyncState.objects.get(client_id=keenon_config.client_id, store_id=store_id)
+    task_mirror_sync.start()
+    
+    tasks = KeenonTask.objects.filter(client_id=keenon_config.client_id, store_id=store_id)
+    if request.GET.get('robotId'):
+        tasks = tasks.filter(robot_id=request.GET['robotId'])
+    if task_status is not None:
+        tasks = tasks.filter(task_status=task_status)
+    if request.GET.get('start'):
+        tasks = tasks.filter(start_time__gte=request.GET['start'])
+    if request.GET.get('end'):
+        tasks = tasks.filter(start_time__lt=request.GET['end'])
+    
+    total = tasks.count()
+    offset = (page - 1) * page_size
+    data = list(tasks.order_by('-start_time', '-id').values_list('data', flat=True)[offset:offset + page_size])
+    
+    return conditional_json_response(request, {
+        'success': True,
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+        'synced_at': state.last_synced_at,
+        'data': data
+    })
+
+
+def _stream_task_list(total, pages):
+    """
+    Write the get_task_list JSON incrementally, one page at a time. A page
+    that fails after the response started is reported in an "error" key.
+    """
+    yield '{"success": true, "total": %s, "data": [' % json.dumps(total)
+    separator = ''
+    try:
+        for page in pages:
+            if page:
+                # Encode the page as a list and drop the brackets
+                yield separator + dumps(page)[1:-1].decode()
+                separator = ', '
+    except (KeenonAPIError, requests.exceptions.RequestException) as e:
+        yield '], "error": %s}' % json.dumps(f'Incomplete task list: {e}')
+        return
+    yield ']}'
+
+
+def task_list_stream_response(request, total, pages):
+    """Streamed get_task_list response (``?stream=1``) for the pages of fetch_task_pages"""
+    response = StreamingHttpResponse(
+        streaming_content(request, _stream_task_list(total, pages)), content_type='application/json'
+    )
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_task_list(request):
@@ -690,63 +995,40 @@ def get_task_list(request):
     """
     try:
         try:
-            keenon_config = UserKeenonConfig.objects.get(user=request.user)
+            keenon_config = keenon_config_cache.get(request.user)
         except UserKeenonConfig.DoesNotExist:
             return JsonResponse({
                 'success': False,
                 'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
             }, status=200)
         
-        if not keenon_config.access_token:
+        if not token_manager.ensure_valid(keenon_config):
             return JsonResponse({
                 'success': False,
                 'error': 'Access token not found. Please refresh your token.'
             }, status=200)
         
         store_id = request.GET.get('storeId', keenon_config.store_id)
+        refresh = request.GET.get('refresh') in ('1', 'true')
         
-        task_url = f"{KEENON_BASE_URL}/api/open/data/v1/store/task/food/list"
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {keenon_config.access_token}'
-        }
-        
-        params = {
-            'storeId': store_id
-        }
+        if request.GET.get('source') == 'mirror':
+            return mirrored_task_list(request, keenon_config, store_id, refresh)
         
         try:
-            response = requests.get(
-                task_url,
-                headers=headers,
-                params=params,
-                timeout=30
-            )
+            # Every page, fetched concurrently after the first one
+            total, pages = fetch_task_pages(keenon_config, store_id, refresh=refresh)
             
-            if response.status_code == 200:
-                task_data = response.json()
-                data_obj = task_data.get('data', {})
-                
-                return JsonResponse({
-                    'success': True,
-                    'total': data_obj.get('total', 0),
-                    'data': data_obj.get('list', [])
-                }, status=200)
-            elif response.status_code == 401:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Token expired. Please refresh the Keenon token from Dashboard.',
-                    'details': response.text,
-                    'status_code': 401
-                }, status=200)
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Keenon API returned status {response.status_code}',
-                    'details': response.text
-                }, status=200)
-                
+            if request.GET.get('stream') in ('1', 'true'):
+                return task_list_stream_response(request, total, pages)
+            
+            return conditional_json_response(request, {
+                'success': True,
+                'total': total,
+                'data': [task for page in pages for task in page]
+            })
+        
+        except KeenonAPIError as e:
+            return keenon_error_response(e.status_code, e.text)
         except requests.exceptions.RequestException as e:
             return JsonResponse({
                 'success': False,
@@ -761,27 +1043,81 @@ def get_task_list(request):
         }, status=500)
 
 
+def _encode_order_cursor(order):
+    raw = f"{order['created_at'].isoformat()}|{order['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_order_cursor(cursor):
+    """Return the (created_at, id) position encoded in a history cursor"""
+    created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    parsed = datetime.fromisoformat(created_at)
+    if parsed.tzinfo is None:
+        raise ValueError('cursor without timezone')
+    return parsed, int(order_id)
+
+
+def _filter_orders(request, orders):
+    """Apply the robot_uuid, point_id and success query filters"""
+    if request.GET.get('robot_uuid'):
+        orders = orders.filter(robot_uuid=request.GET['robot_uuid'])
+    if request.GET.get('point_id'):
+        orders = orders.filter(point_id=request.GET['point_id'])
+    if request.GET.get('success') in ('true', '1'):
+        orders = orders.filter(success=True)
+    elif request.GET.get('success') in ('false', '0'):
+        orders = orders.filter(success=False)
+    return orders
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_robot_orders(request):
     """
-    Get robot order history for the current user
+    Get robot order history for the current user, newest first.
+    Keyset-paginated on (created_at, id): pass the returned ``next_cursor``
+    as ``?cursor=`` to get the next page. Optional filters: ``robot_uuid``,
+    ``point_id``, ``success`` (true/false) and ``limit``.
     """
     try:
-        orders = RobotOrder.objects.filter(user=request.user).values(
+        # Include orders still waiting in the write-behind buffer
+        order_buffer.flush()
+        
+        try:
+            limit = min(int(request.GET.get('limit', settings.ROBOT_ORDERS_PAGE_SIZE)), settings.ROBOT_ORDERS_MAX_PAGE_SIZE)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'limit must be an integer'}, status=400)
+        if limit < 1:
+            return JsonResponse({'success': False, 'error': 'limit must be positive'}, status=400)
+        
+        orders = _filter_orders(request, RobotOrder.objects.filter(user=request.user))
+        
+        cursor = request.GET.get('cursor')
+        if cursor:
+            try:
+                created_at, order_id = _decode_order_cursor(cursor)
+            except (ValueError, UnicodeDecodeError, binascii.Error):
+                return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+            orders = orders.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id)
+            )
+        
+        # One extra row tells whether there is a next page
+        page = list(orders.order_by('-created_at', '-id').values(
             'id', 'robot_uuid', 'point_id', 'point_name', 'status_code', 'success', 'created_at'
-        )
+        )[:limit + 1])
+        next_cursor = _encode_order_cursor(page[limit - 1]) if len(page) > limit else None
+        page = page[:limit]
         
-        # Get most frequent point
-        most_frequent = RobotOrder.objects.filter(
-            user=request.user
-        ).values('point_id', 'point_name').annotate(
-            count=Count('point_id')
-        ).order_by('-count').first()
+        # Most frequent point from the usage counters
+        most_frequent = PointUsage.objects.filter(user=request.user).order_by(
+            '-count', '-last_used_at'
+        ).values('point_id', 'point_name', 'count').first()
         
         return JsonResponse({
             'success': True,
-            'orders': list(orders),
+            'orders': page,
+            'next_cursor': next_cursor,
             'most_frequent_point': most_frequent
         }, status=200)
         
@@ -790,3 +1126,222 @@ def get_robot_orders(request):
             'success': False,
             'error': str(e)
         }, status=500)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_frequent_points(request):
+    """
+    Points the user sends robots to most often (``?order=count``, default)
+    or most recently (``?order=recent``), for quick-dispatch suggestions.
+    """
+    try:
+        try:
+            limit = min(int(request.GET.get('limit', 5)), settings.ROBOT_ORDERS_MAX_PAGE_SIZE)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'limit must be an integer'}, status=400)
+        
+        order = request.GET.get('order', 'count')
+        if order not in ('count', 'recent'):
+            return JsonResponse({'success': False, 'error': 'order must be "count" or "recent"'}, status=400)
+        
+        order_buffer.flush()
+        
+        return JsonResponse({
+            'success': True,
+            'points': frequent_points(request.user, max(limit, 0), order)
+        }, status=200)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+def _parse_moment(value):
+    """Parse an ISO date or datetime query parameter as an aware datetime"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        moment = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_order_analytics(request):
+    """
+    Robot call analytics from the precomputed hourly/daily rollups.
+    Params: granularity (hour|day), start, end (ISO date or datetime, end is
+    exclusive), group_by (robot|point), robot_uuid, point_id.
+    Rollups hold whole buckets, so start and end must fall on bucket
+    boundaries (a whole hour, or midnight in TIME_ZONE for days).
+    """
+    try:
+        granularity = request.GET.get('granularity', OrderRollup.DAY)
+        if granularity not in (OrderRollup.HOUR, OrderRollup.DAY):
+            return JsonResponse({'success': False, 'error': 'granularity must be "hour" or "day"'}, status=400)
+        
+        group_by = request.GET.get('group_by')
+        group_fields = {'robot': 'robot_uuid', 'point': 'point_id', None: None}
+        if group_by not in group_fields:
+            return JsonResponse({'success': False, 'error': 'group_by must be "robot" or "point"'}, status=400)
+        
+        try:
+            start = _parse_moment(request.GET['start']) if request.GET.get('start') else None
+            end = _parse_moment(request.GET['end']) if request.GET.get('end') else None
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        
+        for name, moment in (('start', start), ('end', end)):
+            # A partial bucket would count orders outside the range
+            if moment is not None and bucket_start(moment, granularity) != moment:
+                return JsonResponse({
+                    'success': False,
+                    'error': f'{name} must be a bucket boundary for granularity={granularity}'
+                }, status=400)
+        
+        # Rollups are written with the orders
+        order_buffer.flush()
+        
+        series = order_analytics(
+            request.user,
+            granularity,
+            start=start,
+            end=end,
+            group_by=group_fields[group_by],
+            robot_uuid=request.GET.get('robot_uuid'),
+            point_id=request.GET.get('point_id')
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'series': series
+        }, status=200)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for streaming csv.writer output"""
+    
+    def write(self, value):
+        return value
+
+
+ORDER_EXPORT_FIELDS = ('id', 'robot_uuid', 'point_id', 'point_name', 'status_code', 'success', 'created_at')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([CSVRenderer, NDJSONRenderer])
+def export_robot_orders(request):
+    """
+    Stream the user's robot order history, oldest first, as CSV (default)
+    or NDJSON (``?format=ndjson``). Rows are read in chunks so memory use
+    does not grow with the history. Filters: start, end (ISO date or
+    datetime, end is exclusive), robot_uuid, point_id, success.
+    """
+    try:
+        start = _parse_moment(request.GET['start']) if request.GET.get('start') else None
+        end = _parse_moment(request.GET['end']) if request.GET.get('end') else None
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    # Include orders still waiting in the write-behind buffer
+    order_buffer.flush()
+    
+    orders = _filter_orders(request, RobotOrder.objects.filter(user=request.user))
+    if start is not None:
+        orders = orders.filter(created_at__gte=start)
+    if end is not None:
+        orders = orders.filter(created_at__lt=end)
+    rows = orders.order_by('created_at', 'id').values_list(*ORDER_EXPORT_FIELDS).iterator(
+        chunk_size=settings.ROBOT_ORDERS_EXPORT_CHUNK_SIZE
+    )
+    
+    if request.accepted_renderer.format == 'ndjson':
+        content = (dumps(dict(zip(ORDER_EXPORT_FIELDS, row))) + b'\n' for row in rows)
+        content_type, extension = 'application/x-ndjson', 'ndjson'
+    else:
+        writer = csv.writer(_Echo())
+        content = itertools.chain(
+            [writer.writerow(ORDER_EXPORT_FIELDS)],
+            (writer.writerow(row[:-1] + (row[-1].isoformat(),)) for row in rows)
+        )
+        content_type, extension = 'text/csv', 'csv'
+    
+    response = StreamingHttpResponse(
+        streaming_content(request, content, batch_size=settings.ROBOT_ORDERS_EXPORT_CHUNK_SIZE),
+        content_type=f'{content_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="robot_orders.{extension}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([EventStreamRenderer, FastJSONRenderer])
+def fleet_stream(request):
+    """
+    Server-Sent Events stream of robot and task state for the user's store.
+    The first event is a full snapshot, later events carry only the changes.
+    """
+    try:
+        keenon_config = keenon_config_cache.get(request.user)
+    except UserKeenonConfig.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Keenon configuration not found. Please configure your Keenon API credentials.'
+        }, status=404)
+    
+    if not token_manager.ensure_valid(keenon_config):
+        return JsonResponse({
+            'success': False,
+            'error': 'Access token not found. Please refresh your token.'
+        }, status=401)
+    
+    poller = fleet_pollers.get(keenon_config)
+    
+    def event_stream(subscriber):
+        try:
+            while True:
+                try:
+                    yield subscriber.get(timeout=settings.FLEET_SSE_HEARTBEAT)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            poller.unsubscribe(subscriber)
+    
+    async def async_event_stream():
+        # Under ASGI the stream waits in the event loop instead of holding a thread
+        subscriber = await poller.asubscribe()
+        try:
+            while True:
+                try:
+                    yield await subscriber.get(settings.FLEET_SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+        finally:
+            poller.unsubscribe(subscriber)
+    
+    if _is_asgi(request):
+        stream = async_event_stream()
+    else:
+        stream = event_stream(poller.subscribe())
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
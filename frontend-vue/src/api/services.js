@@ -50,7 +50,9 @@ export const targetsAPI = {
 // Robot API
 export const robotAPI = {
   call: (uuid, pointId) => apiClient.post('/robot/call/', { uuid, pointId }),
-  getOrders: () => apiClient.get('/robot/orders/')
+  getOrders: (params = {}) => apiClient.get('/robot/orders/', { params }),
+  getFrequentPoints: (params = {}) => apiClient.get('/robot/points/frequent/', { params }),
+  getAnalytics: (params = {}) => apiClient.get('/robot/orders/analytics/', { params })
 }
 
 // Token API (Keenon API token, not JWT)
@@ -60,7 +62,8 @@ export const tokenAPI = {
 
 // Tasks API
 export const tasksAPI = {
-  getAll: (storeId) => apiClient.get('/tasks/list/', { params: { storeId } })
+  getAll: (storeId) => apiClient.get('/tasks/list/', { params: { storeId } }),
+  getMirrored: (params = {}) => apiClient.get('/tasks/list/', { params: { source: 'mirror', ...params } })
 }
 
 // Endpoints API
@@ -68,5 +71,6 @@ export const endpointsAPI = {
   getAll: () => apiClient.get('/endpoints/'),
   create: (data) => apiClient.post('/endpoints/create/', data),
   update: (id, data) => apiClient.put(`/endpoints/${id}/update/`, data),
-  execute: (id) => apiClient.post(`/endpoints/${id}/execute/`)
+  execute: (id) => apiClient.post(`/endpoints/${id}/execute/`),
+  executeMany: (ids = null, concurrency) => apiClient.post('/endpoints/execute/', ids ? { ids, concurrency } : { all: true, concurrency })
 }
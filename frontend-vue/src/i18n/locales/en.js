@@ -61,7 +61,8 @@ export default {
     date: 'Date',
     status: 'Status',
     success: 'Success',
-    failed: 'Failed'
+    failed: 'Failed',
+    loadMore: 'Load more'
   },
   positions: {
     title: 'Positions',
@@ -85,6 +86,7 @@ export default {
     path: 'Path',
     params: 'Parameters',
     body: 'Body',
+    cacheTtl: 'Cache (seconds)',
     execute: 'Execute',
     delete: 'Delete',
     createSuccess: 'Endpoint created successfully',
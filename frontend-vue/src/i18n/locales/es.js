@@ -61,7 +61,8 @@ export default {
     date: 'Fecha',
     status: 'Estado',
     success: 'Éxito',
-    failed: 'Fallido'
+    failed: 'Fallido',
+    loadMore: 'Cargar más'
   },
   positions: {
     title: 'Posiciones',
@@ -85,6 +86,7 @@ export default {
     path: 'Ruta',
     params: 'Parámetros',
     body: 'Cuerpo',
+    cacheTtl: 'Caché (segundos)',
     execute: 'Ejecutar',
     delete: 'Eliminar',
     createSuccess: 'Endpoint creado exitosamente',
@@ -61,7 +61,8 @@ export default {
     date: 'Datum',
     status: 'Status',
     success: 'Uspješno',
-    failed: 'Neuspješno'
+    failed: 'Neuspješno',
+    loadMore: 'Učitaj još'
   },
   positions: {
     title: 'Pozicije',
@@ -85,6 +86,7 @@ export default {
     path: 'Putanja',
     params: 'Parametri',
     body: 'Tijelo',
+    cacheTtl: 'Predmemorija (sekunde)',
     execute: 'Izvrši',
     delete: 'Izbriši',
     createSuccess: 'Endpoint uspješno kreiran',